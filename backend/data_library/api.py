@@ -1,5 +1,6 @@
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form, Header, Response
+from data_library.config import LOG_FILE
 import logging
 
 # Configure logging to file
@@ -7,7 +8,7 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("backend_debug.log"),
+        logging.FileHandler(LOG_FILE),
         logging.StreamHandler()
     ]
 )
@@ -19,23 +20,49 @@ from typing import List, Optional, Any, Dict
 import asyncio
 import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+import base64
+import hashlib
 
 # Database imports
-from sqlalchemy.orm import Session
-from data_library.database import get_db_session, engine, Base
+from sqlalchemy import String, and_, case, or_, select, type_coerce
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from data_library.database import get_async_db_session, engine
+from data_library.migrations import upgrade as upgrade_schema
 from data_library.models import (
     ChallengeSession, ChallengeStatement, ChallengeEvaluation,
-    DimensionScore, ResearchReference, ResearchDocument
+    ResearchDocument, ChallengeSessionSummary
 )
 from data_library.challenge_generator import (
     generate_challenges_stream, 
     evaluate_statement_with_ai,
-    rewrite_statement_with_ai
+    rewrite_statement_with_ai,
+    get_diagnostic,
+    precompute_template_diagnostics,
+    GEMINI_PRO_MODEL
 )
+from data_library.persistence import (
+    persistence, DiagnosticCompleted, StatementGenerated, StatementEvaluated,
+    TimingRecorded, SessionFinished
+)
+from data_library.llm_cache import LRUCache
+from data_library.research_storage import store_upload
+from data_library.ingestion import ingestion, research_index_key
+from data_library.retrieval_index import retrieval_index
+from data_library.config import (
+    RESEARCH_DIR,
+    PRECOMPUTE_TEMPLATE_DIAGNOSTICS,
+    SESSION_DETAIL_CACHE_ENTRIES,
+    SPECULATIVE_FORMAT_COUNT,
+    SPECULATION_HISTORY_SIZE
+)
+from sqlalchemy import func
+import time
 
-# Create Tables
-Base.metadata.create_all(bind=engine)
+# Create / upgrade tables
+upgrade_schema(engine)
 
 app = FastAPI(title="Challenge Statement Generator API")
 
@@ -45,6 +72,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ============================================================================
@@ -61,14 +89,21 @@ class ChallengeRequest(BaseModel):
     include_research: bool = False
     selected_research_ids: Optional[List[str]] = None
     generator_config: Optional[ModelConfig] = None
+    use_cache: bool = True  # False forces fresh sampling (bypasses LLM response cache)
+    batch_evaluation: bool = False  # Score all statements in one evaluation call
+    stream_text: bool = True  # Emit challenge_generation_delta events with partial text
+    speculative: bool = False  # Start likely formats in parallel with the diagnostic
 
 class DiagnosticsRequest(BaseModel):
     brief_text: str
+    diagnostic_model: str = GEMINI_PRO_MODEL
+    use_cache: bool = True
 
 class ReEvaluationRequest(BaseModel):
     brief_text: str
     statement_text: str
     include_research: bool = False
+    use_cache: bool = True
 
 class RewriteRequest(BaseModel):
     brief_text: str
@@ -80,6 +115,16 @@ class DiagnosticPathStepResponse(BaseModel):
     answer: str  # "yes" or "no"
     reasoning: str
 
+class DiagnosticsResponse(BaseModel):
+    diagnostic_summary: str
+    diagnostic_path: List[Dict[str, Any]]
+    selected_formats: List[Dict[str, Any]]
+    diagnostic_model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached: bool = False
+    latency_ms: int
+
 class DimensionScoreResponse(BaseModel):
     dimension_id: str
     score: int
@@ -123,6 +168,7 @@ class SessionSummary(BaseModel):
     statement_count: int
     timing_metrics: Optional[Dict] = None
     challenges: Optional[List[Dict]] = None # [{id, format, gen_ms, eval_ms}]
+    usage: Optional[Dict] = None # tokens by stage/model, latency (session_summaries)
 
 
 class ResearchDocumentResponse(BaseModel):
@@ -133,10 +179,46 @@ class ResearchDocumentResponse(BaseModel):
     description: Optional[str]
     uploaded_at: str
     size_kb: int
+    ingestion_status: Optional[str] = None
+    # Near-duplicate of another research document id, or of "documents/<file>" in the library
+    duplicate_of: Optional[str] = None
+
+class IngestionStatusResponse(BaseModel):
+    job_id: str
+    document_id: str
+    status: str  # queued, uploading, processing, ready, failed
+    attempts: int
+    error: Optional[str] = None
+    gemini_file_id: Optional[str] = None
 
 class RewriteResponse(BaseModel):
     text: str
 
+# Background warm-up task (kept referenced so it is not garbage collected)
+_warmup_task = None
+
+@app.on_event("startup")
+async def warm_diagnostic_cache():
+    """Precompute diagnostics for the stock brief templates in the background."""
+    global _warmup_task
+    if PRECOMPUTE_TEMPLATE_DIAGNOSTICS:
+        _warmup_task = asyncio.create_task(precompute_template_diagnostics())
+
+@app.on_event("startup")
+async def start_ingestion():
+    """Start the research ingestion workers and pick up unfinished documents."""
+    ingestion.start()
+    await ingestion.resume_pending()
+
+@app.on_event("shutdown")
+def drain_persistence():
+    """Write out any session events still queued."""
+    persistence.stop()
+
+@app.on_event("shutdown")
+async def stop_ingestion():
+    await ingestion.stop()
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
@@ -150,13 +232,34 @@ async def health_check():
 # CHALLENGE GENERATION ENDPOINTS
 # ============================================================================
 
+@app.post("/api/diagnostics", response_model=DiagnosticsResponse)
+async def run_diagnostics_endpoint(request: DiagnosticsRequest):
+    """Run (or fetch the cached) diagnostic decision tree for a brief."""
+    start = time.time()
+    result = await get_diagnostic(
+        request.brief_text,
+        model_name=request.diagnostic_model,
+        use_cache=request.use_cache
+    )
+    return DiagnosticsResponse(
+        diagnostic_summary=result["diagnostic_summary"],
+        diagnostic_path=result["diagnostic_path"],
+        selected_formats=result["selected_formats"],
+        diagnostic_model=result.get("model_name", request.diagnostic_model),
+        input_tokens=result.get("input_tokens", 0),
+        output_tokens=result.get("output_tokens", 0),
+        cached=result.get("cached", False),
+        latency_ms=int((time.time() - start) * 1000)
+    )
+
 @app.post("/api/evaluate-single-statement", response_model=EvaluationResponse)
 async def evaluate_single_statement_endpoint(request: ReEvaluationRequest):
     """Evaluate a single statement against the brief."""
     result = await evaluate_statement_with_ai(
         statement_text=request.statement_text,
         brief_text=request.brief_text,
-        include_research=request.include_research
+        include_research=request.include_research,
+        use_cache=request.use_cache
     )
     return result
 
@@ -170,31 +273,49 @@ async def rewrite_statement_endpoint(request: RewriteRequest):
     )
     return {"text": new_text}
 
-async def stream_and_save_generator(request: ChallengeRequest, session: ChallengeSession, db: Session):
+async def get_speculative_formats(db: AsyncSession, count: int = SPECULATIVE_FORMAT_COUNT) -> List[str]:
+    """Most frequently selected formats across recent generated statements."""
+    recent = select(ChallengeStatement.selected_format)\
+        .order_by(ChallengeStatement.id.desc())\
+        .limit(SPECULATION_HISTORY_SIZE)\
+        .subquery()
+    rows = await db.execute(
+        select(recent.c.selected_format, func.count().label("n"))
+        .group_by(recent.c.selected_format)
+        .order_by(func.count().desc())
+        .limit(count)
+    )
+    return [row[0] for row in rows]
+
+async def stream_and_save_generator(
+    request: ChallengeRequest,
+    session_id: str,
+    research_docs_data: List[Dict[str, str]],
+    speculative_formats: Optional[List[str]] = None
+):
     """
     Wraps the core generator to save results to DB while streaming to client.
+
+    Rows are written behind the stream by the persistence actor, so relaying an
+    event never waits on SQLite; the stream only waits for outstanding writes
+    before reporting completion. The session is always finished: "completed",
+    "error", or "cancelled" when the client goes away mid-stream.
     """
+    finished = False
     try:
         # Extract model configuration
         model_config = request.generator_config.dict() if request.generator_config else None
 
-        # Fetch research docs for RAG context
-        research_docs_data = []
-        if request.include_research and request.selected_research_ids:
-            docs = db.query(ResearchDocument).filter(ResearchDocument.id.in_(request.selected_research_ids)).all()
-            research_docs_data = [
-                {"gemini_uri": doc.gemini_uri, "name": doc.name}
-                for doc in docs if doc.gemini_uri
-            ]
-
         async for chunk_str in generate_challenges_stream(
             brief_text=request.brief_text,
             include_research=request.include_research,
             selected_research_ids=request.selected_research_ids or [],
             research_docs=research_docs_data,
-            session=session, # Pass session for DB updates
-            db=db, # Pass db for DB updates
-            model_config=model_config # Pass model config
+            model_config=model_config, # Pass model config
+            use_cache=request.use_cache,
+            batch_evaluation=request.batch_evaluation,
+            stream_text=request.stream_text,
+            speculative_formats=speculative_formats
         ):
             # 1. Parse chunk
             try:
@@ -203,105 +324,53 @@ async def stream_and_save_generator(request: ChallengeRequest, session: Challeng
                 print(f"Skipping invalid JSON chunk: {chunk_str[:50]}...")
                 continue
             
-            # 2. Update DB based on chunk type
-            try:
-                if chunk["type"] == "diagnostic":
-                    data = chunk["data"]
-                    session.diagnostic_summary = data["diagnostic_summary"]
-                    session.diagnostic_path = data["diagnostic_path"]
-                    db.commit()
-                    
-                elif chunk["type"] == "challenge_generation":
-                    # PART 1: Initial Generation (Insert)
-                    stmt_data = chunk["data"]
-                    
-                    stmt = ChallengeStatement(
-                        session_id=session.id,
-                        text=stmt_data["text"],
-                        selected_format=stmt_data["selected_format"],
-                        reasoning=stmt_data["reasoning"],
-                        position=stmt_data["position"],
-                        generation_time_ms=stmt_data.get("generation_time_ms"),
-                        gen_model=stmt_data.get("gen_model"),
-                        gen_input_tokens=stmt_data.get("gen_input_tokens"),
-                        gen_output_tokens=stmt_data.get("gen_output_tokens")
-                    )
-                    db.add(stmt)
-                    db.commit() # Commit to get ID if needed
-                    
-                elif chunk["type"] == "challenge_evaluation":
-                    # PART 2: Evaluation (Update)
-                    stmt_data = chunk["data"]
-                    
-                    # Find existing statement
-                    stmt = db.query(ChallengeStatement).filter(
-                        ChallengeStatement.session_id == session.id,
-                        ChallengeStatement.selected_format == stmt_data["selected_format"]
-                    ).first()
-                    
-                    if stmt:
-                        stmt.evaluation_time_ms = stmt_data.get("evaluation_time_ms")
-                        stmt.eval_model = stmt_data.get("eval_model")
-                        stmt.eval_input_tokens = stmt_data.get("eval_input_tokens")
-                        stmt.eval_output_tokens = stmt_data.get("eval_output_tokens")
-                        
-                        # Save evaluation
-                        if "evaluation" in stmt_data and stmt_data["evaluation"]:
-                            eval_data = stmt_data["evaluation"]
-                            evaluation = ChallengeEvaluation(
-                                statement_id=stmt.id,
-                                total_score=eval_data["total_score"],
-                                weighted_score=eval_data["weighted_score"],
-                                passes_non_negotiables=eval_data["passes_non_negotiables"],
-                                failed_non_negotiables=eval_data["failed_non_negotiables"],
-                                recommendation=eval_data["recommendation"],
-                                detected_format_id=eval_data.get("detected_format_id")
-                            )
-                            db.add(evaluation)
-                            db.flush()
-                            
-                            # Save scores
-                            for dim_data in eval_data["dimension_scores"]:
-                                dim_score = DimensionScore(
-                                    evaluation_id=evaluation.id,
-                                    dimension_id=dim_data["dimension_id"],
-                                    score=dim_data["score"],
-                                    notes=dim_data["notes"],
-                                    has_red_flags=dim_data["has_red_flags"]
-                                )
-                                db.add(dim_score)
-                        
-                        db.commit()
-                        
-                elif chunk["type"] == "timing_metrics":
-                    session.timing_metrics = chunk["data"]
-                    db.commit()
-                    
-            except Exception as db_err:
-                print(f"DB Error saving chunk: {db_err}")
-                db.rollback()
-                # Continue streaming even if save fails, but user should probably know? 
-                # For now, just logging keeps the stream alive.
+            # 2. Queue DB writes based on chunk type
+            data = chunk.get("data")
+            if chunk["type"] == "diagnostic":
+                persistence.submit(DiagnosticCompleted(
+                    session_id=session_id,
+                    diagnostic_summary=data["diagnostic_summary"],
+                    diagnostic_path=data["diagnostic_path"]
+                ))
+            elif chunk["type"] == "challenge_generation":
+                persistence.submit(StatementGenerated(session_id, data["position"], data))
+            elif chunk["type"] == "challenge_evaluation":
+                # Evaluation events carry the statement's position as their id
+                persistence.submit(StatementEvaluated(session_id, data["id"], data))
+            elif chunk["type"] == "timing_metrics":
+                persistence.submit(TimingRecorded(session_id, data))
+
+            # challenge_generation_delta events carry partial text and are only
+            # relayed to the client; the final text is saved on challenge_generation
             
             # 3. Yield to client (SSE format)
             yield f"data: {chunk_str}\n\n"
             
         # Stream finished successfully
-        session.status = "completed"
-        db.commit()
-        yield f"data: {json.dumps({'type': 'complete', 'session_id': session.id})}\n\n"
+        finished = True
+        persistence.submit(SessionFinished(session_id, "completed"))
+        await persistence.flush_async()
+        yield f"data: {json.dumps({'type': 'complete', 'session_id': session_id})}\n\n"
         
     except Exception as e:
         print(f"Stream Error: {e}")
-        session.status = "error"
-        session.error_message = str(e)
-        db.commit()
+        finished = True
+        persistence.submit(SessionFinished(session_id, "error", error_message=str(e)))
+        await persistence.flush_async()
         yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
 
+    finally:
+        if not finished:
+            # Client disconnected (GeneratorExit / CancelledError). Submitting never
+            # blocks, so this cannot be interrupted; the actor commits it and drops
+            # the session's statement-id entries.
+            logger.info(f"Session {session_id} cancelled by client disconnect")
+            persistence.submit(SessionFinished(session_id, "cancelled", error_message="Client disconnected"))
+
 @app.post("/api/generate-challenge-statements")
 async def generate_challenge_statements(
     request: ChallengeRequest,
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_async_db_session)
 ):
     """
     Generate challenge statements from marketing brief (Streaming).
@@ -316,13 +385,28 @@ async def generate_challenge_statements(
         status="generating"
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+
+    # 2. Everything the stream needs from the DB is read up front
+    research_docs_data = []
+    if request.include_research and request.selected_research_ids:
+        docs = (await db.scalars(
+            select(ResearchDocument).where(ResearchDocument.id.in_(request.selected_research_ids))
+        )).all()
+        research_docs_data = [
+            {"gemini_uri": doc.gemini_uri, "name": doc.name}
+            for doc in docs if doc.gemini_uri
+        ]
+    speculative_formats = await get_speculative_formats(db) if request.speculative else None
+    session_id = session.id
+
+    # Release the connection now rather than holding it for the whole stream
+    await db.close()
     
-    print(f"📝 Starting streaming generation for session {session.id}...")
+    print(f"📝 Starting streaming generation for session {session_id}...")
     
     return StreamingResponse(
-        stream_and_save_generator(request, session, db),
+        stream_and_save_generator(request, session_id, research_docs_data, speculative_formats),
         media_type="text/event-stream"
     )
 
@@ -330,53 +414,153 @@ async def generate_challenge_statements(
 # SESSION HISTORY ENDPOINTS
 # ============================================================================
 
+SESSION_LIST_MAX_LIMIT = 200
+SESSION_LIST_FIELDS = {"timing_metrics", "challenges", "usage"}
+BRIEF_PREVIEW_CHARS = 100
+# session_summaries columns returned under "usage"
+USAGE_COLUMNS = (
+    "evaluated_count", "diagnostic_input_tokens", "diagnostic_output_tokens",
+    "gen_input_tokens", "gen_output_tokens", "eval_input_tokens", "eval_output_tokens",
+    "tokens_by_model", "total_latency_ms"
+)
+
+# created_at compared as the raw stored text ("YYYY-MM-DD HH:MM:SS"): no CAST,
+# so the created_at index still serves the keyset predicate
+_created_at_text = type_coerce(ChallengeSession.created_at, String)
+
+def _encode_cursor(created_at: str, session_id: str) -> str:
+    raw = json.dumps([created_at, session_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), str(session_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _db_timestamp(value: datetime) -> str:
+    """Format a datetime the way SQLite's CURRENT_TIMESTAMP stores it (UTC)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
 @app.get("/api/sessions", response_model=List[SessionSummary])
-def get_sessions(
+async def get_sessions(
+    response: Response,
     limit: int = 20,
-    db: Session = Depends(get_db_session)
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db_session)
 ):
-    """Get recent challenge generation sessions."""
-    sessions = db.query(ChallengeSession)\
-        .order_by(ChallengeSession.created_at.desc())\
-        .limit(limit)\
-        .all()
-    
+    """
+    Get recent challenge generation sessions, newest first.
+
+    Keyset-paginated on (created_at, id): pass the X-Next-Cursor response header
+    back as ``cursor`` for the next page (absent on the last page).
+    ``fields`` is a comma-separated subset of "timing_metrics,challenges,usage"
+    (default: all); omitted fields are returned as null. Counts and usage come
+    from the session_summaries rollup.
+    """
+    limit = max(1, min(limit, SESSION_LIST_MAX_LIMIT))
+    wanted = SESSION_LIST_FIELDS if fields is None else {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - SESSION_LIST_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    brief = ChallengeSession.brief_text
+    columns = [
+        ChallengeSession.id,
+        case(
+            (func.length(brief) > BRIEF_PREVIEW_CHARS, func.substr(brief, 1, BRIEF_PREVIEW_CHARS, type_=String) + "..."),
+            else_=brief
+        ).label("brief_preview"),
+        _created_at_text.label("created_at"),
+        ChallengeSession.status,
+        func.coalesce(ChallengeSessionSummary.statement_count, 0).label("statement_count")
+    ]
+    if "timing_metrics" in wanted:
+        columns.append(ChallengeSession.timing_metrics)
+    if "usage" in wanted:
+        columns.extend(c for c in ChallengeSessionSummary.__table__.columns if c.name in USAGE_COLUMNS)
+
+    query = select(*columns).outerjoin(
+        ChallengeSessionSummary, ChallengeSessionSummary.session_id == ChallengeSession.id
+    )
+    if cursor:
+        after_created, after_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            _created_at_text < after_created,
+            and_(_created_at_text == after_created, ChallengeSession.id < after_id)
+        ))
+    if status:
+        query = query.where(ChallengeSession.status == status)
+    if created_after:
+        query = query.where(_created_at_text >= _db_timestamp(created_after))
+    if created_before:
+        query = query.where(_created_at_text < _db_timestamp(created_before))
+    # One extra row tells us whether there is a next page
+    rows = (await db.execute(
+        query.order_by(ChallengeSession.created_at.desc(), ChallengeSession.id.desc()).limit(limit + 1)
+    )).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    # Statements for the whole page in one query
+    session_ids = [row.id for row in rows]
+    challenges: Dict[str, List[Dict]] = {sid: [] for sid in session_ids}
+    if session_ids and "challenges" in wanted:
+        statements = await db.execute(
+            select(
+                ChallengeStatement.session_id, ChallengeStatement.id, ChallengeStatement.position,
+                ChallengeStatement.selected_format, ChallengeStatement.generation_time_ms,
+                ChallengeStatement.evaluation_time_ms, ChallengeStatement.gen_model,
+                ChallengeStatement.gen_input_tokens, ChallengeStatement.gen_output_tokens,
+                ChallengeStatement.eval_model, ChallengeStatement.eval_input_tokens,
+                ChallengeStatement.eval_output_tokens
+            )
+            .where(ChallengeStatement.session_id.in_(session_ids))
+            .order_by(ChallengeStatement.session_id, ChallengeStatement.position)
+        )
+        for stmt in statements:
+            challenges[stmt.session_id].append({
+                "id": stmt.id,
+                "position": stmt.position,
+                "format": stmt.selected_format,
+                "generation_time_ms": stmt.generation_time_ms,
+                "evaluation_time_ms": stmt.evaluation_time_ms,
+                "gen_model": stmt.gen_model,
+                "gen_input_tokens": stmt.gen_input_tokens,
+                "gen_output_tokens": stmt.gen_output_tokens,
+                "eval_model": stmt.eval_model,
+                "eval_input_tokens": stmt.eval_input_tokens,
+                "eval_output_tokens": stmt.eval_output_tokens
+            })
+
     return [
         SessionSummary(
-            id=s.id,
-            brief_preview=s.brief_text[:100] + "..." if len(s.brief_text) > 100 else s.brief_text,
-            created_at=s.created_at.isoformat() if s.created_at else "",
-            status=s.status,
-            statement_count=len(s.challenge_statements),
-            timing_metrics=s.timing_metrics,
-            challenges=[
-                {
-                    "id": stmt.id,
-                    "position": stmt.position,
-                    "format": stmt.selected_format,
-                    "generation_time_ms": stmt.generation_time_ms,
-                    "evaluation_time_ms": stmt.evaluation_time_ms,
-                    "gen_model": stmt.gen_model,
-                    "gen_input_tokens": stmt.gen_input_tokens,
-                    "gen_output_tokens": stmt.gen_output_tokens,
-                    "eval_model": stmt.eval_model,
-                    "eval_input_tokens": stmt.eval_input_tokens,
-                    "eval_output_tokens": stmt.eval_output_tokens
-                }
-                for stmt in sorted(s.challenge_statements, key=lambda x: x.position)
-            ]
+            id=row.id,
+            brief_preview=row.brief_preview,
+            created_at=datetime.fromisoformat(row.created_at).isoformat() if row.created_at else "",
+            status=row.status,
+            statement_count=row.statement_count,
+            timing_metrics=row.timing_metrics if "timing_metrics" in wanted else None,
+            challenges=challenges[row.id] if "challenges" in wanted else None,
+            usage={name: getattr(row, name) for name in USAGE_COLUMNS} if "usage" in wanted else None
         )
-        for s in sessions
+        for row in rows
     ]
 
-@app.get("/api/sessions/{session_id}", response_model=ChallengeResponse)
-def get_session(session_id: str, db: Session = Depends(get_db_session)):
-    """Retrieve a specific session with all details."""
-    session = db.query(ChallengeSession).filter(ChallengeSession.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Build response
+# Completed sessions never change: keep their serialized detail response (status, body, etag)
+session_detail_cache = LRUCache(max_entries=SESSION_DETAIL_CACHE_ENTRIES, ttl_seconds=24 * 3600)
+
+def _build_session_detail(session: ChallengeSession) -> ChallengeResponse:
+    """Build the detail response from a session with its statement tree loaded."""
     statements_response = []
     for stmt in sorted(session.challenge_statements, key=lambda x: x.position):
         eval_response = None
@@ -426,14 +610,67 @@ def get_session(session_id: str, db: Session = Depends(get_db_session)):
         session_id=session.id
     )
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+@app.get("/api/sessions/{session_id}", response_model=ChallengeResponse)
+async def get_session(
+    session_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db_session)
+):
+    """
+    Retrieve a specific session with all details.
+
+    Responses carry an ETag; a matching If-None-Match gets 304 Not Modified.
+    Completed sessions are served from a serialized cache, checked against the
+    session's current status so a status change invalidates the entry.
+    """
+    status = await db.scalar(select(ChallengeSession.status).where(ChallengeSession.id == session_id))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    cached = session_detail_cache.get(session_id)
+    if cached and cached[0] == status:
+        _, body, etag = cached
+    else:
+        # Whole statement tree in one query (an evaluation's scores x references
+        # multiply rows, but references are few)
+        statements = joinedload(ChallengeSession.challenge_statements)
+        evaluation = statements.joinedload(ChallengeStatement.evaluation)
+        session = (await db.scalars(
+            select(ChallengeSession)
+            .where(ChallengeSession.id == session_id)
+            .options(
+                evaluation.joinedload(ChallengeEvaluation.dimension_scores),
+                evaluation.joinedload(ChallengeEvaluation.research_references)
+            )
+        )).unique().one()
+        body = _build_session_detail(session).model_dump_json().encode("utf-8")
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        if status == "completed":
+            session_detail_cache.set(session_id, (status, body, etag))
+        else:
+            session_detail_cache.delete(session_id)
+
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 # ============================================================================
 # RESEARCH DOCUMENT ENDPOINTS
 # ============================================================================
 
 @app.get("/api/research-documents", response_model=List[ResearchDocumentResponse])
-def get_research_documents(db: Session = Depends(get_db_session)):
+async def get_research_documents(db: AsyncSession = Depends(get_async_db_session)):
     """List all research documents."""
-    docs = db.query(ResearchDocument).order_by(ResearchDocument.uploaded_at.desc()).all()
+    docs = (await db.scalars(
+        select(ResearchDocument).order_by(ResearchDocument.uploaded_at.desc())
+    )).all()
+    duplicates = await asyncio.to_thread(retrieval_index.duplicate_documents)
     
     return [
         ResearchDocumentResponse(
@@ -443,68 +680,113 @@ def get_research_documents(db: Session = Depends(get_db_session)):
             file_type=doc.file_type,
             description=doc.description,
             uploaded_at=doc.uploaded_at.isoformat() if doc.uploaded_at else "",
-            size_kb=doc.size_kb
+            size_kb=doc.size_kb,
+            ingestion_status=doc.ingestion_status,
+            duplicate_of=_duplicate_label(duplicates.get(research_index_key(doc.id)))
         )
         for doc in docs
     ]
 
+def _duplicate_label(index_name: Optional[str]) -> Optional[str]:
+    """Retrieval index document name as shown in the research listing."""
+    if index_name is None:
+        return None
+    prefix = research_index_key("")
+    return index_name[len(prefix):] if index_name.startswith(prefix) else f"documents/{index_name}"
+
+def _research_document_payload(doc: ResearchDocument, duplicate: bool = False) -> Dict[str, Any]:
+    return {
+        "id": doc.id,
+        "name": doc.name,
+        "type": doc.type,
+        "file_type": doc.file_type,
+        "description": doc.description,
+        "uploaded_at": doc.uploaded_at.strftime("%Y-%m-%d") if doc.uploaded_at else "",
+        "size_kb": doc.size_kb,
+        "content_hash": doc.content_hash,
+        "duplicate": duplicate,
+        "ingestion_job_id": doc.id,  # ingestion is tracked per document
+        "ingestion_status": doc.ingestion_status
+    }
+
 @app.post("/api/research-documents/upload")
 async def upload_research_document(
     file: UploadFile = File(...),
     type: str = Form(...),
     description: str = Form(None),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_async_db_session)
 ):
-    """Upload research document."""
-    
-    # Save file
-    upload_dir = Path("./data/research")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    file_path = upload_dir / file.filename
-    
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
+    """
+    Upload research document.
+
+    The file is streamed to content-addressed storage and queued for
+    background ingestion into Gemini; the response returns immediately with
+    the ingestion job id (poll GET /api/research-documents/{id}/ingestion).
+    Uploading a file whose content already exists returns the existing
+    document ("duplicate": true) without sending it to Gemini again.
+    """
+    stored = await store_upload(file, directory=RESEARCH_DIR)
+
+    existing = await db.scalar(
+        select(ResearchDocument).where(ResearchDocument.content_hash == stored.content_hash)
+    )
+    if existing:
+        if existing.ingestion_status == "failed":
+            # The earlier upload never reached Gemini; try again
+            existing.ingestion_status = "queued"
+            existing.ingestion_error = None
+            await db.commit()
+            ingestion.enqueue(existing.id)
+        return _research_document_payload(existing, duplicate=True)
+
     # Create DB record
     doc = ResearchDocument(
         name=file.filename,
         type=type,
         file_type=file.filename.split(".")[-1] if "." in file.filename else "unknown",
-        file_path=str(file_path),
+        file_path=str(stored.path),
         description=description,
-        size_kb=len(content) // 1024
+        size_kb=stored.size // 1024,
+        content_hash=stored.content_hash,
+        ingestion_status="queued"
     )
 
-    # --- GEMINI UPLOAD ---
+    db.add(doc)
     try:
-        from data_library.challenge_generator import upload_file_to_gemini_corpus
-        gemini_file = await upload_file_to_gemini_corpus(file_path, file.filename)
-        if gemini_file:
-             doc.gemini_file_id = gemini_file.name # Expected to be the "names/{id}" or "corpora/.../documents/{id}"
-             doc.gemini_uri = gemini_file.uri if hasattr(gemini_file, 'uri') else None
-    except Exception as e:
-        print(f"Gemini Upload Failed: {e}")
-        # We proceed even if Gemini fails, but maybe flag it? for now just log.
+        await db.commit()
+    except IntegrityError:
+        # A concurrent upload of the same content won the insert; use its row
+        await db.rollback()
+        existing = await db.scalar(
+            select(ResearchDocument).where(ResearchDocument.content_hash == stored.content_hash)
+        )
+        return _research_document_payload(existing, duplicate=True)
+    await db.refresh(doc)
 
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    # --- GEMINI UPLOAD (background) ---
+    ingestion.enqueue(doc.id)
     
-    return {
-        "id": doc.id,
-        "name": doc.name,
-        "type": doc.type,
-        "file_type": doc.file_type,
-        "description": doc.description,
-        "uploaded_at": doc.uploaded_at.strftime("%Y-%m-%d") if doc.uploaded_at else "",
-        "size_kb": doc.size_kb
-    }
+    return _research_document_payload(doc)
+
+@app.get("/api/research-documents/{doc_id}/ingestion", response_model=IngestionStatusResponse)
+async def get_ingestion_status(doc_id: str, db: AsyncSession = Depends(get_async_db_session)):
+    """Progress of a research document's background ingestion into Gemini."""
+    doc = await db.get(ResearchDocument, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return IngestionStatusResponse(
+        job_id=doc.id,
+        document_id=doc.id,
+        status=doc.ingestion_status,
+        attempts=doc.ingestion_attempts,
+        error=doc.ingestion_error,
+        gemini_file_id=doc.gemini_file_id
+    )
 
 @app.delete("/api/research-documents/{doc_id}")
-async def delete_research_document(doc_id: str, db: Session = Depends(get_db_session)):
+async def delete_research_document(doc_id: str, db: AsyncSession = Depends(get_async_db_session)):
     """Delete research document."""
-    doc = db.query(ResearchDocument).filter(ResearchDocument.id == doc_id).first()
+    doc = await db.get(ResearchDocument, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -516,6 +798,12 @@ async def delete_research_document(doc_id: str, db: Session = Depends(get_db_ses
         except Exception as e:
             print(f"Failed to sync delete to Gemini: {e}")
 
+    # Drop it from local retrieval
+    try:
+        await asyncio.to_thread(retrieval_index.remove_document, research_index_key(doc.id))
+    except Exception as e:
+        logger.error(f"Failed to remove {doc.id} from the retrieval index: {e}")
+
     # Delete file
     try:
         Path(doc.file_path).unlink(missing_ok=True)
@@ -523,8 +811,8 @@ async def delete_research_document(doc_id: str, db: Session = Depends(get_db_ses
         print(f"Failed to delete file: {e}")
     
     # Delete DB record
-    db.delete(doc)
-    db.commit()
+    await db.delete(doc)
+    await db.commit()
     
     return {"status": "deleted"}
 
@@ -536,10 +824,12 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "generate": "POST /api/generate-challenge-statements",
+            "diagnostics": "POST /api/diagnostics",
             "sessions": "GET /api/sessions",
             "session_detail": "GET /api/sessions/{id}",
             "research_docs": "GET /api/research-documents",
             "upload_doc": "POST /api/research-documents/upload",
+            "ingestion_status": "GET /api/research-documents/{id}/ingestion",
             "delete_doc": "DELETE /api/research-documents/{id}"
         }
     }
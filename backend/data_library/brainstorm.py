@@ -1,121 +1,77 @@
 
+import asyncio
 import json
 import re
 import logging
-from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any
 
-from google import genai
 from google.genai import types
-from data_library.config import GEMINI_API_KEY, GEMINI_THINKING_MODEL
-from data_library.file_search import list_files
+from data_library.config import (
+    GEMINI_THINKING_MODEL,
+    RETRIEVAL_BACKEND,
+    RETRIEVAL_SYNC_INTERVAL_SECONDS,
+    RETRIEVAL_HYBRID,
+    RRF_K,
+    EVIDENCE_CANDIDATES,
+    EVIDENCE_TOKEN_BUDGET,
+    EVIDENCE_MMR_LAMBDA
+)
+from data_library.llm import generate_content
+from data_library.llm_scheduler import Priority
+from data_library.chunking import Chunk, chunk_text, estimate_tokens  # noqa: F401 (Chunk, chunk_text re-exported)
+from data_library.retrieval_index import retrieval_index, reciprocal_rank_fusion
+from data_library.sparse_retrieval import SparseRetriever
+from data_library.ngram_retrieval import NgramRetriever
+from data_library.evidence_packing import format_evidence_entry, pack_evidence
 
 # Setup Logging
 logger = logging.getLogger("data_library.brainstorm")
 logging.basicConfig(level=logging.INFO)
 
-# Initialize Client
-client = genai.Client(api_key=GEMINI_API_KEY)
-
 # -----------------------------------------------------------------------------
 # 1. Local RAG Retrieval (Chunks)
 # -----------------------------------------------------------------------------
 
-class Chunk:
-    def __init__(self, chunk_id: str, text: str, source: str, location: str):
-        self.chunk_id = chunk_id
-        self.text = text
-        self.source = source
-        self.location = location
-
-def chunk_text(text: str, source_name: str, chunk_size: int = 500) -> List[Chunk]:
-    """Simple paragraph-based chunking."""
-    chunks = []
-    paragraphs = text.split('\n\n')
-    current_chunk = []
-    current_length = 0
-    chunk_idx = 0
+# The persistent index (retrieval_index) covers ./data/documents, synced incrementally
+# when a query finds it stale, plus research uploads indexed at ingestion
+sparse_retriever = SparseRetriever(retrieval_index)
+ngram_retriever = NgramRetriever(retrieval_index)
 
-    for para in paragraphs:
-        if not para.strip():
-            continue
-        
-        current_chunk.append(para)
-        current_length += len(para)
-
-        if current_length >= chunk_size:
-            chunk_text_str = "\n".join(current_chunk)
-            chunk_id = f"{source_name}_chk_{chunk_idx}"
-            chunks.append(Chunk(chunk_id, chunk_text_str, source_name, f"Segment {chunk_idx}"))
-            chunk_idx += 1
-            current_chunk = []
-            current_length = 0
-    
-    # Leftover
-    if current_chunk:
-        chunk_text_str = "\n".join(current_chunk)
-        chunk_id = f"{source_name}_chk_{chunk_idx}"
-        chunks.append(Chunk(chunk_id, chunk_text_str, source_name, f"Segment {chunk_idx}"))
-
-    return chunks
+# Each retriever contributes this many candidates (at least) to rank fusion
+FUSION_CANDIDATES = 50
 
 def retrieve_chunks(query: str, top_k: int = 12) -> List[Dict[str, Any]]:
     """
-    Simulated RAG: Reads local documents, chunks them, and performs a 
-    simple keyword/overlap search to find relevant segments.
+    Local RAG: brings the document index up to date if it was last synced more
+    than RETRIEVAL_SYNC_INTERVAL_SECONDS ago (only added / changed / deleted
+    files are processed) and returns the top-k chunks by BM25 score,
+    or with RETRIEVAL_HYBRID by BM25 and character n-gram similarity fused by
+    reciprocal rank.
     """
-    # 1. Load Documents
-    docs_dir = Path("./data/documents")
-    if not docs_dir.exists():
-        return []
-
-    all_chunks: List[Chunk] = []
-
-    # Read supported files
-    for file_path in docs_dir.glob("*"):
-        if file_path.suffix.lower() in ['.txt', '.md', '.json']:
-            try:
-                text = file_path.read_text(encoding='utf-8', errors='ignore')
-                all_chunks.extend(chunk_text(text, file_path.name))
-            except Exception as e:
-                logger.error(f"Failed to read {file_path}: {e}")
-    
-    if not all_chunks:
+    try:
+        retrieval_index.sync_if_stale(RETRIEVAL_SYNC_INTERVAL_SECONDS)
+        lexical = sparse_retriever if RETRIEVAL_BACKEND == "matrix" else retrieval_index
+        if RETRIEVAL_HYBRID:
+            candidates = max(top_k, FUSION_CANDIDATES)
+            results = reciprocal_rank_fusion([
+                lexical.search(query, top_k=candidates),
+                ngram_retriever.search(query, top_k=candidates)
+            ], k=RRF_K)[:top_k]
+        else:
+            results = lexical.search(query, top_k=top_k)
+    except Exception as e:
+        logger.error(f"Retrieval failed: {e}")
         return []
 
-    # 2. Score Chunks (Simple TF-IDF / Overlap)
-    # For MVP simplicity without heavy deps, we count query term occurrences.
-    query_terms = set(query.lower().split())
-    scored_chunks = []
-
-    for chunk in all_chunks:
-        score = 0
-        chunk_lower = chunk.text.lower()
-        for term in query_terms:
-            if term in chunk_lower:
-                score += 1
-        
-        # Boost close matches
-        if query.lower() in chunk_lower:
-            score += 5
-
-        if score > 0:
-            scored_chunks.append((score, chunk))
-    
-    # 3. Sort and Return
-    scored_chunks.sort(key=lambda x: x[0], reverse=True)
-    top_chunks = scored_chunks[:top_k]
-
     return [
         {
             "chunk_id": c.chunk_id,
             "text": c.text,  # The snippet
             "source_title": c.source,
             "location_label": c.location,
-            "score": s
+            "score": c.score
         }
-        for s, c in top_chunks
+        for c in results
     ]
 
 # -----------------------------------------------------------------------------
@@ -234,17 +190,28 @@ async def run_brainstorm_session(
     marketing_brief: str, 
     lifecycle_stage: str, 
     audience: str, 
-    statements: List[str]
+    statements: List[str],
+    use_cache: bool = True
 ) -> Dict[str, Any]:
     
-    # 1. Retrieve Evidence
+    # 1. Retrieve Evidence, then pack a diverse subset into the token budget
     query = f"{marketing_brief} {audience} " + " ".join(statements)
-    evidence_chunks = retrieve_chunks(query, top_k=15)
+    # Sync and search are blocking (SQLite, file extraction), so keep them off the event loop
+    candidates = await asyncio.to_thread(retrieve_chunks, query, top_k=EVIDENCE_CANDIDATES)
+    evidence_chunks, dropped = pack_evidence(candidates)
     
     # Format chunks for Prompt
-    chunks_str = ""
-    for c in evidence_chunks:
-        chunks_str += f"[Chunk ID: {c['chunk_id']}] (Source: {c['source_title']} {c['location_label']})\n{c['text']}\n---\n"
+    chunks_str = "".join(format_evidence_entry(c) for c in evidence_chunks)
+    # Stored as BrainstormRun.retrieval_params by callers that persist the run
+    retrieval_params = {
+        "top_k": EVIDENCE_CANDIDATES,
+        "token_budget": EVIDENCE_TOKEN_BUDGET,
+        "mmr_lambda": EVIDENCE_MMR_LAMBDA,
+        "candidates": len(candidates),
+        "selected": [c["chunk_id"] for c in evidence_chunks],
+        "evidence_tokens": sum(estimate_tokens(format_evidence_entry(c)) for c in evidence_chunks),
+        "dropped": dropped
+    }
         
     if not chunks_str:
         chunks_str = "NO DOCUMENTS FOUND IN LIBRARY. RELY ON ASSUMPTIONS AND FLAG AS MISSING EVIDENCE."
@@ -266,14 +233,16 @@ async def run_brainstorm_session(
 
     # 3. Call Gemini
     try:
-        response = client.models.generate_content(
+        response = await generate_content(
             model=GEMINI_THINKING_MODEL,
             contents=user_prompt,
             config=types.GenerateContentConfig(
                 system_instruction=system_inst,
                 temperature=0.4, # Lower temp for strict logic
                 thinking_config=types.ThinkingConfig(include_thoughts=True)
-            )
+            ),
+            priority=Priority.INTERACTIVE,
+            use_cache=use_cache
         )
         
         # 4. Parse Response & Thoughts
@@ -344,13 +313,14 @@ async def run_brainstorm_session(
                 if "rubric" in cand:
                     cand["weighted_score"] = compute_score(cand["rubric"])
                     
-            return {"output": data, "evidence": evidence_chunks}
+            return {"output": data, "evidence": evidence_chunks, "retrieval_params": retrieval_params}
             
         except json.JSONDecodeError as je:
             logger.error(f"JSON Parse Error: {je}")
             # If parse fails, return raw logic so we can debug
-            return {"error": "Failed to parse JSON", "raw": json_text, "thoughts": thoughts}
+            return {"error": "Failed to parse JSON", "raw": json_text, "thoughts": thoughts,
+                    "retrieval_params": retrieval_params}
 
     except Exception as e:
         logger.error(f"Gemini Error: {e}")
-        return {"error": str(e)}
+        return {"error": str(e), "retrieval_params": retrieval_params}
@@ -8,27 +8,22 @@ Implements:
 4. 8-dimension evaluation framework
 """
 
-from google import genai
 from google.genai import types
-from data_library.config import GEMINI_API_KEY
-from typing import List, Dict, Any, AsyncGenerator
+from data_library.llm import get_client, generate_content, generate_content_stream
+from data_library.llm_scheduler import Priority
+from data_library.llm_cache import CacheStats, TwoLevelCache
+from data_library.research_context import research_context_cache
+from data_library.config import BRIEF_TEMPLATES_PATH
+from typing import List, Dict, Any, AsyncGenerator, Optional
+import hashlib
 import json
 import logging
 import asyncio
+import re
 import time
 
 logger = logging.getLogger(__name__)
 
-# Lazy client initialization to avoid blocking on module import
-_client = None
-
-def get_client():
-    """Get or create Gemini client (lazy initialization)."""
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=GEMINI_API_KEY)
-    return _client
-
 # Model configuration
 # Model configuration
 # Using stable gemini-1.5-pro for reasoning tasks
@@ -188,6 +183,94 @@ EVALUATION_DIMENSIONS = {
     }
 }
 
+# ============================================================================
+# SPECULATIVE FORMAT GENERATION
+# ============================================================================
+
+SPECULATIVE_REASONING = "Likely format for this brief (generated while the diagnostic was running)."
+
+class SpeculativeGeneration:
+    """
+    Generates likely formats while the diagnostic runs.
+
+    Once the diagnostic selects its formats, resolve() keeps the speculative
+    tasks it confirms and cancels the rest; workers pick confirmed results up
+    with take(). metrics() reports hit rate and the generation time that
+    overlapped the diagnostic (i.e. was saved from the critical path).
+
+    Speculative statements are conditioned on SPECULATIVE_REASONING, not on the
+    diagnostic's reasoning for the format, so they are not what the regular
+    path would produce; process_single_challenge_stream reports them with the
+    reasoning they were actually generated from and flags them as speculative.
+
+    research_context is the task resolving the cached research context
+    (research_context_cache.get_handle); each speculative call waits for it.
+    """
+
+    def __init__(self, formats, brief_text, research_files, model_name, research_context, use_cache=True,
+                 cache_stats=None):
+        self.started_at = time.time()
+        self.resolved_at = None
+        self.formats = [f for f in dict.fromkeys(formats) if f in CHALLENGE_FORMATS]
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.finished_at: Dict[str, float] = {}
+        self.hits: List[str] = []
+
+        async def speculate(fmt_id):
+            # Shielded: cancelling one speculative call must not cancel the shared lookup
+            cached_content, _ = await asyncio.shield(research_context)
+            return await generate_single_statement_with_ai(
+                brief_text=brief_text,
+                format_id=fmt_id,
+                reasoning=SPECULATIVE_REASONING,
+                research_files=None if cached_content else research_files,
+                model_name=model_name,
+                use_cache=use_cache,
+                cached_content=cached_content,
+                cache_stats=cache_stats
+            )
+
+        for fmt_id in self.formats:
+            task = asyncio.create_task(speculate(fmt_id))
+            task.add_done_callback(lambda _, f=fmt_id: self.finished_at.setdefault(f, time.time()))
+            self.tasks[fmt_id] = task
+        if self.formats:
+            logger.info(f"Speculatively generating formats: {self.formats}")
+
+    def resolve(self, selected_formats: List[str]):
+        """Keep tasks for formats the diagnostic selected, cancel the others."""
+        self.resolved_at = time.time()
+        for fmt_id, task in list(self.tasks.items()):
+            if fmt_id in selected_formats:
+                self.hits.append(fmt_id)
+            else:
+                task.cancel()
+                del self.tasks[fmt_id]
+
+    def take(self, fmt_id: str) -> Optional[asyncio.Task]:
+        """Hand a confirmed speculative task to the worker for this format (once)."""
+        return self.tasks.pop(fmt_id, None)
+
+    def cancel_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        if not self.formats:
+            return {}
+        resolved_at = self.resolved_at or time.time()
+        saved = sum(
+            min(self.finished_at.get(f, resolved_at), resolved_at) - self.started_at
+            for f in self.hits
+        )
+        return {
+            "speculative_formats": self.formats,
+            "speculation_hits": len(self.hits),
+            "speculation_hit_rate": round(len(self.hits) / len(self.formats), 2),
+            "speculation_saved_ms": int(saved * 1000)
+        }
+
 # ============================================================================
 # MAIN GENERATION STREAMING FUNCTION
 # ============================================================================
@@ -199,7 +282,11 @@ async def generate_challenges_stream(
     research_docs: List[Dict[str, str]] = None,
     session=None, # Accepted but not used directly here (handled by wrapper)
     db=None, # Accepted but not used directly here
-    model_config: Dict[str, str] = None
+    model_config: Dict[str, str] = None,
+    use_cache: bool = True,
+    batch_evaluation: bool = False,
+    stream_text: bool = True,
+    speculative_formats: List[str] = None
 ) -> AsyncGenerator[str, None]:
     """
     Generator that streams execution progress and results as JSON events.
@@ -207,8 +294,18 @@ async def generate_challenges_stream(
     Yields JSON strings:
     {"type": "diagnostic", "data": {...}}
     {"type": "challenge_result", "data": {...}}
+
+    Pass use_cache=False to bypass the LLM response cache (fresh sampling).
+    With batch_evaluation=True all statements are scored in a single call once
+    generation finishes, then fanned out as per-statement evaluation events.
+    With stream_text=True, partial statement text is emitted as
+    {"type": "challenge_generation_delta"} events while each statement generates.
+    speculative_formats (e.g. historically most frequent formats) start generating
+    in parallel with the diagnostic; results the diagnostic confirms are kept and
+    the rest are cancelled.
     """
     logger.info(f"Generating challenges (stream) for brief length: {len(brief_text)}")
+    cache_stats = CacheStats()
 
     # Prepare Research Files (Long Context)
     # Step 0: Retrieval Context Setup
@@ -234,19 +331,48 @@ async def generate_challenges_stream(
                     logger.info(f"Added context: {doc.get('name')} ({mime_type})")
                 except Exception as e:
                     logger.error(f"Failed to create part for {doc.get('name')}: {e}")
-    retrieval_duration = time.time() - retrieval_start
-
 
-    # Step 1: Run Diagnostic
-    start_time = time.time()
-    
     # Use configured model or default
     diagnostic_model = model_config.get("diagnostic_model", GEMINI_PRO_MODEL) if model_config else GEMINI_PRO_MODEL
     logger.info(f"Using Diagnostic Model: {diagnostic_model}")
     
-    diagnostic_result = await run_diagnostic_tree_with_llm(brief_text, model_name=diagnostic_model)
+    # Get models for the generation / evaluation stages
+    gen_model = model_config.get("generation_model", GEMINI_PRO_MODEL) if model_config else GEMINI_PRO_MODEL
+    eval_model = model_config.get("evaluation_model", GEMINI_PRO_MODEL) if model_config else GEMINI_PRO_MODEL
+
+    retrieval_duration = time.time() - retrieval_start
+
+    # Step 1: Run Diagnostic
+    start_time = time.time()
+
+    # Reference the research documents through one cached context instead of
+    # re-sending them with every generation call (falls back to inline parts).
+    # Only generation needs it, so it is created while the diagnostic runs.
+    research_context = asyncio.create_task(research_context_cache.get_handle(gen_model, research_files))
+
+    # Speculative generation overlaps the diagnostic
+    speculation = SpeculativeGeneration(
+        formats=speculative_formats or [],
+        brief_text=brief_text,
+        research_files=research_files,
+        model_name=gen_model,
+        research_context=research_context,
+        use_cache=use_cache,
+        cache_stats=cache_stats
+    )
+    
+    try:
+        diagnostic_result = await get_diagnostic(
+            brief_text, model_name=diagnostic_model, use_cache=use_cache, cache_stats=cache_stats
+        )
+    except BaseException:
+        speculation.cancel_all()
+        research_context.cancel()
+        raise
     
-    selected_formats = [f["format_id"] for f in diagnostic_result["selected_formats"]]
+    # Collapse duplicates (e.g. the fallback diagnostic repeats F01) so each format is generated once
+    selected_formats = list(dict.fromkeys(f["format_id"] for f in diagnostic_result["selected_formats"]))
+    speculation.resolve(selected_formats)
     
     # 1. Yield Diagnostic Result immediately
     yield json.dumps({
@@ -263,10 +389,16 @@ async def generate_challenges_stream(
     
     diagnostic_duration = time.time() - start_time
     logger.info(f"Diagnostic yielded after {diagnostic_duration:.2f}s")
+
+    # Usually already resolved; any remaining wait is on the critical path
+    context_wait_start = time.time()
+    cached_content, research_cache_status = await research_context
+    research_context_wait_ms = int((time.time() - context_wait_start) * 1000)
+    generation_files = None if cached_content else research_files
     
     # Step 2: Parallel Generation & Evaluation (Interleaved Streams)
     queue = asyncio.Queue()
-    
+
     async def worker(idx, fmt_id):
         try:
              # Find reasoning
@@ -274,10 +406,6 @@ async def generate_challenges_stream(
                 (f["reasoning"] for f in diagnostic_result["selected_formats"] if f["format_id"] == fmt_id),
                 "Selected by diagnostic"
             )
-            
-            # Get models for this stage
-            gen_model = model_config.get("generation_model", GEMINI_PRO_MODEL) if model_config else GEMINI_PRO_MODEL
-            eval_model = model_config.get("evaluation_model", GEMINI_PRO_MODEL) if model_config else GEMINI_PRO_MODEL
 
             async for event in process_single_challenge_stream(
                 idx=idx+1,
@@ -285,10 +413,16 @@ async def generate_challenges_stream(
                 brief_text=brief_text,
                 include_research=include_research,
                 research_ids=selected_research_ids,
-                research_files=research_files,
+                research_files=generation_files,
                 reasoning=reasoning,
                 generation_model=gen_model,
-                evaluation_model=eval_model
+                evaluation_model=eval_model,
+                use_cache=use_cache,
+                evaluate=not batch_evaluation,
+                stream_text=stream_text,
+                pregenerated=speculation.take(fmt_id),
+                cached_content=cached_content,
+                cache_stats=cache_stats
             ):
                 await queue.put(json.dumps(event))
         except Exception as e:
@@ -310,14 +444,50 @@ async def generate_challenges_stream(
     # Consumer loop: Wait for all workers to send None
     completed_workers = 0
     total_workers = len(worker_tasks)
+    generated = []  # Statements awaiting batched evaluation
     
     while completed_workers < total_workers:
         item = await queue.get()
         if item is None:
             completed_workers += 1
         else:
+            if batch_evaluation:
+                event = json.loads(item)
+                if event["type"] == "challenge_generation":
+                    generated.append(event["data"])
             yield item
 
+    # Step 3 (batch mode): one evaluation call for every statement, fanned back out
+    batch_eval_ms = None
+    if batch_evaluation and generated:
+        generated.sort(key=lambda d: d["position"])
+        eval_start = time.time()
+        evaluations = await evaluate_statements_batch_with_ai(
+            statements=[{"position": d["position"], "text": d["text"]} for d in generated],
+            brief_text=brief_text,
+            include_research=include_research,
+            model_name=eval_model,
+            use_cache=use_cache,
+            cache_stats=cache_stats
+        )
+        batch_eval_ms = int((time.time() - eval_start) * 1000)
+        for stmt in generated:
+            evaluation = evaluations[stmt["position"]]
+            yield json.dumps({
+                "type": "challenge_evaluation",
+                "data": {
+                    "id": stmt["id"],
+                    "text": stmt["text"],
+                    "selected_format": stmt["selected_format"],
+                    "evaluation": evaluation,
+                    "evaluation_time_ms": batch_eval_ms,
+                    "eval_model": evaluation.get("model_name"),
+                    "eval_input_tokens": evaluation.get("input_tokens", 0),
+                    "eval_output_tokens": evaluation.get("output_tokens", 0),
+                    "status": "complete"
+                }
+            })
+
     # Final Timing Metrics
     total_duration = time.time() - start_time
     
@@ -326,10 +496,16 @@ async def generate_challenges_stream(
         "data": {
             "total_latency_ms": int((total_duration + retrieval_duration) * 1000),
             "diagnostic_ms": int(diagnostic_duration * 1000),
+            "diagnostic_cached": diagnostic_result.get("cached", False),
+            "batch_evaluation_ms": batch_eval_ms,
+            **speculation.metrics(),
             "retrieval_ms": int(retrieval_duration * 1000),
+            "research_context_cache": research_cache_status if research_files else None,
+            "research_context_wait_ms": research_context_wait_ms,
             "diagnostic_model": diagnostic_model,
             "diagnostic_input_tokens": diagnostic_result.get("input_tokens", 0),
-            "diagnostic_output_tokens": diagnostic_result.get("output_tokens", 0)
+            "diagnostic_output_tokens": diagnostic_result.get("output_tokens", 0),
+            **cache_stats.as_metrics()
         }
     })
 
@@ -342,25 +518,73 @@ async def process_single_challenge_stream(
     reasoning: str,
     research_files: List[Any] = None,
     generation_model: str = GEMINI_PRO_MODEL,
-    evaluation_model: str = GEMINI_PRO_MODEL
+    evaluation_model: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    evaluate: bool = True,
+    stream_text: bool = False,
+    pregenerated: Optional[asyncio.Task] = None,
+    cached_content: Optional[str] = None,
+    cache_stats: Optional[CacheStats] = None
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Generates AND evaluates a single challenge statement, yielding results as they happen.
     Yields:
+    0. {"type": "challenge_generation_delta", "data": {...}} (zero or more, when stream_text=True)
     1. {"type": "challenge_generation", "data": {...}}
-    2. {"type": "challenge_evaluation", "data": {...}}
+    2. {"type": "challenge_evaluation", "data": {...}} (skipped when evaluate=False)
+
+    pregenerated: a speculative generation task for this format (conditioned on
+    SPECULATIVE_REASONING), used instead of generating again. Its statement is
+    reported with that reasoning, "speculative": True and the diagnostic's own
+    reasoning under "diagnostic_reasoning".
+    cached_content: cached research context to reference instead of research_files.
     """
     gen_start = time.time()
     try:
         # A. Generate Statement
         print(f"DEBUG: Starting generation for {format_id}")
-        statement_data = await generate_single_statement_with_ai(
-            brief_text=brief_text,
-            format_id=format_id,
-            reasoning=reasoning,
-            research_files=research_files,
-            model_name=generation_model
-        )
+        # The reasoning the statement is actually conditioned on
+        generated_from = reasoning
+        if pregenerated is not None:
+            statement_data = await pregenerated
+            generated_from = SPECULATIVE_REASONING
+        elif stream_text:
+            statement_data = None
+            async for update in stream_single_statement_with_ai(
+                brief_text=brief_text,
+                format_id=format_id,
+                reasoning=reasoning,
+                research_files=research_files,
+                model_name=generation_model,
+                use_cache=use_cache,
+                cached_content=cached_content,
+                cache_stats=cache_stats
+            ):
+                if "result" in update:
+                    statement_data = update["result"]
+                    continue
+                yield {
+                    "type": "challenge_generation_delta",
+                    "data": {
+                        "id": idx,
+                        "text": update["partial_text"],
+                        "selected_format": format_id,
+                        "reasoning": reasoning,
+                        "position": idx,
+                        "status": "generating"
+                    }
+                }
+        else:
+            statement_data = await generate_single_statement_with_ai(
+                brief_text=brief_text,
+                format_id=format_id,
+                reasoning=reasoning,
+                research_files=research_files,
+                model_name=generation_model,
+                use_cache=use_cache,
+                cached_content=cached_content,
+                cache_stats=cache_stats
+            )
         gen_duration = (time.time() - gen_start) * 1000
         
         # Yield Partial Result (Generation Only)
@@ -370,7 +594,9 @@ async def process_single_challenge_stream(
                 "id": idx,
                 "text": statement_data["text"],
                 "selected_format": format_id,
-                "reasoning": reasoning,
+                "reasoning": generated_from,
+                "speculative": generated_from != reasoning,
+                "diagnostic_reasoning": reasoning,
                 "position": idx,
                 "generation_time_ms": int(gen_duration),
                 "evaluation_time_ms": None, # Pending
@@ -381,6 +607,8 @@ async def process_single_challenge_stream(
             }
         }
         yield gen_event
+        if not evaluate:
+            return
         
         # B. Evaluate Statement
         print(f"DEBUG: Starting evaluation for {format_id}")
@@ -389,7 +617,9 @@ async def process_single_challenge_stream(
             statement_text=statement_data["text"],
             brief_text=brief_text,
             include_research=include_research,
-            model_name=evaluation_model
+            model_name=evaluation_model,
+            use_cache=use_cache,
+            cache_stats=cache_stats
         )
         eval_duration = (time.time() - eval_start) * 1000
         
@@ -426,7 +656,13 @@ async def process_single_challenge_stream(
 # LLM-BASED DIAGNOSTIC DECISION TREE (Gemini 3 Pro)
 # ============================================================================
 
-async def run_diagnostic_tree_with_llm(brief_text: str, model_name: str = GEMINI_PRO_MODEL) -> Dict[str, Any]:
+async def run_diagnostic_tree_with_llm(
+    brief_text: str,
+    model_name: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+    cache_stats: Optional[CacheStats] = None
+) -> Dict[str, Any]:
     """
     Use Gemini to analyze brief and select formats intelligently.
     """
@@ -492,37 +728,18 @@ Return structured JSON with:
 Be specific and cite evidence from the brief in your reasoning."""
 
     try:
-        try:
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: get_client().models.generate_content(
-                    model=model_name,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        response_mime_type="application/json",
-                        response_schema=get_diagnostic_schema(),
-                        temperature=0.3
-                    )
-                )
-            )
-        except Exception as e:
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                logger.warning(f"Rate limit hit for {model_name}, switching to {GEMINI_FLASH_MODEL}")
-                model_name = GEMINI_FLASH_MODEL
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: get_client().models.generate_content(
-                        model=GEMINI_FLASH_MODEL,
-                        contents=prompt,
-                        config=types.GenerateContentConfig(
-                            response_mime_type="application/json",
-                            response_schema=get_diagnostic_schema(),
-                            temperature=0.3
-                        )
-                    )
-                )
-            else:
-                raise e
+        response = await generate_content(
+            model=model_name,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=get_diagnostic_schema(),
+                temperature=0.3
+            ),
+            priority=priority,
+            use_cache=use_cache,
+            cache_stats=cache_stats
+        )
             
         result = json.loads(response.text)
         
@@ -575,22 +792,80 @@ Be specific and cite evidence from the brief in your reasoning."""
 
 
 # ============================================================================
-# SINGLE STATEMENT GENERATION (Gemini 3 Pro)
+# DIAGNOSTIC RESULT CACHE
 # ============================================================================
 
-async def generate_single_statement_with_ai(
+# Diagnostic results keyed on model + normalized brief text
+diagnostic_cache = TwoLevelCache("diagnostic_results", metric_name="diagnostic_cache")
+
+def normalize_brief(brief_text: str) -> str:
+    """Collapse whitespace so trivially reformatted briefs share a cache entry."""
+    return " ".join(brief_text.split())
+
+def diagnostic_cache_key(brief_text: str, model_name: str) -> str:
+    """Cache key for a diagnostic run of this brief on this model."""
+    payload = f"{model_name}\n{normalize_brief(brief_text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def get_diagnostic(
     brief_text: str,
-    format_id: str,
-    reasoning: str,
-    research_files: List[Any] = None,
-    model_name: str = GEMINI_PRO_MODEL
+    model_name: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+    cache_stats: Optional[CacheStats] = None
 ) -> Dict[str, Any]:
     """
-    Generates a SINGLE challenge statement for a specific format, optionally utilizing research files.
+    Run the diagnostic decision tree, serving repeated briefs from the diagnostic cache.
+
+    Cached results are returned with "cached": True and zero token counts (the
+    tokens were paid by the run that filled the cache). Failed runs are never cached.
+    """
+    key = diagnostic_cache_key(brief_text, model_name)
+    if use_cache:
+        cached = await diagnostic_cache.get(key, cache_stats)
+        if cached is not None:
+            return {**cached, "cached": True, "input_tokens": 0, "output_tokens": 0}
+
+    result = await run_diagnostic_tree_with_llm(
+        brief_text, model_name=model_name, use_cache=use_cache, priority=priority, cache_stats=cache_stats
+    )
+    if result.get("model_name") != "error":
+        await diagnostic_cache.set(key, result)
+    return {**result, "cached": False}
+
+def load_brief_templates(path=BRIEF_TEMPLATES_PATH) -> List[str]:
+    """Extract the stock brief texts from the frontend's brief-templates.ts."""
+    try:
+        source = path.read_text(encoding="utf-8")
+    except OSError as e:
+        logger.warning(f"Brief templates not found at {path}: {e}")
+        return []
+    return re.findall(r"content:\s*`([^`]*)`", source)
+
+async def precompute_template_diagnostics(model_name: str = GEMINI_PRO_MODEL) -> int:
     """
+    Warm the diagnostic cache for the stock brief templates.
+
+    Runs in the background lane so it never competes with interactive traffic.
+    Returns the number of templates processed.
+    """
+    templates = load_brief_templates()
+    logger.info(f"Precomputing diagnostics for {len(templates)} brief templates...")
+    for brief_text in templates:
+        try:
+            await get_diagnostic(brief_text, model_name=model_name, priority=Priority.BACKGROUND)
+        except Exception as e:
+            logger.error(f"Template diagnostic precompute failed: {e}")
+    return len(templates)
+
+# ============================================================================
+# SINGLE STATEMENT GENERATION (Gemini 3 Pro)
+# ============================================================================
+
+def build_generation_prompt(brief_text: str, format_id: str, reasoning: str) -> str:
+    """Prompt for generating one statement in a given format."""
     format_def = CHALLENGE_FORMATS[format_id]
-    
-    prompt = f"""You are an expert pharmaceutical brand strategist. Generate a strategic challenge statement for a marketing brief.
+    return f"""You are an expert pharmaceutical brand strategist. Generate a strategic challenge statement for a marketing brief.
 
 MARKETING BRIEF:
 {brief_text}
@@ -613,49 +888,101 @@ Return JSON:
   "reasoning_check": "Short self-check on why this fits..."
 }}"""
 
+def get_generation_config(cached_content: Optional[str] = None) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        temperature=0.7,
+        response_mime_type="application/json",
+        cached_content=cached_content
+    )
+
+def parse_json_response(response_text: str) -> Dict[str, Any]:
+    """Parse a JSON model response, tolerating markdown code fences."""
+    response_text = response_text.strip()
+    if response_text.startswith("```"):
+        response_text = response_text.split("```")[1]
+        if response_text.startswith("json"):
+            response_text = response_text[4:]
+    return json.loads(response_text)
+
+def fallback_statement(format_id: str) -> Dict[str, Any]:
+    """Placeholder statement used when generation fails."""
+    return {
+        "text": f"How can we apply {CHALLENGE_FORMATS[format_id]['name']} to this challenge?",
+        "format_id": format_id,
+        "model_name": "error",
+        "input_tokens": 0,
+        "output_tokens": 0
+    }
+
+def extract_partial_json_string(buffer: str, key: str = "text") -> str:
+    """
+    Best-effort decode of a string value from an incomplete JSON object.
+
+    Used while streaming: '{"text": "How can we he' -> 'How can we he'.
+    Returns "" until the value has started.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), buffer)
+    if not match:
+        return ""
+    raw = []
+    i = match.end()
+    while i < len(buffer):
+        ch = buffer[i]
+        if ch == "\\":
+            if i + 1 >= len(buffer):
+                break  # Incomplete escape, wait for more data
+            if buffer[i + 1] == "u":
+                if i + 6 > len(buffer):
+                    break
+                raw.append(buffer[i:i + 6])
+                i += 6
+                continue
+            raw.append(buffer[i:i + 2])
+            i += 2
+            continue
+        if ch == '"':
+            break
+        raw.append(ch)
+        i += 1
     try:
-        try:
-            contents = [prompt]
-            if research_files:
-                # Append file objects/parts to the content list (Long Context)
-                contents.extend(research_files)
-
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: get_client().models.generate_content(
-                    model=GEMINI_PRO_MODEL,
-                    contents=contents,
-                    config=types.GenerateContentConfig(
-                        temperature=0.7,
-                        response_mime_type="application/json"
-                    )
-                )
-            )
-        except Exception as e:
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                logger.warning(f"Rate limit hit for {GEMINI_PRO_MODEL}, switching to {GEMINI_FLASH_MODEL}")
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: get_client().models.generate_content(
-                        model=GEMINI_FLASH_MODEL,
-                        contents=contents,
-                        config=types.GenerateContentConfig(
-                            temperature=0.7,
-                            response_mime_type="application/json"
-                        )
-                    )
-                )
-            else:
-                raise e
-            
-        response_text = response.text.strip()
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-        
+        return json.loads('"' + "".join(raw) + '"')
+    except ValueError:
+        return ""
+
+async def generate_single_statement_with_ai(
+    brief_text: str,
+    format_id: str,
+    reasoning: str,
+    research_files: List[Any] = None,
+    model_name: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    cached_content: Optional[str] = None,
+    cache_stats: Optional[CacheStats] = None
+) -> Dict[str, Any]:
+    """
+    Generates a SINGLE challenge statement for a specific format, optionally utilizing research files.
+
+    cached_content: name of a cached research context (see research_context);
+    when given, research_files should be None since the cache already holds them.
+    """
+    prompt = build_generation_prompt(brief_text, format_id, reasoning)
+
+    try:
+        contents = [prompt]
+        if research_files:
+            # Append file objects/parts to the content list (Long Context)
+            contents.extend(research_files)
+
+        response = await generate_content(
+            model=model_name,
+            contents=contents,
+            config=get_generation_config(cached_content),
+            priority=Priority.GENERATION,
+            use_cache=use_cache,
+            cache_stats=cache_stats
+        )
         
-        data = json.loads(response_text)
+        data = parse_json_response(response.text)
         
         # Capture usage
         usage = response.usage_metadata
@@ -665,19 +992,66 @@ Return JSON:
         return {
             "text": data.get("text", "Error generating text"),
             "format_id": format_id,
-            "model_name": GEMINI_PRO_MODEL,
+            "model_name": model_name,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens
         }
     except Exception as e:
         logger.error(f"Single statement gen failed for {format_id}: {e}")
-        return {
-            "text": f"How can we apply {format_def['name']} to this challenge?",
+        return fallback_statement(format_id)
+
+async def stream_single_statement_with_ai(
+    brief_text: str,
+    format_id: str,
+    reasoning: str,
+    research_files: List[Any] = None,
+    model_name: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    cached_content: Optional[str] = None,
+    cache_stats: Optional[CacheStats] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Streaming variant of generate_single_statement_with_ai.
+
+    Yields {"partial_text": "..."} each time more of the statement text has
+    arrived, then a final {"result": {...}} with the same shape as the
+    non-streaming function.
+    """
+    prompt = build_generation_prompt(brief_text, format_id, reasoning)
+    contents = [prompt]
+    if research_files:
+        contents.extend(research_files)
+
+    buffer = ""
+    partial_text = ""
+    usage = None
+    try:
+        async for chunk in generate_content_stream(
+            model=model_name,
+            contents=contents,
+            config=get_generation_config(cached_content),
+            priority=Priority.GENERATION,
+            use_cache=use_cache,
+            cache_stats=cache_stats
+        ):
+            buffer += chunk.text or ""
+            usage = chunk.usage_metadata or usage
+            text_so_far = extract_partial_json_string(buffer)
+            if len(text_so_far) > len(partial_text):
+                partial_text = text_so_far
+                yield {"partial_text": partial_text}
+
+        data = parse_json_response(buffer)
+        yield {"result": {
+            "text": data.get("text", "Error generating text"),
             "format_id": format_id,
-            "model_name": "error",
-            "input_tokens": 0,
-            "output_tokens": 0
-        }
+            "model_name": model_name,
+            "input_tokens": usage.prompt_token_count if usage else 0,
+            "output_tokens": usage.candidates_token_count if usage else 0
+        }}
+    except Exception as e:
+        logger.error(f"Streaming statement gen failed for {format_id}: {e}")
+        yield {"result": fallback_statement(format_id)}
 
 # ============================================================================
 # EVALUATION (Gemini 3 Pro)
@@ -688,21 +1062,16 @@ async def evaluate_statement_with_ai(
     statement_text: str,
     brief_text: str,
     include_research: bool,
-    model_name: str = GEMINI_PRO_MODEL
+    model_name: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    cache_stats: Optional[CacheStats] = None
 ) -> Dict[str, Any]:
     """
     Use Gemini to evaluate statement on 8 dimensions AND detect its format.
     """
     
-    dimensions_info = "\n".join([
-        f"{d_id} - {EVALUATION_DIMENSIONS[d_id]['name']} (Weight: {EVALUATION_DIMENSIONS[d_id]['weight']}, Critical: {EVALUATION_DIMENSIONS[d_id]['non_negotiable']})"
-        for d_id in EVALUATION_DIMENSIONS.keys()
-    ])
-    
-    format_descriptions = "\n".join([
-        f"{f_id} - {CHALLENGE_FORMATS[f_id]['name']}"
-        for f_id in CHALLENGE_FORMATS.keys()
-    ])
+    dimensions_info = get_dimensions_info()
+    format_descriptions = get_format_names()
     
     prompt = f"""You are evaluating a strategic challenge statement on 8 dimensions and identifying its format.
 
@@ -739,35 +1108,17 @@ Return ONLY valid JSON (no markdown):
 }}"""
     
     try:
-        try:
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: get_client().models.generate_content(
-                    model=model_name,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.3,
-                        response_mime_type="application/json"
-                    )
-                )
-            )
-        except Exception as e:
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                logger.warning(f"Rate limit hit for {model_name}, switching to {GEMINI_FLASH_MODEL}")
-                model_name = GEMINI_FLASH_MODEL # Update for metadata logging
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: get_client().models.generate_content(
-                        model=model_name,
-                        contents=prompt,
-                        config=types.GenerateContentConfig(
-                            temperature=0.3,
-                            response_mime_type="application/json"
-                        )
-                    )
-                )
-            else:
-                raise e
+        response = await generate_content(
+            model=model_name,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.3,
+                response_mime_type="application/json"
+            ),
+            priority=Priority.EVALUATION,
+            use_cache=use_cache,
+            cache_stats=cache_stats
+        )
             
         response_text = response.text.strip()
         if response_text.startswith("```"):
@@ -777,36 +1128,135 @@ Return ONLY valid JSON (no markdown):
         
         eval_data = json.loads(response_text)
         
-        # Calculate scores
-        scores = eval_data["scores"]
-        total_score = sum(s["score"] for s in scores)
-        weighted_score = calculate_weighted_score(scores)
-        failed_non_negotiables = get_failed_non_negotiables(scores)
-        
-        
         # Capture usage
         usage = response.usage_metadata
         input_tokens = usage.prompt_token_count if usage else 0
         output_tokens = usage.candidates_token_count if usage else 0
 
-        return {
-            "dimension_scores": scores,
-            "total_score": total_score,
-            "weighted_score": weighted_score,
-            "passes_non_negotiables": len(failed_non_negotiables) == 0,
-            "failed_non_negotiables": failed_non_negotiables,
-            "recommendation": determine_recommendation(scores, failed_non_negotiables),
-            "research_references": [],
-            "detected_format_id": eval_data.get("detected_format_id", "F01"),
-            "model_name": GEMINI_PRO_MODEL,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens
-        }
+        return build_evaluation(eval_data, model_name, input_tokens, output_tokens)
     except Exception as e:
         logger.error(f"AI evaluation failed: {e}")
         # Fallback to default scores
         return create_default_evaluation()
 
+def get_batch_evaluation_schema(positions: List[int]):
+    """Structured output schema with one evaluation object per statement position."""
+    evaluation_schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "detected_format_id": types.Schema(type=types.Type.STRING),
+            "scores": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "dimension_id": types.Schema(type=types.Type.STRING),
+                        "score": types.Schema(type=types.Type.INTEGER),
+                        "notes": types.Schema(type=types.Type.STRING),
+                        "has_red_flags": types.Schema(type=types.Type.BOOLEAN)
+                    },
+                    required=["dimension_id", "score", "notes", "has_red_flags"]
+                )
+            )
+        },
+        required=["detected_format_id", "scores"]
+    )
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={f"statement_{pos}": evaluation_schema for pos in positions},
+        required=[f"statement_{pos}" for pos in positions]
+    )
+
+async def evaluate_statements_batch_with_ai(
+    statements: List[Dict[str, Any]],
+    brief_text: str,
+    include_research: bool,
+    model_name: str = GEMINI_PRO_MODEL,
+    use_cache: bool = True,
+    cache_stats: Optional[CacheStats] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Evaluate every statement of a session in ONE structured-output call.
+
+    statements: [{"position": 1, "text": "How can we..."}, ...]
+    Returns {position: evaluation} in the same shape as evaluate_statement_with_ai.
+    The brief, format list and dimension definitions are sent once for the whole
+    batch; token usage is split evenly across the evaluated statements for
+    reporting, the first one taking the remainder so the shares add up to the
+    reported usage.
+    """
+    positions = [stmt["position"] for stmt in statements]
+    statements_block = "\n".join(
+        f"[statement_{stmt['position']}] {stmt['text']}" for stmt in statements
+    )
+
+    prompt = f"""You are evaluating {len(statements)} strategic challenge statements on 8 dimensions and identifying the format of each.
+
+CHALLENGE STATEMENTS:
+{statements_block}
+
+ORIGINAL BRIEF:
+{brief_text}
+
+DIMENSIONS TO EVALUATE (score 1-5 each):
+{get_dimensions_info()}
+
+FORMATS TO CLASSIFY AGAINST:
+{get_format_names()}
+
+Instructions:
+Evaluate each statement independently.
+1. Classification: Identify which Challenge Format (F01-F12) the statement best matches.
+2. Evaluation: Score each dimension from 1 (poor) to 5 (excellent).
+   - Provide brief notes explaining the score.
+   - Flag if any critical red flags are present.
+
+Return JSON with one key per statement label (e.g. "statement_1"), each holding
+"detected_format_id" and "scores" (one entry per dimension)."""
+
+    try:
+        response = await generate_content(
+            model=model_name,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.3,
+                response_mime_type="application/json",
+                response_schema=get_batch_evaluation_schema(positions)
+            ),
+            priority=Priority.EVALUATION,
+            use_cache=use_cache,
+            cache_stats=cache_stats
+        )
+        batch_data = json.loads(response.text)
+
+        usage = response.usage_metadata
+        input_tokens = (usage.prompt_token_count or 0) if usage else 0
+        output_tokens = (usage.candidates_token_count or 0) if usage else 0
+
+        results = {}
+        evaluated = []
+        for pos in positions:
+            eval_data = batch_data.get(f"statement_{pos}")
+            if not eval_data or not eval_data.get("scores"):
+                logger.warning(f"Batch evaluation missing statement_{pos}, using defaults")
+                results[pos] = create_default_evaluation()
+                continue
+            evaluated.append((pos, eval_data))
+
+        share = max(len(evaluated), 1)
+        input_share, input_rest = divmod(input_tokens, share)
+        output_share, output_rest = divmod(output_tokens, share)
+        for i, (pos, eval_data) in enumerate(evaluated):
+            results[pos] = build_evaluation(
+                eval_data, model_name,
+                input_share + (input_rest if i == 0 else 0),
+                output_share + (output_rest if i == 0 else 0)
+            )
+        return {pos: results[pos] for pos in positions}
+    except Exception as e:
+        logger.error(f"AI batch evaluation failed: {e}")
+        return {pos: create_default_evaluation() for pos in positions}
+
 async def rewrite_statement_with_ai(
     original_text: str,
     brief_text: str,
@@ -831,19 +1281,52 @@ async def rewrite_statement_with_ai(
     """
     
     try:
-        response = get_client().models.generate_content(
+        response = await generate_content(
             model=GEMINI_PRO_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
                 temperature=0.7,
                 response_mime_type="text/plain"
-            )
+            ),
+            priority=Priority.INTERACTIVE
         )
         return response.text.strip()
     except Exception as e:
         logger.error(f"Rewrite failed: {e}")
         return original_text
 
+def get_dimensions_info() -> str:
+    """Evaluation dimension definitions for evaluation prompts."""
+    return "\n".join([
+        f"{d_id} - {EVALUATION_DIMENSIONS[d_id]['name']} (Weight: {EVALUATION_DIMENSIONS[d_id]['weight']}, Critical: {EVALUATION_DIMENSIONS[d_id]['non_negotiable']})"
+        for d_id in EVALUATION_DIMENSIONS.keys()
+    ])
+
+def get_format_names() -> str:
+    """Format ID/name list for classification prompts."""
+    return "\n".join([
+        f"{f_id} - {CHALLENGE_FORMATS[f_id]['name']}"
+        for f_id in CHALLENGE_FORMATS.keys()
+    ])
+
+def build_evaluation(eval_data: Dict, model_name: str, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+    """Turn raw dimension scores from the model into the evaluation payload."""
+    scores = eval_data["scores"]
+    failed_non_negotiables = get_failed_non_negotiables(scores)
+    return {
+        "dimension_scores": scores,
+        "total_score": sum(s["score"] for s in scores),
+        "weighted_score": calculate_weighted_score(scores),
+        "passes_non_negotiables": len(failed_non_negotiables) == 0,
+        "failed_non_negotiables": failed_non_negotiables,
+        "recommendation": determine_recommendation(scores, failed_non_negotiables),
+        "research_references": [],
+        "detected_format_id": eval_data.get("detected_format_id", "F01"),
+        "model_name": model_name,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens
+    }
+
 def calculate_weighted_score(scores: List[Dict]) -> int:
     """Calculate weighted score (0-100)."""
     total_weighted = 0
@@ -919,7 +1402,7 @@ async def upload_file_to_gemini_corpus(file_path: str, display_name: str):
         
         # Simple Files API Upload (Long Context Model Support)
         logger.info(f"Uploading {display_name} to Gemini...")
-        uploaded_file = client.files.upload(
+        uploaded_file = await client.aio.files.upload(
             file=file_path,
             config=types.UploadFileConfig(display_name=display_name, mime_type=mime_type)
         )
@@ -935,7 +1418,7 @@ async def delete_file_from_gemini(file_name: str):
     client = get_client()
     try:
         logger.info(f"Deleting file {file_name} from Gemini...")
-        client.files.delete(name=file_name)
+        await client.aio.files.delete(name=file_name)
         logger.info(f"Successfully deleted {file_name}")
         return True
     except Exception as e:
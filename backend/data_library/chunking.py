@@ -0,0 +1,286 @@
+"""
+Document Chunking
+
+Streaming, token-aware chunker shared by local retrieval (brainstorm) and the
+research upload path.
+
+Text files are read line by line and never held in memory whole. Lines are
+grouped into paragraphs and headings; chunks are packed from paragraphs up to
+``CHUNK_MAX_TOKENS``, never cross a heading (a heading starts a new chunk and
+labels the chunks under it), and carry the last ~``CHUNK_OVERLAP_TOKENS`` of
+the previous chunk so context spanning a boundary is retrievable. A paragraph
+over the budget is split on sentence boundaries, and a sentence over the budget
+on word boundaries, so no chunk exceeds the budget.
+
+Token counts are estimated (words and punctuation marks), which tracks model
+tokenizers closely enough for budgeting without loading one.
+
+PDF, DOCX and PPTX files are converted to text (pages / slides become headings)
+in a process pool, since extraction is CPU-bound. The extraction libraries are
+optional: pypdf, python-docx and python-pptx are only imported when a file of
+that type is chunked.
+"""
+
+from data_library.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, EXTRACTION_WORKERS
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import re
+import threading
+
+TEXT_SUFFIXES = (".txt", ".md", ".json")
+EXTRACTED_SUFFIXES = (".pdf", ".docx", ".pptx")
+SUPPORTED_SUFFIXES = TEXT_SUFFIXES + EXTRACTED_SUFFIXES
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*$")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+# A paragraph with no blank line for this many characters per budget token is
+# emitted early, so a single huge line cannot be held in memory whole
+_MAX_PARAGRAPH_CHARS_PER_TOKEN = 16
+
+
+class Chunk:
+    def __init__(self, chunk_id: str, text: str, source: str, location: str):
+        self.chunk_id = chunk_id
+        self.text = text
+        self.source = source
+        self.location = location
+
+
+class ExtractionError(Exception):
+    """A document could not be converted to text."""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+
+# ============================================================================
+# BLOCKS
+# ============================================================================
+
+def iter_blocks(lines: Iterable[str], max_paragraph_chars: int) -> Iterator[Tuple[str, str]]:
+    """("heading", title) and ("paragraph", text) blocks from a stream of lines."""
+    paragraph: List[str] = []
+    size = 0
+    for line in lines:
+        line = line.rstrip("\n\r")
+        heading = _HEADING_RE.match(line)
+        if heading or not line.strip():
+            if paragraph:
+                yield "paragraph", "\n".join(paragraph)
+                paragraph, size = [], 0
+            if heading:
+                yield "heading", heading.group(1)
+            continue
+        paragraph.append(line)
+        size += len(line)
+        if size >= max_paragraph_chars:
+            yield "paragraph", "\n".join(paragraph)
+            paragraph, size = [], 0
+    if paragraph:
+        yield "paragraph", "\n".join(paragraph)
+
+
+def _split_oversized(text: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Sentences of a paragraph, with over-budget sentences cut into word windows."""
+    for sentence in _SENTENCE_END_RE.split(text):
+        tokens = estimate_tokens(sentence)
+        if tokens <= max_tokens:
+            yield sentence, tokens
+            continue
+        window: List[str] = []
+        window_tokens = 0
+        for word in sentence.split():
+            word_tokens = estimate_tokens(word)
+            if window and window_tokens + word_tokens > max_tokens:
+                yield " ".join(window), window_tokens
+                window, window_tokens = [], 0
+            window.append(word)
+            window_tokens += word_tokens
+        if window:
+            yield " ".join(window), window_tokens
+
+
+# ============================================================================
+# CHUNKING
+# ============================================================================
+
+def chunk_lines(
+    lines: Iterable[str],
+    source_name: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    chunk_id_prefix: Optional[str] = None
+) -> Iterator[Chunk]:
+    """
+    Chunk a stream of lines (see module docstring). Chunk ids are
+    ``<prefix>_chk_<n>``, the prefix defaulting to the source name.
+    """
+    max_tokens = max(max_tokens, 1)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    pieces: List[Tuple[str, str, int]] = []  # (separator, text, tokens)
+    total = 0
+    fresh = 0  # pieces added since the last chunk (overlap alone is not a chunk)
+    heading: Optional[str] = None
+    chunk_idx = 0
+
+    def emit() -> Chunk:
+        nonlocal chunk_idx
+        text = "".join(sep + piece for sep, piece, _ in pieces).strip()
+        location = f"Segment {chunk_idx}" + (f" ({heading})" if heading else "")
+        chunk = Chunk(f"{chunk_id_prefix or source_name}_chk_{chunk_idx}", text, source_name, location)
+        chunk_idx += 1
+        return chunk
+
+    def keep_overlap():
+        nonlocal pieces, total, fresh
+        kept, kept_tokens = [], 0
+        for piece in reversed(pieces):
+            if kept_tokens + piece[2] > overlap_tokens:
+                # Take what fits from the end of this piece, sentence by sentence
+                for sentence in reversed(_SENTENCE_END_RE.split(piece[1])):
+                    tokens = estimate_tokens(sentence)
+                    if kept_tokens + tokens > overlap_tokens:
+                        break
+                    kept.insert(0, (" ", sentence, tokens))
+                    kept_tokens += tokens
+                break
+            kept.insert(0, piece)
+            kept_tokens += piece[2]
+        pieces, total, fresh = kept, kept_tokens, 0
+
+    for kind, text in iter_blocks(lines, max_tokens * _MAX_PARAGRAPH_CHARS_PER_TOKEN):
+        if kind == "heading":
+            if fresh:
+                yield emit()
+            pieces, total, fresh = [], 0, 0
+            heading = text
+            continue
+
+        paragraph_tokens = estimate_tokens(text)
+        units = [(text, paragraph_tokens)] if paragraph_tokens <= max_tokens else _split_oversized(text, max_tokens)
+        separator = "\n\n"
+        for unit, tokens in units:
+            if total + tokens > max_tokens:
+                if fresh:
+                    yield emit()
+                keep_overlap()
+                if total + tokens > max_tokens:
+                    pieces, total = [], 0
+            pieces.append((separator, unit, tokens))
+            total += tokens
+            fresh += 1
+            separator = " "
+
+    if fresh:
+        yield emit()
+
+
+def chunk_text(
+    text: str,
+    source_name: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[Chunk]:
+    """Chunk an in-memory string."""
+    return list(chunk_lines(text.splitlines(), source_name, max_tokens, overlap_tokens))
+
+
+# ============================================================================
+# FILES
+# ============================================================================
+
+def extract_text(path: Path) -> str:
+    """Plain text of a PDF / DOCX / PPTX file, with pages and slides as headings."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    try:
+        if suffix == ".pdf":
+            from pypdf import PdfReader
+            pages = PdfReader(str(path)).pages
+            return "\n\n".join(f"## Page {i}\n\n{page.extract_text() or ''}" for i, page in enumerate(pages, 1))
+        if suffix == ".docx":
+            import docx
+            lines = []
+            for para in docx.Document(str(path)).paragraphs:
+                style = para.style.name if para.style is not None else ""
+                level = style.rsplit(" ", 1)[-1] if style.startswith("Heading") else ""
+                prefix = "#" * int(level) + " " if level.isdigit() else ""
+                lines.append(prefix + para.text)
+            return "\n\n".join(lines)
+        if suffix == ".pptx":
+            from pptx import Presentation
+            slides = []
+            for i, slide in enumerate(Presentation(str(path)).slides, 1):
+                texts = [shape.text_frame.text for shape in slide.shapes if shape.has_text_frame]
+                slides.append(f"## Slide {i}\n\n" + "\n\n".join(texts))
+            return "\n\n".join(slides)
+    except ImportError as e:
+        raise ExtractionError(f"Reading {suffix} files needs an optional dependency: {e.name}") from e
+    except Exception as e:
+        raise ExtractionError(f"Could not extract text from {path.name}: {e}") from e
+    raise ExtractionError(f"Unsupported document type: {suffix}")
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def extraction_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+        return _pool
+
+
+def _file_lines(path: Path, in_pool: bool) -> Iterator[str]:
+    if path.suffix.lower() in EXTRACTED_SUFFIXES:
+        text = extraction_pool().submit(extract_text, path).result() if in_pool else extract_text(path)
+        yield from text.splitlines()
+        return
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        yield from f
+
+
+def chunk_file(
+    path: Path,
+    source_name: Optional[str] = None,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    chunk_id_prefix: Optional[str] = None
+) -> Iterator[Chunk]:
+    """
+    Chunk a file, streaming text files and extracting binary formats in the process pool.
+
+    Blocks until extraction finishes; from async code use chunk_file_async, or
+    call this through asyncio.to_thread.
+    """
+    path = Path(path)
+    return chunk_lines(
+        _file_lines(path, in_pool=True), source_name or path.name, max_tokens, overlap_tokens, chunk_id_prefix
+    )
+
+
+def _chunk_file_list(path: Path, *args) -> List[Chunk]:
+    # Runs inside a pool worker, so extraction happens in-process
+    return list(chunk_lines(_file_lines(Path(path), in_pool=False), *args))
+
+
+async def chunk_file_async(
+    path: Path,
+    source_name: Optional[str] = None,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    chunk_id_prefix: Optional[str] = None
+) -> List[Chunk]:
+    """Extract and chunk a file in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        extraction_pool(), _chunk_file_list, Path(path), source_name or Path(path).name,
+        max_tokens, overlap_tokens, chunk_id_prefix
+    )
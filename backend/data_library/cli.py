@@ -5,8 +5,9 @@ from pathlib import Path
 from rich.console import Console
 from rich.table import Table
 from rich.markdown import Markdown
+from rich.progress import Progress, BarColumn, MofNCompleteColumn, TimeElapsedColumn
 
-from data_library.file_search import upload_file, list_files, delete_file
+from data_library.file_search import upload_files, expand_paths, list_files, delete_file
 from data_library.orchestrator import run_agentic_flow
 from data_library.agents import init_db
 
@@ -18,15 +19,37 @@ def cli():
     init_db()  # Ensure seeds are present
 
 @cli.command()
-@click.argument('file_path', type=click.Path(exists=True))
-def add(file_path):
-    """Upload a document to the library."""
-    console.print(f"[bold blue]Uploading {file_path}...[/bold blue]")
-    try:
-        f = upload_file(Path(file_path))
-        console.print(f"[bold green]Success![/bold green] Uploaded: {f.name} (URI: {f.uri})")
-    except Exception as e:
-        console.print(f"[bold red]Error:[/bold red] {e}")
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--concurrency', '-c', default=None, type=int, help="Uploads in flight at once.")
+def add(paths, concurrency):
+    """Upload documents (files or directories) to the library."""
+    files = expand_paths(Path(p) for p in paths)
+    if not files:
+        console.print("[yellow]No files to upload.[/yellow]")
+        return
+
+    console.print(f"[bold blue]Uploading {len(files)} file(s)...[/bold blue]")
+    with Progress(
+        "[progress.description]{task.description}", BarColumn(), MofNCompleteColumn(), TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        task = progress.add_task("Uploading", total=len(files))
+
+        def on_done(result):
+            if result.error:
+                progress.console.print(f"[bold red]Error:[/bold red] {result.path.name}: {result.error}")
+            else:
+                progress.console.print(f"[green]✓[/green] {result.path.name} → {result.file.name}")
+            progress.advance(task)
+
+        kwargs = {"concurrency": concurrency} if concurrency else {}
+        results = asyncio.run(upload_files(files, on_done=on_done, **kwargs))
+
+    failed = sum(1 for r in results if r.error)
+    if failed:
+        console.print(f"[bold red]{failed} of {len(results)} upload(s) failed.[/bold red]")
+    else:
+        console.print(f"[bold green]Success![/bold green] Uploaded {len(results)} file(s).")
 
 @cli.command()
 def list():
@@ -20,16 +20,103 @@ GEMINI_CORPUS_NAME = "brainstorming-research-library"
 # Available Models for User Selection
 AVAILABLE_MODELS = ("gemini-3.0-flash", "gemini-3-pro-preview")
 
+# LLM Concurrency Limits (async request layer)
+# Upper bound on in-flight Gemini requests across the process, and per model.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "16"))
+
+# Per-model rate limits for the LLM scheduler: (requests/min, input tokens/min)
+LLM_RATE_LIMITS = {
+    "gemini-3-pro-preview": (25, 1_000_000),
+    "gemini-3-flash-preview": (1000, 2_000_000),
+    "gemini-2.0-flash": (2000, 4_000_000),
+}
+LLM_DEFAULT_RATE_LIMIT = (60, 1_000_000)
+# How long a request may queue for its model before giving up
+LLM_SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("LLM_SCHEDULER_MAX_WAIT_SECONDS", "60"))
+# Retries (on the same model) after an upstream 429
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found in .env file")
 
+# Research context caching: "gemini" (context caching API), "local" (offline fake) or "off"
+RESEARCH_CONTEXT_CACHE_BACKEND = os.getenv("RESEARCH_CONTEXT_CACHE_BACKEND", "gemini")
+RESEARCH_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("RESEARCH_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+
 # Constants
 FILE_SEARCH_STORE_NAME = "pharma-brand-library"
 # Resolve paths relative to this file to ensure consistency regardless of CWD
 BASE_DIR = Path(__file__).resolve().parent.parent
-DB_PATH = BASE_DIR / "data" / "agents_v2.db"
+# Writable stores can be moved through the environment (the test suite points them at a temp dir)
+DB_PATH = Path(os.getenv("DB_PATH", BASE_DIR / "data" / "agents_v2.db"))
 SESSIONS_DB_PATH = BASE_DIR / "data" / "sessions.db"
 DOCS_PATH = BASE_DIR / "data" / "documents"
+RETRIEVAL_INDEX_PATH = Path(os.getenv("RETRIEVAL_INDEX_PATH", BASE_DIR / "data" / "retrieval_index.db"))
+RESEARCH_DIR = BASE_DIR / "data" / "research"
+# Uploads are streamed to disk in chunks of this size (bounds memory per upload)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Local retrieval (brainstorm evidence): chunk budget in estimated tokens, and
+# worker processes for PDF / DOCX / PPTX text extraction
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "30"))
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+# Scoring: "matrix" (in-memory sparse matrix) or "sqlite" (query the index directly)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "matrix")
+# Searches re-sync the index with data/documents at most this often (0: before every search)
+RETRIEVAL_SYNC_INTERVAL_SECONDS = float(os.getenv("RETRIEVAL_SYNC_INTERVAL_SECONDS", "30"))
+# Hybrid retrieval: fuse BM25 with hashed character n-gram vectors by reciprocal rank fusion
+RETRIEVAL_HYBRID = os.getenv("RETRIEVAL_HYBRID", "1") == "1"
+NGRAM_VECTOR_DIM = int(os.getenv("NGRAM_VECTOR_DIM", "256"))
+# N-gram candidates below this cosine similarity are dropped before fusion: nearly every
+# chunk shares a few hashed trigrams with the query, and related chunks score well above this
+NGRAM_MIN_SIMILARITY = float(os.getenv("NGRAM_MIN_SIMILARITY", "0.2"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Chunks / documents whose 64-bit SimHash differs in at most this many bits are
+# collapsed as near-duplicates (at most 3: lookups rely on one of four bands matching)
+SIMHASH_MAX_DISTANCE = min(int(os.getenv("SIMHASH_MAX_DISTANCE", "3")), 3)
+# Brainstorm evidence packing: candidates retrieved, prompt budget (estimated tokens),
+# MMR relevance/diversity trade-off and the similarity treated as a near-duplicate
+EVIDENCE_CANDIDATES = int(os.getenv("EVIDENCE_CANDIDATES", "40"))
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "3000"))
+EVIDENCE_MMR_LAMBDA = float(os.getenv("EVIDENCE_MMR_LAMBDA", "0.7"))
+EVIDENCE_DUPLICATE_SIMILARITY = float(os.getenv("EVIDENCE_DUPLICATE_SIMILARITY", "0.9"))
+
+# Background ingestion of research uploads into Gemini
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "4"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+INGESTION_PROCESSING_TIMEOUT_SECONDS = int(os.getenv("INGESTION_PROCESSING_TIMEOUT_SECONDS", "600"))
+
+# Library (file_search) bulk uploads: concurrent uploads and processing-poll backoff
+FILE_UPLOAD_CONCURRENCY = int(os.getenv("FILE_UPLOAD_CONCURRENCY", "8"))
+FILE_POLL_INITIAL_SECONDS = float(os.getenv("FILE_POLL_INITIAL_SECONDS", "1"))
+FILE_POLL_MAX_SECONDS = float(os.getenv("FILE_POLL_MAX_SECONDS", "10"))
+# Library search: at most this many files (picked by the local retrieval index)
+# are attached to each search_library model call
+LIBRARY_SEARCH_MAX_FILES = int(os.getenv("LIBRARY_SEARCH_MAX_FILES", "5"))
+
+# LLM Response Cache (in-process LRU in front of a SQLite store shared by workers)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_DB_PATH = Path(os.getenv("LLM_CACHE_DB_PATH", BASE_DIR / "data" / "llm_cache.db"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Diagnostic warm-up: stock briefs shown in the frontend brief selector
+BRIEF_TEMPLATES_PATH = BASE_DIR.parent / "frontend" / "lib" / "brief-templates.ts"
+PRECOMPUTE_TEMPLATE_DIAGNOSTICS = os.getenv("PRECOMPUTE_TEMPLATE_DIAGNOSTICS", "1") == "1"
+
+# Speculative generation: how many historically frequent formats to start early,
+# and how many recent statements to derive frequencies from
+SPECULATIVE_FORMAT_COUNT = int(os.getenv("SPECULATIVE_FORMAT_COUNT", "2"))
+SPECULATION_HISTORY_SIZE = int(os.getenv("SPECULATION_HISTORY_SIZE", "500"))
+
+# Serialized detail responses kept in memory for completed sessions
+SESSION_DETAIL_CACHE_ENTRIES = int(os.getenv("SESSION_DETAIL_CACHE_ENTRIES", "256"))
+
+# API debug log (relative paths resolve against the working directory)
+LOG_FILE = os.getenv("LOG_FILE", "backend_debug.log")
 
 # Ensure directories exist
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
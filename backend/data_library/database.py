@@ -1,22 +1,32 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from data_library.config import DB_PATH
 
 # Use sqlite for simplicity and compatibility with existing path
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+# Async engine for API routes (sync engine stays for scripts and the persistence thread)
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+
 from sqlalchemy import event
 @event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA journal_mode=WAL")
+    # Wait for the other engine's writers instead of failing with "database is locked"
+    cursor.execute("PRAGMA busy_timeout=5000")
     cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -26,3 +36,7 @@ def get_db_session():
         yield db
     finally:
         db.close()
+
+async def get_async_db_session():
+    async with AsyncSessionLocal() as db:
+        yield db
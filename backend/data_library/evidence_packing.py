@@ -0,0 +1,86 @@
+"""
+Evidence Packing
+
+Chooses which retrieved chunks go into the brainstorm prompt. The evidence
+section is limited to ``EVIDENCE_TOKEN_BUDGET`` estimated tokens. Chunks are
+picked by maximal marginal relevance: each step takes the candidate with the
+best balance of relevance (its normalised retrieval score) against similarity
+to evidence already chosen, weighted by ``EVIDENCE_MMR_LAMBDA``. Similarity is
+cosine over the hashed character n-gram vectors used for retrieval.
+
+Candidates at or above ``EVIDENCE_DUPLICATE_SIMILARITY`` to a chosen chunk are
+dropped as near-duplicates, and candidates that no longer fit the remaining
+budget are dropped as over budget (smaller ones may still fit). Every drop is
+reported so it can be stored with the run.
+"""
+
+from data_library.chunking import estimate_tokens
+from data_library.config import (
+    EVIDENCE_TOKEN_BUDGET,
+    EVIDENCE_MMR_LAMBDA,
+    EVIDENCE_DUPLICATE_SIMILARITY
+)
+from data_library.ngram_retrieval import embed_texts
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+def format_evidence_entry(chunk: Dict[str, Any]) -> str:
+    """A retrieved chunk as it appears in the system instruction."""
+    return (
+        f"[Chunk ID: {chunk['chunk_id']}] (Source: {chunk['source_title']} {chunk['location_label']})\n"
+        f"{chunk['text']}\n---\n"
+    )
+
+
+def pack_evidence(
+    chunks: List[Dict[str, Any]],
+    token_budget: int = EVIDENCE_TOKEN_BUDGET,
+    mmr_lambda: float = EVIDENCE_MMR_LAMBDA,
+    duplicate_similarity: float = EVIDENCE_DUPLICATE_SIMILARITY
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Select chunks (retrieve_chunks dicts, best first) for the prompt.
+
+    Returns (selected, dropped): selected in the order chosen, dropped as
+    {"chunk_id", "reason", "tokens"} records, with "similar_to" for duplicates.
+    """
+    if not chunks:
+        return [], []
+
+    costs = [estimate_tokens(format_evidence_entry(c)) for c in chunks]
+    scores = np.array([float(c.get("score") or 0.0) for c in chunks])
+    relevance = scores / scores.max() if scores.max() > 0 else np.ones(len(chunks))
+    vectors = embed_texts([c["text"] for c in chunks])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+
+    selected: List[int] = []
+    dropped: List[Dict[str, Any]] = []
+    remaining = list(range(len(chunks)))
+    budget_left = token_budget
+    # Highest similarity of each candidate to anything selected so far
+    max_sim = np.zeros(len(chunks))
+
+    while remaining:
+        mmr = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * max_sim[remaining]
+        best = remaining.pop(int(np.argmax(mmr)))
+        chunk_id = chunks[best]["chunk_id"]
+
+        if selected and max_sim[best] >= duplicate_similarity:
+            nearest = selected[int(np.argmax(similarity[best, selected]))]
+            dropped.append({
+                "chunk_id": chunk_id, "reason": "near_duplicate", "tokens": costs[best],
+                "similar_to": chunks[nearest]["chunk_id"], "similarity": round(float(max_sim[best]), 3)
+            })
+            continue
+        if costs[best] > budget_left:
+            dropped.append({"chunk_id": chunk_id, "reason": "over_budget", "tokens": costs[best]})
+            continue
+
+        selected.append(best)
+        budget_left -= costs[best]
+        max_sim = np.maximum(max_sim, similarity[best])
+
+    return [chunks[i] for i in selected], dropped
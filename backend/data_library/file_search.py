@@ -1,10 +1,21 @@
 
+import asyncio
 import logging
 import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterable, Optional
 from google import genai
 from google.genai import types
-from data_library.config import GEMINI_API_KEY
+from data_library.config import (
+    GEMINI_API_KEY,
+    FILE_UPLOAD_CONCURRENCY,
+    FILE_POLL_INITIAL_SECONDS,
+    FILE_POLL_MAX_SECONDS,
+    LIBRARY_SEARCH_MAX_FILES,
+    RETRIEVAL_SYNC_INTERVAL_SECONDS
+)
+from data_library.retrieval_index import retrieval_index, tokenize
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +24,16 @@ logger = logging.getLogger("data_library.file_search")
 # Initialize Gemini Client
 client = genai.Client(api_key=GEMINI_API_KEY)
 
+def _upload_config(file_path: Path) -> types.UploadFileConfig:
+    mimetype = "text/markdown" if file_path.suffix == ".md" else None
+    return types.UploadFileConfig(display_name=file_path.name, mime_type=mimetype)
+
+def _check_ready(file_obj: types.File) -> types.File:
+    if file_obj.state.name == "FAILED":
+        raise ValueError(f"File upload failed: {file_obj.error.message}")
+    logger.info(f"File ready: {file_obj.name}")
+    return file_obj
+
 def upload_file(file_path: Path) -> types.File:
     """Upload a file to Gemini."""
     if not file_path.exists():
@@ -20,33 +41,83 @@ def upload_file(file_path: Path) -> types.File:
 
     logger.info(f"Uploading file: {file_path.name}")
     try:
-        # Check if SDK expects 'file' or just positional
-        # Try 'file' kwarg which is standard in v1
-        mimetype = "text/markdown" if file_path.suffix == ".md" else None
-        file_obj = client.files.upload(
-            file=str(file_path),
-            config=types.UploadFileConfig(
-                display_name=file_path.name,
-                mime_type=mimetype
-            )
-        )
+        file_obj = client.files.upload(file=str(file_path), config=_upload_config(file_path))
         
-        # Wait for efficient processing
+        # Wait for processing, backing off so long-running files are not hammered
         logger.info(f"Waiting for file processing: {file_obj.name}")
+        interval = FILE_POLL_INITIAL_SECONDS
         while file_obj.state.name == "PROCESSING":
-            time.sleep(2)
+            time.sleep(interval)
+            interval = min(interval * 2, FILE_POLL_MAX_SECONDS)
             file_obj = client.files.get(name=file_obj.name)
             
-        if file_obj.state.name == "FAILED":
-            raise ValueError(f"File upload failed: {file_obj.error.message}")
-            
-        logger.info(f"File ready: {file_obj.name}")
-        return file_obj
+        return _check_ready(file_obj)
         
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise
 
+async def upload_file_async(file_path: Path) -> types.File:
+    """Async upload_file: uploads and polls on the SDK's async client."""
+    if not file_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    logger.info(f"Uploading file: {file_path.name}")
+    file_obj = await client.aio.files.upload(file=str(file_path), config=_upload_config(file_path))
+
+    interval = FILE_POLL_INITIAL_SECONDS
+    while file_obj.state.name == "PROCESSING":
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, FILE_POLL_MAX_SECONDS)
+        file_obj = await client.aio.files.get(name=file_obj.name)
+
+    return _check_ready(file_obj)
+
+@dataclass
+class UploadResult:
+    path: Path
+    file: Optional[types.File] = None
+    error: Optional[Exception] = None
+
+async def upload_files(
+    paths: Iterable[Path],
+    concurrency: int = FILE_UPLOAD_CONCURRENCY,
+    on_done: Optional[Callable[[UploadResult], None]] = None
+) -> list[UploadResult]:
+    """
+    Upload many files concurrently (at most `concurrency` in flight, including
+    their processing wait). A failed file is reported in its result and does not
+    stop the others. `on_done` is called as each file finishes. Results are in
+    input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload_one(path: Path) -> UploadResult:
+        async with semaphore:
+            try:
+                result = UploadResult(path, file=await upload_file_async(path))
+            except Exception as e:
+                logger.error(f"Upload of {path.name} failed: {e}")
+                result = UploadResult(path, error=e)
+        if on_done:
+            on_done(result)
+        return result
+
+    return await asyncio.gather(*(upload_one(Path(p)) for p in paths))
+
+def expand_paths(paths: Iterable[Path]) -> list[Path]:
+    """Files named directly plus every non-hidden file under named directories."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(
+                p for p in path.rglob("*")
+                if p.is_file() and not any(part.startswith(".") for part in p.relative_to(path).parts)
+            ))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
 def list_files() -> list[types.File]:
     """List all files in the library."""
     try:
@@ -64,11 +135,49 @@ def delete_file(file_name: str):
         logger.error(f"Delete file failed: {e}")
         raise
 
-def search_library(query: str, files: list[types.File] = None) -> str:
+# Local index hits considered when ranking files for a query
+PREFILTER_CANDIDATES = 50
+
+def select_relevant_files(query: str, files: list[types.File],
+                          max_files: int = LIBRARY_SEARCH_MAX_FILES) -> list[types.File]:
+    """
+    Pre-filter: the files most relevant to the query, at most max_files.
+
+    Files are matched to the local retrieval index by display name and ranked
+    by their best-scoring chunk, then by query terms in the file name. If
+    nothing matches, the first max_files files are used.
+    """
+    if len(files) <= max_files:
+        return files
+    best: dict[str, float] = {}
+    try:
+        retrieval_index.sync_if_stale(RETRIEVAL_SYNC_INTERVAL_SECONDS)
+        for hit in retrieval_index.search(query, top_k=PREFILTER_CANDIDATES):
+            best.setdefault(hit.source, hit.score)  # hits are best first
+    except Exception as e:
+        logger.error(f"Library pre-filter failed, using unranked files: {e}")
+
+    terms = set(tokenize(query))
+    def rank(f: types.File):
+        name = f.display_name or ""
+        return (best.get(name, 0.0), len(terms & set(tokenize(name))))
+
+    ranked = sorted(files, key=rank, reverse=True)
+    if rank(ranked[0]) == (0.0, 0):
+        logger.warning(f"No library file matched the query; using the first {max_files}")
+    selected = ranked[:max_files]
+    logger.info(f"Library pre-filter: {len(selected)} of {len(files)} files for the query")
+    return selected
+
+def search_library(query: str, files: list[types.File] = None, max_files: int = LIBRARY_SEARCH_MAX_FILES,
+                   ranking_query: Optional[str] = None) -> str:
     """
     Perform a semantic search/query against the library.
     If files list is provided, restricts search to those files.
-    Otherwise uses all available files (up to limits).
+    Otherwise uses all available files. Only the max_files most relevant
+    (select_relevant_files) are attached to the model call; they are ranked by
+    ranking_query when given (e.g. the user's text without the instruction
+    prompt wrapped around it), otherwise by the query.
     """
     if not files:
         files = list_files()
@@ -76,6 +185,8 @@ def search_library(query: str, files: list[types.File] = None) -> str:
     if not files:
         return "Library is empty. Please upload documents first."
 
+    files = select_relevant_files(ranking_query or query, files, max_files)
+
     # For valid RAG, we pass files to the generate_content call
     # The model will use them as context
     try:
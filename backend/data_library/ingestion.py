@@ -0,0 +1,223 @@
+"""
+Research Document Ingestion
+
+Uploading a research document to Gemini (transfer + server-side PROCESSING)
+can take minutes, so the upload endpoint only stores the file and queues the
+document here. A pool of async workers performs the upload on the SDK's async
+surface, polls until the file leaves PROCESSING, and retries failures with
+exponential backoff (deleting any file a failed attempt had already created,
+so retries do not leak Files API objects). Progress is recorded on the document row
+(``ingestion_status``: queued -> uploading -> processing -> ready | failed) and
+exposed by the ingestion status endpoint.
+
+Before the Gemini upload, the document is also extracted and chunked (in the
+chunking process pool) into the local retrieval index, so it is available to
+local RAG even if the Gemini upload fails.
+
+Documents still pending when the server stops are re-queued at startup.
+"""
+
+from google.genai import types
+from data_library.chunking import chunk_file_async
+from data_library.config import (
+    INGESTION_WORKERS,
+    INGESTION_MAX_ATTEMPTS,
+    INGESTION_PROCESSING_TIMEOUT_SECONDS
+)
+from data_library.database import AsyncSessionLocal
+from data_library.llm import get_client
+from data_library.models import ResearchDocument
+from data_library.retrieval_index import RetrievalIndex, retrieval_index
+from sqlalchemy import select
+from typing import List, Optional
+import asyncio
+import logging
+import mimetypes
+import time
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "uploading", "processing")
+
+
+def research_index_key(doc_id: str) -> str:
+    """Name of a research document in the local retrieval index."""
+    return f"research/{doc_id}"
+
+
+class IngestionError(Exception):
+    """Gemini rejected or failed to process a file."""
+
+
+class IngestionQueue:
+    """Async worker pool that moves stored research files into Gemini."""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        workers: int = INGESTION_WORKERS,
+        max_attempts: int = INGESTION_MAX_ATTEMPTS,
+        processing_timeout_seconds: float = INGESTION_PROCESSING_TIMEOUT_SECONDS,
+        retry_base_seconds: float = 2.0,
+        poll_interval_seconds: float = 1.0,
+        max_poll_interval_seconds: float = 10.0,
+        local_index: Optional[RetrievalIndex] = retrieval_index
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.processing_timeout_seconds = processing_timeout_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_poll_interval_seconds = max_poll_interval_seconds
+        self.local_index = local_index
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start the workers on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, doc_id: str):
+        if self._queue is None:
+            self.start()
+        self._queue.put_nowait(doc_id)
+
+    async def join(self):
+        """Wait until every queued document has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def resume_pending(self) -> int:
+        """Re-queue documents left pending by a previous run."""
+        async with self.session_factory() as db:
+            doc_ids = (await db.scalars(
+                select(ResearchDocument.id).where(ResearchDocument.ingestion_status.in_(PENDING_STATUSES))
+            )).all()
+        for doc_id in doc_ids:
+            self.enqueue(doc_id)
+        if doc_ids:
+            logger.info(f"Resumed ingestion of {len(doc_ids)} research documents")
+        return len(doc_ids)
+
+    async def _worker(self):
+        while True:
+            doc_id = await self._queue.get()
+            try:
+                await self._ingest(doc_id)
+            except Exception as e:
+                logger.error(f"Ingestion of {doc_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _update(self, doc_id: str, **values) -> Optional[ResearchDocument]:
+        async with self.session_factory() as db:
+            doc = await db.get(ResearchDocument, doc_id)
+            if doc is None:
+                return None
+            for key, value in values.items():
+                setattr(doc, key, value)
+            await db.commit()
+            return doc
+
+    async def _index_locally(self, doc_id: str):
+        async with self.session_factory() as db:
+            doc = await db.get(ResearchDocument, doc_id)
+        if doc is None:
+            return
+        key = research_index_key(doc.id)
+        try:
+            chunks = await chunk_file_async(doc.file_path, doc.name, chunk_id_prefix=key)
+            await asyncio.to_thread(self.local_index.index_document, key, chunks, doc.content_hash or "")
+            async with self.session_factory() as db:
+                deleted = await db.get(ResearchDocument, doc_id) is None
+            if deleted:
+                # Deleted while chunking; the delete endpoint already cleared the index
+                await asyncio.to_thread(self.local_index.remove_document, key)
+                return
+            logger.info(f"Indexed {doc.name} locally ({len(chunks)} chunks)")
+        except Exception as e:
+            # Local retrieval is best-effort; the Gemini upload still proceeds
+            logger.warning(f"Local indexing of {doc.name} failed: {e}")
+
+    async def _ingest(self, doc_id: str):
+        if self.local_index is not None:
+            await self._index_locally(doc_id)
+        for attempt in range(1, self.max_attempts + 1):
+            doc = await self._update(doc_id, ingestion_status="uploading", ingestion_attempts=attempt)
+            if doc is None:
+                return  # Deleted while queued
+            try:
+                gemini_file = await self._upload(doc_id, doc.file_path, doc.name)
+            except Exception as e:
+                logger.warning(f"Ingestion attempt {attempt} for {doc.name} failed: {e}")
+                if attempt == self.max_attempts:
+                    await self._update(doc_id, ingestion_status="failed", ingestion_error=str(e))
+                    return
+                await self._update(doc_id, ingestion_status="queued", ingestion_error=str(e))
+                await asyncio.sleep(self.retry_base_seconds * 2 ** (attempt - 1))
+                continue
+
+            doc = await self._update(
+                doc_id,
+                ingestion_status="ready",
+                ingestion_error=None,
+                gemini_file_id=gemini_file.name,
+                gemini_uri=gemini_file.uri
+            )
+            if doc is None:
+                # Deleted during the upload, before the delete endpoint could see the file
+                await self._discard(gemini_file.name)
+                return
+            logger.info(f"Ingested {doc.name} as {gemini_file.name}")
+            return
+
+    async def _upload(self, doc_id: str, file_path: str, display_name: str) -> types.File:
+        """Upload to the Files API and wait for server-side processing to finish."""
+        mime_type, _ = mimetypes.guess_type(display_name)
+        client = get_client()
+        gemini_file = await client.aio.files.upload(
+            file=file_path,
+            config=types.UploadFileConfig(display_name=display_name, mime_type=mime_type)
+        )
+        created = gemini_file.name
+
+        try:
+            deadline = time.monotonic() + self.processing_timeout_seconds
+            interval = self.poll_interval_seconds
+            if gemini_file.state == types.FileState.PROCESSING:
+                await self._update(doc_id, ingestion_status="processing")
+            while gemini_file.state == types.FileState.PROCESSING:
+                if time.monotonic() > deadline:
+                    raise IngestionError(f"{gemini_file.name} still processing after {self.processing_timeout_seconds}s")
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, self.max_poll_interval_seconds)
+                gemini_file = await client.aio.files.get(name=gemini_file.name)
+
+            if gemini_file.state == types.FileState.FAILED:
+                raise IngestionError(f"Gemini failed to process {gemini_file.name}: {gemini_file.error}")
+            return gemini_file
+        except Exception:
+            # The next attempt uploads a new file, so this one would be orphaned
+            await self._discard(created)
+            raise
+
+    async def _discard(self, name: str):
+        try:
+            await get_client().aio.files.delete(name=name)
+            logger.info(f"Deleted abandoned Gemini file {name}")
+        except Exception as e:
+            logger.warning(f"Could not delete abandoned Gemini file {name}: {e}")
+
+
+# Process-wide queue started with the API
+ingestion = IngestionQueue()
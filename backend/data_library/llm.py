@@ -0,0 +1,250 @@
+"""
+Async LLM Access Layer
+
+Every Gemini call made by the challenge pipeline goes through this module so that
+requests run on the SDK's native async surface (``client.aio``) instead of parking
+a thread-pool worker for the whole network round-trip. Concurrency is bounded by
+explicit limits (process-wide and per model) rather than by executor size, and
+admission is rate limited per model by the scheduler in ``llm_scheduler``.
+Responses are served from ``llm_cache`` when an identical request was seen before,
+and identical requests already in flight share one upstream call (``singleflight``).
+Cached responses carry no ``usage_metadata``: no tokens were paid for them, so
+they count as zero in per-statement and session token totals.
+"""
+
+from google import genai
+from google.genai import types
+from data_library.config import (
+    GEMINI_API_KEY,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONCURRENCY_PER_MODEL,
+    LLM_RATE_LIMIT_RETRIES,
+    LLM_CACHE_ENABLED
+)
+from data_library.llm_cache import CacheStats, response_cache, make_cache_key
+from data_library.llm_scheduler import Priority, scheduler, estimate_tokens
+from data_library.singleflight import SingleFlight
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lazy client initialization to avoid blocking on module import
+_client = None
+
+# Concurrency limits (created lazily so they bind to the running event loop)
+_global_limit: Optional[asyncio.Semaphore] = None
+_model_limits: Dict[str, asyncio.Semaphore] = {}
+
+# Identical cacheable requests in flight at the same time share one upstream call
+_in_flight = SingleFlight()
+
+
+def get_client() -> genai.Client:
+    """Get or create the shared Gemini client (lazy initialization)."""
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=GEMINI_API_KEY)
+    return _client
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Return True if the error is a Gemini 429 / quota exhaustion."""
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+
+def _from_cache(payload: Dict[str, Any]) -> types.GenerateContentResponse:
+    """A cached response, without the usage of the call that originally produced it."""
+    response = types.GenerateContentResponse.model_validate(payload)
+    response.usage_metadata = None
+    return response
+
+
+def _limits_for(model: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    """Get the (global, per-model) semaphores guarding calls to a model."""
+    global _global_limit
+    if _global_limit is None:
+        _global_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    if model not in _model_limits:
+        _model_limits[model] = asyncio.Semaphore(LLM_MAX_CONCURRENCY_PER_MODEL)
+    return _global_limit, _model_limits[model]
+
+
+async def generate_content(
+    model: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig] = None,
+    priority: Priority = Priority.GENERATION,
+    use_cache: bool = True,
+    cache_stats: Optional[CacheStats] = None
+) -> types.GenerateContentResponse:
+    """
+    Call ``generate_content`` on the async client.
+
+    Identical requests (same model, contents and config) are answered from the
+    response cache unless ``use_cache`` is False (hits and misses are counted in
+    ``cache_stats`` when given), and join an identical request
+    that is already in flight instead of calling again. Otherwise the request
+    queues in the scheduler lane for ``priority`` until the model's rate limits
+    admit it, then runs within the concurrency limits. An upstream 429 pauses the
+    model's lane and the request is retried on the same model rather than being
+    downgraded.
+    """
+    cache_key = make_cache_key(model, contents, config) if use_cache and LLM_CACHE_ENABLED else None
+    if cache_key:
+        cached = await response_cache.get(cache_key, cache_stats)
+        if cached is not None:
+            return _from_cache(cached)
+        return await _in_flight.do(
+            cache_key, lambda: _generate_uncached(model, contents, config, priority, cache_key)
+        )
+    return await _generate_uncached(model, contents, config, priority, cache_key)
+
+
+async def _generate_uncached(
+    model: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig],
+    priority: Priority,
+    cache_key: Optional[str]
+) -> types.GenerateContentResponse:
+    """Make the upstream call (scheduler admission, concurrency limits, 429 retries)."""
+    estimated_tokens = estimate_tokens(contents)
+    global_limit, model_limit = _limits_for(model)
+
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        await scheduler.acquire(model, priority, estimated_tokens)
+        try:
+            async with global_limit, model_limit:
+                response = await get_client().aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+        except Exception as e:
+            if is_rate_limit_error(e) and attempt < LLM_RATE_LIMIT_RETRIES:
+                scheduler.report_rate_limited(model)
+                continue
+            raise
+
+        usage = getattr(response, "usage_metadata", None)
+        scheduler.record_usage(model, estimated_tokens, getattr(usage, "prompt_token_count", None))
+        if cache_key and response.candidates:
+            await response_cache.set(cache_key, response.model_dump(mode="json", exclude_none=True))
+        return response
+
+
+async def generate_content_stream(
+    model: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig] = None,
+    priority: Priority = Priority.GENERATION,
+    use_cache: bool = True,
+    cache_stats: Optional[CacheStats] = None
+) -> AsyncIterator[types.GenerateContentResponse]:
+    """
+    Streaming variant of ``generate_content`` yielding response chunks as they arrive.
+
+    A cache hit yields the full cached response as a single chunk. Identical
+    cacheable requests share one upstream stream through the same single-flight
+    as ``generate_content``: the first caller relays the chunks, and callers that
+    join while it is running receive the merged response as a single chunk. On
+    completion the chunks are merged into one response (text + final usage) and
+    cached under the same key as the equivalent non-streaming request.
+    Rate-limit retries are only possible before the first chunk has arrived.
+    """
+    cache_key = make_cache_key(model, contents, config) if use_cache and LLM_CACHE_ENABLED else None
+    if not cache_key:
+        async for chunk in _stream_upstream(model, contents, config, priority):
+            yield chunk
+        return
+
+    cached = await response_cache.get(cache_key, cache_stats)
+    if cached is not None:
+        yield _from_cache(cached)
+        return
+
+    chunks: asyncio.Queue = asyncio.Queue()
+    result, leading = _in_flight.join(
+        cache_key, lambda: _stream_and_merge(model, contents, config, priority, cache_key, chunks.put_nowait)
+    )
+    call = asyncio.ensure_future(result)
+    try:
+        if leading:
+            # None marks the end of the upstream stream (success or failure)
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+        merged = await call
+        if not leading:
+            yield merged
+    finally:
+        # Leaving early (consumer gone) drops this waiter; the upstream call is
+        # only cancelled once no other caller is waiting on it
+        call.cancel()
+
+
+async def _stream_and_merge(
+    model: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig],
+    priority: Priority,
+    cache_key: Optional[str],
+    on_chunk: Callable[[Optional[types.GenerateContentResponse]], None]
+) -> types.GenerateContentResponse:
+    """Relay an upstream stream chunk by chunk, then return (and cache) the merged response."""
+    text_parts = []
+    usage = None
+    try:
+        async for chunk in _stream_upstream(model, contents, config, priority):
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                text_parts.append(chunk.text)
+            on_chunk(chunk)
+    finally:
+        on_chunk(None)
+
+    merged = types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(text="".join(text_parts))]
+        ))],
+        usage_metadata=usage
+    )
+    if cache_key and text_parts:
+        await response_cache.set(cache_key, merged.model_dump(mode="json", exclude_none=True))
+    return merged
+
+
+async def _stream_upstream(
+    model: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig],
+    priority: Priority
+) -> AsyncIterator[types.GenerateContentResponse]:
+    """Make the upstream streaming call (scheduler admission, concurrency limits, 429 retries)."""
+    estimated_tokens = estimate_tokens(contents)
+    global_limit, model_limit = _limits_for(model)
+    last_chunk = None
+
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        await scheduler.acquire(model, priority, estimated_tokens)
+        try:
+            async with global_limit, model_limit:
+                stream = await get_client().aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+                async for chunk in stream:
+                    last_chunk = chunk
+                    yield chunk
+            break
+        except Exception as e:
+            if last_chunk is None and is_rate_limit_error(e) and attempt < LLM_RATE_LIMIT_RETRIES:
+                scheduler.report_rate_limited(model)
+                continue
+            raise
+
+    usage = getattr(last_chunk, "usage_metadata", None)
+    scheduler.record_usage(model, estimated_tokens, getattr(usage, "prompt_token_count", None))
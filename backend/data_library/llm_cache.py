@@ -0,0 +1,260 @@
+"""
+LLM Response Cache
+
+Two-level cache for JSON-serializable values:
+1. In-process LRU (per worker, microsecond lookups)
+2. SQLite store on disk (shared by every worker on the host)
+
+Entries expire after a TTL; the memory level is bounded by entry count and the
+disk level by total payload size (least recently used rows are evicted first).
+
+Gemini responses are cached under a hash of model + contents + generation config
+(which covers the prompt, response schema and temperature). Callers that want
+fresh sampling pass ``use_cache=False`` to ``llm.generate_content``.
+
+Hit/miss counts for a pipeline run are collected in a ``CacheStats`` that the
+caller creates and passes to each lookup.
+"""
+
+from data_library.config import (
+    LLM_CACHE_DB_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_MAX_BYTES
+)
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Run disk eviction every N writes rather than on every insert
+EVICTION_INTERVAL = 50
+
+
+@dataclass
+class CacheStats:
+    """Per-cache hit/miss counters for one pipeline run (reported in timing_metrics)."""
+    counts: Dict[str, int] = field(
+        default_factory=lambda: defaultdict(int, {"llm_cache_hits": 0, "llm_cache_misses": 0})
+    )
+
+    def record(self, metric_name: str, hit: bool):
+        self.counts[f"{metric_name}_{'hits' if hit else 'misses'}"] += 1
+
+    def as_metrics(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+
+class LRUCache:
+    """Bounded in-memory LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCacheStore:
+    """Disk-backed key/value store with TTL and total-size eviction."""
+
+    def __init__(self, db_path: Path, table: str, max_bytes: int):
+        self.db_path = Path(db_path)
+        self.table = table
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {self.table} (
+                            key TEXT PRIMARY KEY,
+                            value TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            expires_at REAL NOT NULL,
+                            last_access REAL NOT NULL
+                        )
+                    """)
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS ix_{self.table}_last_access ON {self.table} (last_access)"
+                    )
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            now = time.time()
+            if expires_at < now:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return json.loads(value)
+        finally:
+            conn.close()
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        payload = json.dumps(value)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, last_access) "
+                f"VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now + ttl_seconds, now)
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(conn)
+        finally:
+            conn.close()
+
+    def delete(self, key: str):
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop expired rows, then least recently used rows until under max_bytes."""
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            rows = conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access ASC")
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", doomed)
+            logger.info(f"Evicted {len(doomed)} entries from {self.table}")
+        conn.commit()
+
+
+class TwoLevelCache:
+    """In-process LRU in front of a shared SQLite store."""
+
+    def __init__(
+        self,
+        name: str,
+        db_path: Path = LLM_CACHE_DB_PATH,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        metric_name: str = "llm_cache"
+    ):
+        self.name = name
+        self.metric_name = metric_name
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(memory_entries, ttl_seconds)
+        self.disk = SQLiteCacheStore(db_path, name, max_bytes)
+
+    async def get(self, key: str, stats: Optional[CacheStats] = None) -> Optional[Any]:
+        """Cached value or None; the hit/miss is counted in stats when given."""
+        value = self.memory.get(key)
+        if value is None:
+            try:
+                value = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error as e:
+                logger.error(f"{self.name} cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+        if stats is not None:
+            stats.record(self.metric_name, value is not None)
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        try:
+            await asyncio.to_thread(self.disk.set, key, value, self.ttl_seconds)
+        except sqlite3.Error as e:
+            logger.error(f"{self.name} cache write failed: {e}")
+
+    async def delete(self, key: str):
+        self.memory.delete(key)
+        await asyncio.to_thread(self.disk.delete, key)
+
+
+def _serialize(value: Any) -> Any:
+    """Convert prompt contents / configs into a stable JSON-able structure."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_serialize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _serialize(v) for k, v in value.items()}
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    return repr(value)
+
+
+def make_cache_key(model: str, contents: Any, config: Any = None) -> str:
+    """Hash of model + prompt contents + generation config (schema, temperature, ...)."""
+    payload = json.dumps(
+        {"model": model, "contents": _serialize(contents), "config": _serialize(config)},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Shared cache for raw Gemini responses
+response_cache = TwoLevelCache("llm_responses")
@@ -0,0 +1,193 @@
+"""
+LLM Request Scheduler
+
+Central admission control for Gemini calls. Each model gets a pair of token
+buckets (requests/min and tokens/min) and a priority queue of waiting callers:
+
+    INTERACTIVE (diagnostic, rewrites) > GENERATION > EVALUATION > BACKGROUND
+
+Callers wait briefly for capacity on the model they asked for instead of firing
+immediately and reacting to 429s after the fact.
+"""
+
+from data_library.config import (
+    LLM_RATE_LIMITS,
+    LLM_DEFAULT_RATE_LIMIT,
+    LLM_SCHEDULER_MAX_WAIT_SECONDS
+)
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for non-text parts (e.g. research files attached by URI)
+FILE_PART_TOKEN_ESTIMATE = 2000
+
+
+class Priority(IntEnum):
+    """Scheduling lanes; lower value is served first."""
+    INTERACTIVE = 0
+    GENERATION = 1
+    EVALUATION = 2
+    BACKGROUND = 3
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a request waits longer than the scheduler allows."""
+
+
+class TokenBucket:
+    """Continuously refilling token bucket."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float):
+        """Take tokens from the bucket. Negative amounts refund tokens."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def drain(self):
+        """Empty the bucket (used after the upstream reports a rate limit)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+@dataclass
+class _ModelState:
+    requests: TokenBucket
+    tokens: TokenBucket
+    waiters: List[Tuple[int, int, int, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class LLMScheduler:
+    """Per-model token-bucket rate limiter with priority lanes."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]] = None,
+        default_limit: Tuple[int, int] = LLM_DEFAULT_RATE_LIMIT,
+        max_wait_seconds: float = LLM_SCHEDULER_MAX_WAIT_SECONDS
+    ):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.max_wait_seconds = max_wait_seconds
+        self._models: Dict[str, _ModelState] = {}
+        self._sequence = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            rpm, tpm = self.limits.get(model, self.default_limit)
+            self._models[model] = _ModelState(
+                requests=TokenBucket(rpm, rpm / 60.0),
+                tokens=TokenBucket(tpm, tpm / 60.0)
+            )
+        return self._models[model]
+
+    async def acquire(self, model: str, priority: Priority, estimated_tokens: int):
+        """Wait until ``model`` has capacity for this request, honouring priority."""
+        state = self._state(model)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(state.waiters, (int(priority), next(self._sequence), estimated_tokens, future))
+        self._dispatch(model)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # Admitted just as the timeout fired
+            future.cancel()
+            raise SchedulerTimeout(f"Timed out waiting {self.max_wait_seconds}s for {model} capacity")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            # A cancelled head-of-line waiter may have been blocking others
+            if future.cancelled():
+                self._dispatch(model)
+
+    def _dispatch(self, model: str):
+        """Admit as many queued requests as the buckets allow, in priority order."""
+        state = self._models[model]
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+
+        while state.waiters:
+            _, _, estimated_tokens, future = state.waiters[0]
+            if future.done():
+                heapq.heappop(state.waiters)
+                continue
+
+            wait = max(
+                state.requests.time_until(1),
+                state.tokens.time_until(estimated_tokens)
+            )
+            if wait > 0:
+                # Strict priority: lower lanes wait behind the head of the queue
+                state.timer = asyncio.get_running_loop().call_later(wait, self._dispatch, model)
+                return
+
+            heapq.heappop(state.waiters)
+            state.requests.consume(1)
+            state.tokens.consume(estimated_tokens)
+            future.set_result(None)
+
+    def record_usage(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real prompt size is known."""
+        if actual_tokens is None:
+            return
+        self._state(model).tokens.consume(actual_tokens - estimated_tokens)
+
+    def report_rate_limited(self, model: str):
+        """Upstream returned a 429: stop admitting requests until buckets refill."""
+        state = self._state(model)
+        logger.warning(f"Upstream rate limit for {model}; pausing admissions")
+        state.requests.drain()
+        state.tokens.drain()
+
+    def queue_depth(self, model: str) -> int:
+        """Number of callers currently waiting for ``model``."""
+        state = self._models.get(model)
+        return sum(1 for w in state.waiters if not w[3].done()) if state else 0
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Cheap prompt-size estimate (~4 characters per token)."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(c) for c in contents)
+    text = getattr(contents, "text", None)
+    if text:
+        return estimate_tokens(text)
+    return FILE_PART_TOKEN_ESTIMATE
+
+
+# Process-wide scheduler shared by every LLM call
+scheduler = LLMScheduler(limits=LLM_RATE_LIMITS)
@@ -0,0 +1,172 @@
+"""
+Schema Migrations
+
+Versioned, in-place upgrades for the SQLite database (agents_v2.db). Applied
+versions are recorded in ``schema_migrations``; ``upgrade()`` runs every
+migration above the current version, each in its own transaction. The API runs
+it at startup, and it can be run by hand:
+
+    python -m data_library.migrations            # upgrade
+    python -m data_library.migrations --status   # show applied versions
+
+Migration 1 creates any missing tables from the current models, so a fresh
+database already has the latest schema. Later migrations must therefore be
+idempotent (``IF NOT EXISTS`` / ``_add_column_if_missing``) so they are no-ops
+there and only change databases created by older code.
+"""
+
+from data_library.database import engine as default_engine, Base
+from data_library.models import ChallengeSessionSummary
+from data_library.session_summaries import backfill as backfill_summaries
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Connection, Engine
+from typing import Callable, List, Tuple
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str):
+    """Add a column to an existing table (SQLite has no ADD COLUMN IF NOT EXISTS)."""
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _has_duplicates(conn: Connection, table: str, columns: List[str]) -> bool:
+    cols = ", ".join(columns)
+    return conn.execute(text(
+        f"SELECT 1 FROM {table} GROUP BY {cols} HAVING COUNT(*) > 1 LIMIT 1"
+    )).first() is not None
+
+
+# ============================================================================
+# MIGRATIONS
+# ============================================================================
+
+def _001_create_tables(conn: Connection):
+    Base.metadata.create_all(bind=conn)
+
+
+def _002_hot_path_indexes(conn: Connection):
+    # Session listing (ORDER BY created_at) and the detail / evaluation lookups
+    for name, table, column in [
+        ("ix_challenge_sessions_created_at", "challenge_sessions", "created_at"),
+        ("ix_challenge_evaluations_statement_id", "challenge_evaluations", "statement_id"),
+        ("ix_dimension_scores_evaluation_id", "dimension_scores", "evaluation_id"),
+        ("ix_research_references_evaluation_id", "research_references", "evaluation_id"),
+    ]:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
+
+    # (session_id, position) identifies a statement. Older rows may violate
+    # uniqueness; keep them and index non-uniquely rather than fail the upgrade.
+    unique = "UNIQUE " if not _has_duplicates(conn, "challenge_statements", ["session_id", "position"]) else ""
+    if not unique:
+        logger.warning("Duplicate (session_id, position) rows found; creating a non-unique index")
+    conn.execute(text(
+        f"CREATE {unique}INDEX IF NOT EXISTS ix_challenge_statements_session_position "
+        f"ON challenge_statements (session_id, position)"
+    ))
+
+
+def _003_session_keyset_index(conn: Connection):
+    # The listing pages on (created_at, id); cover both so ties need no sort
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_challenge_sessions_created_at_id ON challenge_sessions (created_at, id)"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_challenge_sessions_created_at"))
+
+
+
+def _004_session_summaries(conn: Connection):
+    ChallengeSessionSummary.__table__.create(conn, checkfirst=True)
+    backfill_summaries(Session(bind=conn))
+
+
+
+def _005_research_content_hash(conn: Connection):
+    _add_column_if_missing(conn, "research_documents", "content_hash", "VARCHAR")
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_research_documents_content_hash "
+        "ON research_documents (content_hash)"
+    ))
+
+
+
+def _006_research_ingestion_status(conn: Connection):
+    _add_column_if_missing(conn, "research_documents", "ingestion_status", "VARCHAR NOT NULL DEFAULT 'queued'")
+    _add_column_if_missing(conn, "research_documents", "ingestion_attempts", "INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "research_documents", "ingestion_error", "TEXT")
+    # Documents uploaded before background ingestion either reached Gemini or never will
+    conn.execute(text("""
+        UPDATE research_documents
+        SET ingestion_status = CASE WHEN gemini_file_id IS NOT NULL THEN 'ready' ELSE 'failed' END,
+            ingestion_error = CASE WHEN gemini_file_id IS NOT NULL THEN NULL
+                                   ELSE 'Uploaded before background ingestion; upload again to retry' END
+        WHERE ingestion_attempts = 0 AND ingestion_status = 'queued'
+    """))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _001_create_tables),
+    (2, "hot-path indexes", _002_hot_path_indexes),
+    (3, "session listing keyset index", _003_session_keyset_index),
+    (4, "session summaries", _004_session_summaries),
+    (5, "research document content hash", _005_research_content_hash),
+    (6, "research ingestion status", _006_research_ingestion_status),
+]
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def applied_versions(engine: Engine = default_engine) -> List[int]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def upgrade(engine: Engine = default_engine) -> List[int]:
+    """Apply all pending migrations. Returns the versions applied."""
+    done = set(applied_versions(engine))
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name}
+            )
+        logger.info(f"Applied migration {version}: {name}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Upgrade the challenge database schema")
+    parser.add_argument("--status", action="store_true", help="show applied migrations and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        done = set(applied_versions())
+        for version, name, _ in MIGRATIONS:
+            print(f"{'x' if version in done else ' '} {version:03d} {name}")
+    else:
+        applied = upgrade()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
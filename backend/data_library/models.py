@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Text, Boolean, ForeignKey, JSON, Float, DateTime, func
+from sqlalchemy import Column, String, Integer, Text, Boolean, ForeignKey, JSON, Float, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from data_library.database import Base
 import uuid
@@ -87,6 +87,10 @@ class LibraryStatement(Base):
 class ChallengeSession(Base):
     """Store challenge generation sessions with full history."""
     __tablename__ = "challenge_sessions"
+    # Keyset pagination of the session listing: ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_challenge_sessions_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     brief_text = Column(Text, nullable=False)
@@ -109,6 +113,10 @@ class ChallengeSession(Base):
 class ChallengeStatement(Base):
     """Individual generated challenge statements."""
     __tablename__ = "challenge_statements"
+    # One statement per slot; also serves session_id lookups
+    __table_args__ = (
+        Index("ix_challenge_statements_session_position", "session_id", "position", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String, ForeignKey("challenge_sessions.id"))
@@ -143,7 +151,7 @@ class ChallengeEvaluation(Base):
     __tablename__ = "challenge_evaluations"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    statement_id = Column(Integer, ForeignKey("challenge_statements.id"))
+    statement_id = Column(Integer, ForeignKey("challenge_statements.id"), index=True)
     
     # Summary scores
     total_score = Column(Integer, nullable=False)  # Sum of dimension scores
@@ -163,7 +171,7 @@ class DimensionScore(Base):
     __tablename__ = "dimension_scores"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    evaluation_id = Column(Integer, ForeignKey("challenge_evaluations.id"))
+    evaluation_id = Column(Integer, ForeignKey("challenge_evaluations.id"), index=True)
     
     dimension_id = Column(String, nullable=False)  # "E01", "E02", etc.
     score = Column(Integer, nullable=False)  # 1-5
@@ -177,7 +185,7 @@ class ResearchReference(Base):
     __tablename__ = "research_references"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    evaluation_id = Column(Integer, ForeignKey("challenge_evaluations.id"))
+    evaluation_id = Column(Integer, ForeignKey("challenge_evaluations.id"), index=True)
     
     document_id = Column(String, nullable=False)  # "RD001"
     document_name = Column(String, nullable=False)
@@ -196,11 +204,37 @@ class ResearchDocument(Base):
     file_type = Column(String, nullable=False)  # "pdf", "ppt", "docx"
     file_path = Column(String, nullable=False)
     description = Column(Text, nullable=True)
+    content_hash = Column(String, nullable=True, unique=True, index=True)  # SHA-256 of the file (content-addressed storage)
     
     # Gemini Metadata
     gemini_file_id = Column(String, nullable=True)
     gemini_uri = Column(String, nullable=True)
+
+    # Background ingestion (queued, uploading, processing, ready, failed)
+    ingestion_status = Column(String, nullable=False, default="queued")
+    ingestion_attempts = Column(Integer, nullable=False, default=0)
+    ingestion_error = Column(Text, nullable=True)
     
     # Metadata
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     size_kb = Column(Integer, nullable=False)
+
+class ChallengeSessionSummary(Base):
+    """Per-session rollup for listings/dashboards, maintained by the persistence actor."""
+    __tablename__ = "session_summaries"
+
+    session_id = Column(String, ForeignKey("challenge_sessions.id"), primary_key=True)
+    statement_count = Column(Integer, nullable=False, default=0)
+    evaluated_count = Column(Integer, nullable=False, default=0)
+
+    # Token totals by stage
+    diagnostic_input_tokens = Column(Integer, nullable=False, default=0)
+    diagnostic_output_tokens = Column(Integer, nullable=False, default=0)
+    gen_input_tokens = Column(Integer, nullable=False, default=0)
+    gen_output_tokens = Column(Integer, nullable=False, default=0)
+    eval_input_tokens = Column(Integer, nullable=False, default=0)
+    eval_output_tokens = Column(Integer, nullable=False, default=0)
+    tokens_by_model = Column(JSON, nullable=True)  # {"gemini-3-pro-preview": {"input": 1200, "output": 300}}
+
+    total_latency_ms = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
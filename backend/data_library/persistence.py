@@ -0,0 +1,254 @@
+"""
+Write-Behind Persistence for Challenge Sessions
+
+The streaming endpoint must never wait on SQLite while relaying events to the
+client. Instead it submits typed events to a persistence actor: a single
+background thread that drains its queue, applies whatever has accumulated in
+one short-lived transaction, and remembers statement row IDs by
+(session, position) so evaluations are attached to the right statement even
+when formats repeat. The same transaction refreshes each touched session's
+row in ``session_summaries``.
+
+flush() returns a future that resolves once everything submitted before it has
+been committed; the stream awaits it before reporting completion so a client
+reading the session right after "complete" sees every row.
+"""
+
+from data_library.database import SessionLocal
+from data_library.session_summaries import refresh_summary
+from data_library.models import (
+    ChallengeSession, ChallengeStatement, ChallengeEvaluation, DimensionScore
+)
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on events applied in a single transaction
+MAX_BATCH_SIZE = 200
+# How long to keep collecting after the first event of a batch arrives
+BATCH_WINDOW_SECONDS = 0.05
+
+
+# ============================================================================
+# EVENTS
+# ============================================================================
+
+@dataclass
+class DiagnosticCompleted:
+    session_id: str
+    diagnostic_summary: str
+    diagnostic_path: List[Dict[str, Any]]
+
+@dataclass
+class StatementGenerated:
+    session_id: str
+    position: int
+    data: Dict[str, Any]  # challenge_generation event data
+
+@dataclass
+class StatementEvaluated:
+    session_id: str
+    position: int
+    data: Dict[str, Any]  # challenge_evaluation event data
+
+@dataclass
+class TimingRecorded:
+    session_id: str
+    timing_metrics: Dict[str, Any]
+
+@dataclass
+class SessionFinished:
+    session_id: str
+    status: str  # "completed", "error" or "cancelled"
+    error_message: Optional[str] = None
+
+@dataclass
+class _Flush:
+    future: Future = field(default_factory=Future)
+
+_STOP = object()
+
+
+# ============================================================================
+# ACTOR
+# ============================================================================
+
+class PersistenceActor:
+    """Single writer thread applying session events in batched transactions."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._statement_ids: Dict[Tuple[str, int], int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="persistence-actor", daemon=True)
+                self._thread.start()
+
+    def submit(self, event: Any):
+        """Queue an event for persistence (never blocks)."""
+        self.start()
+        self._queue.put(event)
+
+    def flush(self) -> Future:
+        """Future resolved once every event submitted so far is committed."""
+        marker = _Flush()
+        self.submit(marker)
+        return marker.future
+
+    async def flush_async(self):
+        await asyncio.wrap_future(self.flush())
+
+    def stop(self, timeout: float = 5.0):
+        """Drain outstanding events and stop the writer thread."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH_SIZE and batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get(timeout=BATCH_WINDOW_SECONDS))
+                except queue.Empty:
+                    break
+
+            stopping = batch[-1] is _STOP
+            events = [e for e in batch if e is not _STOP and not isinstance(e, _Flush)]
+            if events:
+                self._write(events)
+            for marker in batch:
+                if isinstance(marker, _Flush):
+                    marker.future.set_result(None)
+            if stopping:
+                return
+
+    def _write(self, events: List[Any]):
+        """Apply events in one transaction; on failure retry one by one so a bad event only loses itself."""
+        try:
+            self._apply_all(events)
+            return
+        except Exception as e:
+            logger.error(f"Batch persist of {len(events)} events failed, retrying individually: {e}")
+        for event in events:
+            try:
+                self._apply_all([event])
+            except Exception as e:
+                logger.error(f"Failed to persist {type(event).__name__} for {event.session_id}: {e}")
+
+    def _apply_all(self, events: List[Any]):
+        db = self.session_factory()
+        try:
+            new_ids = {}
+            for event in events:
+                self._apply(db, event, new_ids)
+            db.flush()
+            for session_id in dict.fromkeys(e.session_id for e in events):
+                refresh_summary(db, session_id)
+            db.commit()
+            self._statement_ids.update(new_ids)
+            for event in events:
+                if isinstance(event, SessionFinished):
+                    self._forget_session(event.session_id)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _apply(self, db, event: Any, new_ids: Dict[Tuple[str, int], int]):
+        if isinstance(event, DiagnosticCompleted):
+            session = db.get(ChallengeSession, event.session_id)
+            if session:
+                session.diagnostic_summary = event.diagnostic_summary
+                session.diagnostic_path = event.diagnostic_path
+
+        elif isinstance(event, StatementGenerated):
+            data = event.data
+            stmt = ChallengeStatement(
+                session_id=event.session_id,
+                text=data["text"],
+                selected_format=data["selected_format"],
+                reasoning=data["reasoning"],
+                position=event.position,
+                generation_time_ms=data.get("generation_time_ms"),
+                gen_model=data.get("gen_model"),
+                gen_input_tokens=data.get("gen_input_tokens"),
+                gen_output_tokens=data.get("gen_output_tokens")
+            )
+            db.add(stmt)
+            db.flush()
+            new_ids[(event.session_id, event.position)] = stmt.id
+
+        elif isinstance(event, StatementEvaluated):
+            stmt = self._find_statement(db, event.session_id, event.position, new_ids)
+            if stmt is None:
+                logger.warning(f"No statement at position {event.position} in session {event.session_id}")
+                return
+            data = event.data
+            stmt.evaluation_time_ms = data.get("evaluation_time_ms")
+            stmt.eval_model = data.get("eval_model")
+            stmt.eval_input_tokens = data.get("eval_input_tokens")
+            stmt.eval_output_tokens = data.get("eval_output_tokens")
+
+            eval_data = data.get("evaluation")
+            if eval_data:
+                evaluation = ChallengeEvaluation(
+                    statement_id=stmt.id,
+                    total_score=eval_data["total_score"],
+                    weighted_score=eval_data["weighted_score"],
+                    passes_non_negotiables=eval_data["passes_non_negotiables"],
+                    failed_non_negotiables=eval_data["failed_non_negotiables"],
+                    recommendation=eval_data["recommendation"],
+                    detected_format_id=eval_data.get("detected_format_id"),
+                    dimension_scores=[
+                        DimensionScore(
+                            dimension_id=dim["dimension_id"],
+                            score=dim["score"],
+                            notes=dim["notes"],
+                            has_red_flags=dim["has_red_flags"]
+                        )
+                        for dim in eval_data["dimension_scores"]
+                    ]
+                )
+                db.add(evaluation)
+
+        elif isinstance(event, TimingRecorded):
+            session = db.get(ChallengeSession, event.session_id)
+            if session:
+                session.timing_metrics = event.timing_metrics
+
+        elif isinstance(event, SessionFinished):
+            session = db.get(ChallengeSession, event.session_id)
+            if session:
+                session.status = event.status
+                session.error_message = event.error_message
+
+    def _find_statement(self, db, session_id: str, position: int, new_ids) -> Optional[ChallengeStatement]:
+        stmt_id = new_ids.get((session_id, position)) or self._statement_ids.get((session_id, position))
+        if stmt_id is not None:
+            return db.get(ChallengeStatement, stmt_id)
+        # Not tracked (e.g. the process restarted mid-session): fall back to a lookup
+        return db.query(ChallengeStatement).filter(
+            ChallengeStatement.session_id == session_id,
+            ChallengeStatement.position == position
+        ).first()
+
+    def _forget_session(self, session_id: str):
+        for key in [k for k in self._statement_ids if k[0] == session_id]:
+            del self._statement_ids[key]
+
+
+# Process-wide writer used by the streaming endpoint
+persistence = PersistenceActor()
@@ -0,0 +1,149 @@
+"""
+Research Context Cache
+
+When research is included, every generation call used to attach the same
+research files as inline ``Part.from_uri`` parts and pay the full long-context
+input cost each time. Instead we create one cached-content handle per
+(model, document set) and let every generation call reference it.
+
+Handles are shared across sessions that select the same documents and are
+recreated shortly before they expire. If creation fails (e.g. the documents are
+below the model's minimum cacheable size) callers fall back to inline parts.
+
+Backends:
+- "gemini": Gemini context caching (``client.aio.caches``)
+- "local":  in-memory fake for offline tests/development (no network)
+- "off":    always attach files inline
+"""
+
+from google.genai import types
+from data_library.config import (
+    RESEARCH_CONTEXT_CACHE_BACKEND,
+    RESEARCH_CONTEXT_CACHE_TTL_SECONDS
+)
+from data_library.llm import get_client
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Recreate handles this long before they expire so in-flight calls never hit an expired cache
+REFRESH_MARGIN_SECONDS = 120
+# After a failed creation, fall back to inline parts for this long before retrying
+FAILURE_BACKOFF_SECONDS = 300
+
+
+class GeminiContextCacheBackend:
+    """Creates cached contents through the Gemini API."""
+
+    async def create(self, model: str, parts: List[types.Part], ttl_seconds: int, display_name: str) -> Tuple[str, float]:
+        cache = await get_client().aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=[types.Content(role="user", parts=parts)],
+                ttl=f"{ttl_seconds}s",
+                display_name=display_name
+            )
+        )
+        expires_at = cache.expire_time.timestamp() if cache.expire_time else time.time() + ttl_seconds
+        return cache.name, expires_at
+
+
+class LocalContextCacheBackend:
+    """In-memory stand-in for Gemini context caching (offline tests)."""
+
+    def __init__(self):
+        self.created: List[Dict] = []
+        self._ids = itertools.count(1)
+
+    async def create(self, model: str, parts: List[types.Part], ttl_seconds: int, display_name: str) -> Tuple[str, float]:
+        name = f"cachedContents/local-{next(self._ids)}"
+        self.created.append({"name": name, "model": model, "parts": list(parts), "display_name": display_name})
+        return name, time.time() + ttl_seconds
+
+
+@dataclass
+class _Entry:
+    name: Optional[str]
+    expires_at: float
+
+
+class ResearchContextCache:
+    """Cached-content handles keyed on model + research document set."""
+
+    def __init__(self, backend, ttl_seconds: int = RESEARCH_CONTEXT_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, _Entry] = {}
+        # Creation locks live only while a caller holds or waits on them
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def key_for(model: str, parts: List[types.Part]) -> str:
+        uris = sorted(
+            part.file_data.file_uri for part in parts
+            if part.file_data and part.file_data.file_uri
+        )
+        return hashlib.sha256("\n".join([model, *uris]).encode("utf-8")).hexdigest()
+
+    async def get_handle(self, model: str, parts: List[types.Part]) -> Tuple[Optional[str], str]:
+        """
+        Get a cached-content name for these research parts on this model.
+
+        Returns (name, status) where status is "hit", "created" or "inline"
+        (name is None for "inline": attach the parts to each call instead).
+        """
+        if self.backend is None or not parts:
+            return None, "inline"
+
+        key = self.key_for(model, parts)
+        entry = self._valid_entry(key)
+        if entry:
+            return entry.name, "hit" if entry.name else "inline"
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            entry = self._valid_entry(key)
+            if entry:
+                return entry.name, "hit" if entry.name else "inline"
+            try:
+                name, expires_at = await self.backend.create(
+                    model, parts, self.ttl_seconds, display_name=f"research-{key[:12]}"
+                )
+                self._entries[key] = _Entry(name, expires_at)
+                logger.info(f"Created research context cache {name} for {len(parts)} documents")
+                return name, "created"
+            except Exception as e:
+                logger.warning(f"Research context caching unavailable, attaching files inline: {e}")
+                self._entries[key] = _Entry(None, time.time() + FAILURE_BACKOFF_SECONDS)
+                return None, "inline"
+
+    def _valid_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        margin = REFRESH_MARGIN_SECONDS if entry.name else 0
+        if entry.expires_at - margin <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+
+def _make_backend(kind: str):
+    if kind == "gemini":
+        return GeminiContextCacheBackend()
+    if kind == "local":
+        return LocalContextCacheBackend()
+    return None
+
+
+# Process-wide cache shared by all sessions
+research_context_cache = ResearchContextCache(_make_backend(RESEARCH_CONTEXT_CACHE_BACKEND))
@@ -0,0 +1,65 @@
+"""
+Content-Addressed Research Storage
+
+Uploaded research files are streamed to disk in fixed-size chunks while their
+SHA-256 is computed, then stored as ``<sha256><ext>`` in the research directory.
+Identical files therefore share one path (no same-name collisions, no duplicate
+copies), and the hash lets the API resolve a re-upload to the existing
+ResearchDocument instead of sending it to Gemini again.
+"""
+
+from data_library.config import RESEARCH_DIR, UPLOAD_CHUNK_SIZE
+from dataclasses import dataclass
+from fastapi import UploadFile
+from pathlib import Path
+import asyncio
+import hashlib
+import os
+import uuid
+
+
+@dataclass
+class StoredFile:
+    content_hash: str
+    path: Path
+    size: int
+
+
+def _suffix(filename: str) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    # Keep the extension (used for MIME type guessing) but nothing path-like
+    return suffix if suffix[1:].isalnum() else ""
+
+
+async def store_upload(
+    upload: UploadFile,
+    directory: Path = RESEARCH_DIR,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredFile:
+    """Stream an upload to content-addressed storage, holding at most one chunk in memory."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    temp_path = directory / f".upload-{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(temp_path, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await asyncio.to_thread(out.write, chunk)
+
+        content_hash = digest.hexdigest()
+        final_path = directory / f"{content_hash}{_suffix(upload.filename)}"
+        if final_path.exists():
+            temp_path.unlink()
+        else:
+            os.replace(temp_path, final_path)
+        return StoredFile(content_hash=content_hash, path=final_path, size=size)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,536 @@
+"""
+Local Retrieval Index
+
+Persistent BM25 inverted index over the local document library
+(data/documents), stored in SQLite next to the application database.
+
+``sync()`` brings the index up to date incrementally: files whose size and
+mtime are unchanged are skipped without being read, files whose content hash is
+unchanged only have their mtime refreshed, and only added / changed files are
+re-chunked and re-tokenized. Deleted files have their chunks and postings
+removed. ``sync_if_stale()`` is what searches call: it skips the directory scan
+if the index was synced within the last few seconds. Per-term document frequencies and the corpus length statistics are
+maintained alongside, so a query is a single grouped lookup over the postings of
+its terms rather than a scan over every chunk.
+
+Documents that do not live in the library directory (research uploads) are
+added with ``index_document()`` / ``remove_document()`` and are left alone by
+``sync()``.
+
+Near-duplicate content is collapsed at ingest. Every chunk and document gets
+a SimHash fingerprint (see simhash.py). A chunk within
+``SIMHASH_MAX_DISTANCE`` bits of an already indexed chunk is stored only as a
+pointer to it (``duplicate_of``), with no postings, so it is never scored or
+returned and does not grow the inverted index or the in-memory matrices. If
+the canonical chunk's document is removed, its first duplicate takes its place.
+Documents whose fingerprint matches an earlier document are flagged the same
+way (``duplicate_documents()``).
+
+Bump ``INDEX_VERSION`` whenever tokenization or chunking changes; an index
+written by another version is rebuilt from scratch on the next sync.
+"""
+
+from data_library.config import DOCS_PATH, RETRIEVAL_INDEX_PATH, SIMHASH_MAX_DISTANCE
+from data_library.chunking import SUPPORTED_SUFFIXES, chunk_file
+from data_library.simhash import SimHashAccumulator, bands, from_signed, hamming, simhash, to_signed
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+import hashlib
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 3
+
+# Files are hashed in blocks of this size rather than read whole
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or that the their
+there these this to was were will with we our you your they them than then so such not no
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (hyphenated terms kept whole), stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+@dataclass
+class IndexedChunk:
+    chunk_id: str
+    text: str
+    source: str
+    location: str
+    score: float
+
+
+def reciprocal_rank_fusion(rankings: List[List[IndexedChunk]], k: int = 60) -> List[IndexedChunk]:
+    """
+    Merge ranked lists by reciprocal rank fusion: each chunk scores the sum of
+    1 / (k + rank) over the lists it appears in. Scores are not comparable across
+    retrievers, ranks are. Returned chunks carry the fused score.
+    """
+    fused: Dict[str, float] = {}
+    chunks: Dict[str, IndexedChunk] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            fused[chunk.chunk_id] = fused.get(chunk.chunk_id, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk.chunk_id, chunk)
+    order = sorted(fused, key=lambda chunk_id: -fused[chunk_id])
+    return [
+        IndexedChunk(chunks[c].chunk_id, chunks[c].text, chunks[c].source, chunks[c].location, fused[c])
+        for c in order
+    ]
+
+
+class RetrievalIndex:
+    """BM25 index over a directory of documents, persisted in SQLite."""
+
+    def __init__(
+        self,
+        db_path: Path = RETRIEVAL_INDEX_PATH,
+        docs_dir: Path = DOCS_PATH,
+        chunker: Callable[[Path, str], Iterable] = chunk_file
+    ):
+        self.db_path = Path(db_path)
+        self.docs_dir = Path(docs_dir)
+        self.chunker = chunker
+        self._sync_lock = threading.Lock()
+        self._synced_at: Optional[float] = None
+        self._initialized = False
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._initialized:
+            self._init_schema(conn)
+            self._initialized = True
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is not None and int(row[0]) != INDEX_VERSION:
+            logger.info(f"Retrieval index version {row[0]} is stale; rebuilding")
+            for table in ("postings", "terms", "chunks", "documents"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute("DELETE FROM meta WHERE key IN ('chunk_count', 'total_length')")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                external INTEGER NOT NULL DEFAULT 0,
+                simhash INTEGER,
+                duplicate_of TEXT
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                doc_path TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                location TEXT NOT NULL,
+                text TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                simhash INTEGER,
+                band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,
+                duplicate_of INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS ix_chunks_doc_path ON chunks (doc_path);
+            CREATE INDEX IF NOT EXISTS ix_chunks_duplicate_of ON chunks (duplicate_of);
+            CREATE INDEX IF NOT EXISTS ix_chunks_band0 ON chunks (band0) WHERE duplicate_of IS NULL;
+            CREATE INDEX IF NOT EXISTS ix_chunks_band1 ON chunks (band1) WHERE duplicate_of IS NULL;
+            CREATE INDEX IF NOT EXISTS ix_chunks_band2 ON chunks (band2) WHERE duplicate_of IS NULL;
+            CREATE INDEX IF NOT EXISTS ix_chunks_band3 ON chunks (band3) WHERE duplicate_of IS NULL;
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_postings_chunk ON postings (chunk);
+        """)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(INDEX_VERSION),))
+        conn.commit()
+
+    # ------------------------------------------------------------------
+    # Incremental sync
+    # ------------------------------------------------------------------
+
+    def _library_files(self) -> Dict[str, Path]:
+        if not self.docs_dir.exists():
+            return {}
+        return {
+            p.name: p for p in self.docs_dir.glob("*")
+            if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES
+        }
+
+    def sync(self) -> Dict[str, int]:
+        """Index added / changed files and drop deleted ones. Returns counts per action."""
+        with self._sync_lock:
+            conn = self._connect()
+            try:
+                counts = self._sync(conn)
+            finally:
+                conn.close()
+            self._synced_at = time.monotonic()
+            return counts
+
+    def sync_if_stale(self, max_age_seconds: float) -> Optional[Dict[str, int]]:
+        """Sync unless the last sync finished less than max_age_seconds ago (then returns None)."""
+        if self._synced_at is not None and time.monotonic() - self._synced_at < max_age_seconds:
+            return None
+        return self.sync()
+
+    def _sync(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        indexed = {
+            path: (mtime_ns, size, content_hash)
+            for path, mtime_ns, size, content_hash in conn.execute(
+                "SELECT path, mtime_ns, size, content_hash FROM documents WHERE external = 0"
+            )
+        }
+        files = self._library_files()
+
+        for name in indexed.keys() - files.keys():
+            self._remove_document(conn, name)
+            counts["removed"] += 1
+
+        for name, path in files.items():
+            try:
+                stat = path.stat()
+                known = indexed.get(name)
+                if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                    counts["unchanged"] += 1
+                    continue
+                content_hash = self._file_hash(path)
+            except OSError as e:
+                logger.error(f"Failed to read {path}: {e}")
+                continue
+            if known and known[2] == content_hash:
+                conn.execute("UPDATE documents SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, name))
+                counts["unchanged"] += 1
+                continue
+
+            if known:
+                self._remove_document(conn, name)
+            conn.execute("SAVEPOINT add_document")
+            try:
+                fingerprint = self._add_document(conn, name, self.chunker(path, name))
+            except Exception as e:
+                # Record the file without chunks so it is not retried until it changes
+                logger.error(f"Failed to index {path}: {e}")
+                conn.execute("ROLLBACK TO add_document")
+                fingerprint = None
+            conn.execute("RELEASE add_document")
+            self._record_document(conn, name, stat.st_mtime_ns, stat.st_size, content_hash, False, fingerprint)
+            counts["updated" if known else "added"] += 1
+
+        if counts["added"] or counts["updated"] or counts["removed"]:
+            self._bump_generation(conn)
+            logger.info(f"Retrieval index synced: {counts}")
+        conn.commit()
+        return counts
+
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _bump_generation(self, conn: sqlite3.Connection):
+        # Lets in-memory views of the index (sparse / n-gram retrievers) notice changes
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def index_document(self, name: str, chunks: Iterable, content_hash: str) -> Optional[str]:
+        """
+        Add or replace a document that is not part of the library directory.
+        Returns the name of the document it near-duplicates, if any.
+        """
+        with self._sync_lock:
+            conn = self._connect()
+            try:
+                self._remove_document(conn, name)
+                fingerprint = self._add_document(conn, name, chunks)
+                duplicate_of = self._record_document(conn, name, 0, 0, content_hash, True, fingerprint)
+                self._bump_generation(conn)
+                conn.commit()
+                return duplicate_of
+            finally:
+                conn.close()
+
+    def remove_document(self, name: str):
+        with self._sync_lock:
+            conn = self._connect()
+            try:
+                self._remove_document(conn, name)
+                self._bump_generation(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _add_document(self, conn: sqlite3.Connection, name: str, chunks: Iterable) -> Optional[int]:
+        """Index a document's chunks, collapsing near-duplicates. Returns the document fingerprint."""
+        doc_df: Counter = Counter()
+        doc_hash = SimHashAccumulator()
+        total_length = 0
+        chunk_count = 0
+        duplicates = 0
+        for chunk in chunks:
+            tokens = tokenize(chunk.text)
+            term_counts = Counter(tokens)
+            length = len(tokens)
+            fingerprint = simhash(tokens)
+            doc_hash.add(tokens)
+            canonical = self._find_duplicate_chunk(conn, fingerprint)
+            chunk_rowid = conn.execute(
+                "INSERT INTO chunks (doc_path, chunk_id, source, location, text, length, simhash, "
+                "band0, band1, band2, band3, duplicate_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, chunk.chunk_id, chunk.source, chunk.location, chunk.text, length,
+                 *self._fingerprint_columns(fingerprint), canonical)
+            ).lastrowid
+            if canonical is not None:
+                duplicates += 1
+                continue
+            self._insert_postings(conn, chunk_rowid, term_counts, length)
+            doc_df.update(term_counts.keys())
+            total_length += length
+            chunk_count += 1
+        conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            doc_df.items()
+        )
+        self._adjust_totals(conn, chunks=chunk_count, length=total_length)
+        if duplicates:
+            logger.info(f"{name}: collapsed {duplicates} near-duplicate chunk(s)")
+        return doc_hash.fingerprint()
+
+    @staticmethod
+    def _fingerprint_columns(fingerprint: Optional[int]) -> tuple:
+        if fingerprint is None:
+            return (None,) * 5
+        return (to_signed(fingerprint), *bands(fingerprint))
+
+    @staticmethod
+    def _insert_postings(conn: sqlite3.Connection, chunk_rowid: int, term_counts: Counter, length: int):
+        conn.executemany(
+            "INSERT INTO postings (term, chunk, tf, length) VALUES (?, ?, ?, ?)",
+            [(term, chunk_rowid, tf, length) for term, tf in term_counts.items()]
+        )
+
+    def _find_duplicate_chunk(self, conn: sqlite3.Connection, fingerprint: Optional[int]) -> Optional[int]:
+        """Row id of an indexed canonical chunk within SIMHASH_MAX_DISTANCE bits, if any."""
+        if fingerprint is None:
+            return None
+        candidates = conn.execute(
+            "SELECT id, simhash FROM chunks WHERE duplicate_of IS NULL "
+            "AND (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?) ORDER BY id",
+            bands(fingerprint)
+        )
+        for chunk_rowid, other in candidates:
+            if other is not None and hamming(fingerprint, from_signed(other)) <= SIMHASH_MAX_DISTANCE:
+                return chunk_rowid
+        return None
+
+    def _find_duplicate_document(self, conn: sqlite3.Connection, name: str, fingerprint: Optional[int]) -> Optional[str]:
+        if fingerprint is None:
+            return None
+        for other_name, other in conn.execute(
+            "SELECT path, simhash FROM documents WHERE duplicate_of IS NULL AND simhash IS NOT NULL "
+            "AND path != ? ORDER BY rowid", (name,)
+        ):
+            if hamming(fingerprint, from_signed(other)) <= SIMHASH_MAX_DISTANCE:
+                return other_name
+        return None
+
+    def _record_document(self, conn: sqlite3.Connection, name: str, mtime_ns: int, size: int,
+                         content_hash: str, external: bool, fingerprint: Optional[int]) -> Optional[str]:
+        duplicate_of = self._find_duplicate_document(conn, name, fingerprint)
+        conn.execute(
+            "INSERT INTO documents (path, mtime_ns, size, content_hash, external, simhash, duplicate_of) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, mtime_ns, size, content_hash, int(external),
+             to_signed(fingerprint) if fingerprint is not None else None, duplicate_of)
+        )
+        if duplicate_of:
+            logger.info(f"{name} is a near-duplicate of {duplicate_of}")
+        return duplicate_of
+
+    def _remove_document(self, conn: sqlite3.Connection, name: str):
+        chunk_count, total_length = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE doc_path = ? AND duplicate_of IS NULL",
+            (name,)
+        ).fetchone()
+        doc_df = conn.execute("""
+            SELECT p.term, COUNT(*) FROM chunks c JOIN postings p ON p.chunk = c.id
+            WHERE c.doc_path = ? GROUP BY p.term
+        """, (name,)).fetchall()
+        orphaned = [row[0] for row in conn.execute(
+            "SELECT DISTINCT d.duplicate_of FROM chunks d JOIN chunks c ON c.id = d.duplicate_of "
+            "WHERE c.doc_path = ? AND d.doc_path != ?", (name, name)
+        )]
+        conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(df, term) for term, df in doc_df])
+        conn.execute("DELETE FROM terms WHERE df <= 0")
+        conn.execute("DELETE FROM postings WHERE chunk IN (SELECT id FROM chunks WHERE doc_path = ?)", (name,))
+        conn.execute("DELETE FROM chunks WHERE doc_path = ?", (name,))
+        conn.execute("DELETE FROM documents WHERE path = ?", (name,))
+        self._adjust_totals(conn, chunks=-chunk_count, length=-total_length)
+
+        for canonical in orphaned:
+            self._promote_duplicate(conn, canonical)
+        # Documents that pointed here are re-checked against the remaining ones
+        for dependent, fingerprint in conn.execute(
+            "SELECT path, simhash FROM documents WHERE duplicate_of = ? ORDER BY rowid", (name,)
+        ).fetchall():
+            conn.execute(
+                "UPDATE documents SET duplicate_of = ? WHERE path = ?",
+                (self._find_duplicate_document(conn, dependent, from_signed(fingerprint)), dependent)
+            )
+
+    def _promote_duplicate(self, conn: sqlite3.Connection, removed_canonical: int):
+        """Make the first duplicate of a removed chunk canonical and re-point the rest to it."""
+        dependents = conn.execute(
+            "SELECT id, text FROM chunks WHERE duplicate_of = ? ORDER BY id", (removed_canonical,)
+        ).fetchall()
+        new_id, text = dependents[0]
+        tokens = tokenize(text)
+        term_counts = Counter(tokens)
+        conn.execute("UPDATE chunks SET duplicate_of = NULL WHERE id = ?", (new_id,))
+        conn.execute("UPDATE chunks SET duplicate_of = ? WHERE duplicate_of = ?", (new_id, removed_canonical))
+        self._insert_postings(conn, new_id, term_counts, len(tokens))
+        conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT (term) DO UPDATE SET df = df + 1",
+            [(term,) for term in term_counts]
+        )
+        self._adjust_totals(conn, chunks=1, length=len(tokens))
+
+    def _adjust_totals(self, conn: sqlite3.Connection, chunks: int, length: int):
+        for key, delta in (("chunk_count", chunks), ("total_length", length)):
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + ?",
+                (key, delta, delta)
+            )
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 12) -> List[IndexedChunk]:
+        """Top-k chunks by BM25 score (chunks matching no query term are never returned)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or top_k <= 0:
+            return []
+        conn = self._connect()
+        try:
+            stats = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('chunk_count', 'total_length')"))
+            n_chunks = int(stats.get("chunk_count", 0))
+            if not n_chunks:
+                return []
+            avg_length = max(int(stats.get("total_length", 0)) / n_chunks, 1.0)
+
+            placeholders = ",".join("?" * len(terms))
+            weights = [
+                (term, math.log(1 + (n_chunks - df + 0.5) / (df + 0.5)))
+                for term, df in conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms)
+            ]
+            if not weights:
+                return []
+
+            values = ",".join("(?, ?)" for _ in weights)
+            params = [v for pair in weights for v in pair]
+            rows = conn.execute(f"""
+                WITH q(term, idf) AS (VALUES {values}),
+                top AS (
+                    SELECT p.chunk AS chunk,
+                           SUM(q.idf * p.tf * ({BM25_K1} + 1)
+                               / (p.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * p.length / ?))) AS score
+                    FROM q JOIN postings p ON p.term = q.term
+                    GROUP BY p.chunk
+                    ORDER BY score DESC, p.chunk
+                    LIMIT ?
+                )
+                SELECT c.chunk_id, c.text, c.source, c.location, top.score
+                FROM top JOIN chunks c ON c.id = top.chunk
+                ORDER BY top.score DESC, top.chunk
+            """, params + [avg_length, top_k]).fetchall()
+        finally:
+            conn.close()
+        return [IndexedChunk(*row) for row in rows]
+
+    def _meta_int(self, key: str) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return int(row[0]) if row else 0
+        finally:
+            conn.close()
+
+    def chunk_count(self) -> int:
+        return self._meta_int("chunk_count")
+
+    def generation(self) -> int:
+        """Counter bumped by every sync that changed the index."""
+        return self._meta_int("generation")
+
+    def duplicate_documents(self) -> Dict[str, str]:
+        """Near-duplicate documents mapped to the document they duplicate."""
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT path, duplicate_of FROM documents WHERE duplicate_of IS NOT NULL"))
+        finally:
+            conn.close()
+
+    def duplicate_chunk_count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM chunks WHERE duplicate_of IS NOT NULL").fetchone()[0]
+        finally:
+            conn.close()
+
+    def load(self):
+        """All canonical chunks (ordered by row id) and postings, for building in-memory views."""
+        conn = self._connect()
+        try:
+            chunks = conn.execute(
+                "SELECT id, chunk_id, text, source, location, length FROM chunks "
+                "WHERE duplicate_of IS NULL ORDER BY id"
+            ).fetchall()
+            postings = conn.execute("SELECT chunk, term, tf FROM postings").fetchall()
+        finally:
+            conn.close()
+        return chunks, postings
+
+
+# Process-wide index over the document library and ingested research uploads
+retrieval_index = RetrievalIndex()
@@ -0,0 +1,96 @@
+"""
+Session Summaries
+
+Denormalized per-session rollup (statement count, tokens by stage and model,
+total latency) stored in ``session_summaries`` so listings and dashboards read
+one narrow row per session instead of walking statements.
+
+The persistence actor calls ``refresh_summary`` in the same transaction that
+writes a session's statements, evaluations or timing metrics. For databases
+that predate the table (or to repair drift):
+
+    python -m data_library.session_summaries --backfill
+"""
+
+from data_library.models import ChallengeSession, ChallengeStatement, ChallengeSessionSummary
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _add_tokens(by_model: Dict[str, Dict[str, int]], model: Optional[str], input_tokens, output_tokens):
+    if not model:
+        return
+    entry = by_model.setdefault(model, {"input": 0, "output": 0})
+    entry["input"] += input_tokens or 0
+    entry["output"] += output_tokens or 0
+
+
+def refresh_summary(db: Session, session_id: str) -> Optional[ChallengeSessionSummary]:
+    """Recompute a session's summary row from its current rows (caller commits)."""
+    session = db.get(ChallengeSession, session_id)
+    if session is None:
+        return None
+    statements = db.execute(
+        select(
+            ChallengeStatement.gen_model, ChallengeStatement.gen_input_tokens,
+            ChallengeStatement.gen_output_tokens, ChallengeStatement.eval_model,
+            ChallengeStatement.eval_input_tokens, ChallengeStatement.eval_output_tokens
+        ).where(ChallengeStatement.session_id == session_id)
+    ).all()
+    timing = session.timing_metrics or {}
+
+    by_model: Dict[str, Dict[str, int]] = {}
+    _add_tokens(by_model, timing.get("diagnostic_model"),
+                timing.get("diagnostic_input_tokens"), timing.get("diagnostic_output_tokens"))
+    for stmt in statements:
+        _add_tokens(by_model, stmt.gen_model, stmt.gen_input_tokens, stmt.gen_output_tokens)
+        _add_tokens(by_model, stmt.eval_model, stmt.eval_input_tokens, stmt.eval_output_tokens)
+
+    summary = db.get(ChallengeSessionSummary, session_id)
+    if summary is None:
+        summary = ChallengeSessionSummary(session_id=session_id)
+        db.add(summary)
+    summary.statement_count = len(statements)
+    summary.evaluated_count = sum(1 for s in statements if s.eval_model)
+    summary.diagnostic_input_tokens = timing.get("diagnostic_input_tokens") or 0
+    summary.diagnostic_output_tokens = timing.get("diagnostic_output_tokens") or 0
+    summary.gen_input_tokens = sum(s.gen_input_tokens or 0 for s in statements)
+    summary.gen_output_tokens = sum(s.gen_output_tokens or 0 for s in statements)
+    summary.eval_input_tokens = sum(s.eval_input_tokens or 0 for s in statements)
+    summary.eval_output_tokens = sum(s.eval_output_tokens or 0 for s in statements)
+    summary.tokens_by_model = by_model
+    summary.total_latency_ms = timing.get("total_latency_ms")
+    return summary
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Rebuild the summary of every session. Returns the number of sessions processed."""
+    session_ids = db.scalars(select(ChallengeSession.id)).all()
+    for i, session_id in enumerate(session_ids, 1):
+        refresh_summary(db, session_id)
+        if i % batch_size == 0:
+            db.commit()
+    db.commit()
+    return len(session_ids)
+
+
+if __name__ == "__main__":
+    from data_library.database import SessionLocal
+    from data_library.migrations import upgrade
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Maintain the session_summaries table")
+    parser.add_argument("--backfill", action="store_true", help="rebuild summaries for all sessions")
+    args = parser.parse_args()
+
+    if args.backfill:
+        upgrade()  # make sure the table exists
+        with SessionLocal() as db:
+            print(f"Rebuilt {backfill(db)} session summaries")
+    else:
+        parser.print_help()
@@ -0,0 +1,87 @@
+"""
+SimHash Fingerprints
+
+64-bit SimHash over 3-token shingles of a chunk's retrieval tokens
+(``retrieval_index.tokenize``: lowercased, stopwords removed). Texts whose
+fingerprints differ in at most ``SIMHASH_MAX_DISTANCE`` bits are treated as
+near-duplicates.
+
+The per-bit weights are additive, so ``SimHashAccumulator`` builds a document
+fingerprint from its chunks as they stream past without holding the text.
+
+For lookups the fingerprint is split into four 16-bit bands: with a distance
+of at most 3, two near-duplicates must agree exactly on at least one band
+(pigeonhole), so candidates can be found by equality on indexed columns.
+"""
+
+from typing import List, Optional, Tuple
+import hashlib
+
+import numpy as np
+
+BITS = 64
+BANDS = 4
+SHINGLE_SIZE = 3
+
+_BIT_SHIFTS = np.arange(BITS, dtype=np.uint64)
+
+
+def _shingles(tokens: List[str]) -> List[str]:
+    if len(tokens) <= SHINGLE_SIZE:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+
+def _weights(tokens: List[str]) -> np.ndarray:
+    """Per-bit vote totals (+1 per shingle with the bit set, -1 otherwise)."""
+    shingles = _shingles(tokens)
+    if not shingles:
+        return np.zeros(BITS, dtype=np.int64)
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    )
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int64)
+    return (2 * bits - 1).sum(axis=0)
+
+
+def _fingerprint(weights: np.ndarray) -> Optional[int]:
+    if not weights.any():
+        return None
+    return sum(1 << int(i) for i in np.flatnonzero(weights > 0))
+
+
+def simhash(tokens: List[str]) -> Optional[int]:
+    """Fingerprint of a token sequence, or None if it is empty."""
+    return _fingerprint(_weights(tokens))
+
+
+class SimHashAccumulator:
+    """Document fingerprint built incrementally from its chunks."""
+
+    def __init__(self):
+        self._weights = np.zeros(BITS, dtype=np.int64)
+
+    def add(self, tokens: List[str]):
+        self._weights += _weights(tokens)
+
+    def fingerprint(self) -> Optional[int]:
+        return _fingerprint(self._weights)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def bands(fingerprint: int) -> Tuple[int, ...]:
+    width = BITS // BANDS
+    return tuple((fingerprint >> (i * width)) & ((1 << width) - 1) for i in range(BANDS))
+
+
+def to_signed(fingerprint: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def from_signed(value: int) -> int:
+    return value + (1 << BITS) if value < 0 else value
@@ -0,0 +1,69 @@
+"""
+Single-Flight Request Coalescing
+
+Concurrent callers asking for the same thing (same key) share one in-flight
+call instead of each making their own: the first caller starts the work and
+everyone who arrives before it finishes awaits the same result (or exception).
+
+The work runs as its own task, so one waiter being cancelled (e.g. a client
+disconnecting) does not cancel it for the others; it is only cancelled once
+every waiter has gone away.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the call already in flight for key."""
+        result, _ = self.join(key, fn)
+        return await result
+
+    def join(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Awaitable[Any], bool]:
+        """
+        Like do(), but registers immediately: returns (awaitable result, started)
+        where started is True if this caller started fn() rather than joining.
+        """
+        call = self._calls.get(key)
+        started = call is None
+        if started:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            logger.debug(f"Joining in-flight call {key[:12]}")
+        # Counted now, so the call is not cancelled before this waiter starts awaiting
+        call.waiters += 1
+        return self._wait(call), started
+
+    async def _wait(self, call: _Call) -> Any:
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
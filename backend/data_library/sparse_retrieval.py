@@ -0,0 +1,143 @@
+"""
+Sparse Matrix Retrieval
+
+In-memory, vectorized scoring over the local retrieval index. The corpus is
+held as a CSR chunk x term matrix whose entries are the BM25 term weights
+(idf x saturated, length-normalised tf), so a query is a single sparse
+matrix-vector product against a 0/1 query-term vector and scores match
+``RetrievalIndex.search`` exactly. Several queries are scored together as one
+sparse x dense matrix product, with per-query top-k picked by ``argpartition``
+rather than a full sort.
+
+The matrix is built from the persistent index and rebuilt only when a sync
+changed it (``RetrievalIndex.generation()``); ``from_chunks`` builds one
+directly from chunk objects (used by tests and scripts/benchmark_retrieval.py).
+A rebuild publishes the matrix, vocabulary and chunk list together as one
+immutable snapshot, so a concurrent search never mixes old and new parts.
+"""
+
+from data_library.retrieval_index import (
+    BM25_B, BM25_K1, IndexedChunk, RetrievalIndex, tokenize
+)
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+import threading
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot(NamedTuple):
+    matrix: sparse.csr_matrix
+    vocab: Dict[str, int]
+    chunks: List[Tuple[str, str, str, str]]  # (chunk_id, text, source, location)
+
+
+class SparseRetriever:
+    """BM25-weighted term-document matrix with batched top-k queries."""
+
+    def __init__(self, index: Optional[RetrievalIndex] = None):
+        self.index = index
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable) -> "SparseRetriever":
+        """Build from objects with chunk_id / text / source / location attributes."""
+        retriever = cls()
+        rows, postings = [], []
+        for row, chunk in enumerate(chunks):
+            term_counts = Counter(tokenize(chunk.text))
+            rows.append((row, chunk.chunk_id, chunk.text, chunk.source, chunk.location, sum(term_counts.values())))
+            postings.extend((row, term, tf) for term, tf in term_counts.items())
+        retriever._snapshot = retriever._build(rows, postings)
+        return retriever
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    def refresh(self):
+        """Rebuild from the persistent index if it changed since the last build."""
+        if self.index is None:
+            return
+        generation = self.index.generation()
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation != self._generation:
+                snapshot = self._build(*self.index.load())
+                self._snapshot = snapshot  # single assignment: searches see all old or all new
+                self._generation = generation
+                logger.info(f"Sparse retrieval matrix built: {snapshot.matrix.shape[0]} chunks x {snapshot.matrix.shape[1]} terms")
+
+    @staticmethod
+    def _build(chunk_rows: Sequence[tuple], postings: Sequence[tuple]) -> _Snapshot:
+        row_of = {row_id: i for i, (row_id, *_rest) in enumerate(chunk_rows)}
+        vocab: Dict[str, int] = {}
+        n_postings = len(postings)
+        rows = np.empty(n_postings, dtype=np.int32)
+        cols = np.empty(n_postings, dtype=np.int32)
+        tfs = np.empty(n_postings, dtype=np.float32)
+        for i, (chunk, term, tf) in enumerate(postings):
+            rows[i] = row_of[chunk]
+            cols[i] = vocab.setdefault(term, len(vocab))
+            tfs[i] = tf
+
+        n_chunks = len(chunk_rows)
+        lengths = np.array([r[5] for r in chunk_rows], dtype=np.float32)
+        avg_length = max(float(lengths.mean()) if n_chunks else 0.0, 1.0)
+        df = np.bincount(cols, minlength=len(vocab)).astype(np.float32)
+        idf = np.log1p((n_chunks - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / avg_length)
+        weights = idf[cols] * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        return _Snapshot(
+            matrix=sparse.csr_matrix((weights, (rows, cols)), shape=(n_chunks, len(vocab)), dtype=np.float32),
+            vocab=vocab,
+            chunks=[tuple(r[1:5]) for r in chunk_rows]
+        )
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 12) -> List[IndexedChunk]:
+        return self.search_batch([query], top_k)[0]
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 12) -> List[List[IndexedChunk]]:
+        """Top-k chunks per query, scored together in one matrix product."""
+        self.refresh()
+        snapshot = self._snapshot
+        if snapshot is None or not queries or top_k <= 0 or snapshot.matrix.shape[0] == 0:
+            return [[] for _ in queries]
+
+        vocab = snapshot.vocab
+        query_matrix = np.zeros((len(vocab), len(queries)), dtype=np.float32)
+        for q, query in enumerate(queries):
+            cols = [vocab[t] for t in set(tokenize(query)) if t in vocab]
+            query_matrix[cols, q] = 1.0
+        scores = snapshot.matrix @ query_matrix  # (n_chunks, n_queries)
+
+        n_chunks = scores.shape[0]
+        k = min(top_k, n_chunks)
+        if k < n_chunks:
+            candidates = np.argpartition(-scores, k - 1, axis=0)[:k]
+        else:
+            candidates = np.broadcast_to(np.arange(n_chunks)[:, None], scores.shape)
+
+        results = []
+        for q in range(len(queries)):
+            rows = candidates[:, q]
+            row_scores = scores[rows, q]
+            # Highest score first, ties by position (as RetrievalIndex.search)
+            order = np.lexsort((rows, -row_scores))
+            results.append([
+                IndexedChunk(*snapshot.chunks[rows[i]], score=float(row_scores[i]))
+                for i in order if row_scores[i] > 0
+            ])
+        return results
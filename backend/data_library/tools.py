@@ -15,9 +15,8 @@ def search_data_library(query: str) -> str:
     if not files:
         return "No documents found in the library."
         
-    # Perform search (using Gemini 2.0's massive context window as the 'RAG' engine)
-    # in a real RAG setup with 10k+ docs we'd use semantic retrieval, 
-    # but for workshop scale (<50 docs), full context is superior.
+    # Perform search (Gemini reads the attached files as the 'RAG' engine); the
+    # local index narrows the library to the files relevant to the query first
     return search_library(query, files)
 
 def analyze_brand_positioning(statement: str) -> str:
@@ -36,7 +35,8 @@ def analyze_brand_positioning(statement: str) -> str:
     
     Cite specific documents where possible.
     """
-    return search_library(prompt)
+    # Rank library files by the statement itself, not the instructions around it
+    return search_library(prompt, ranking_query=statement)
 
 def check_regulatory_compliance(claims: str) -> str:
     """
@@ -52,4 +52,4 @@ def check_regulatory_compliance(claims: str) -> str:
     - Off-label promotion cues
     - Lack of substantial evidence
     """
-    return search_library(prompt)
+    return search_library(prompt, ranking_query=claims)
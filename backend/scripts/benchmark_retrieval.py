@@ -0,0 +1,133 @@
+"""
+Benchmark local chunk retrieval on a synthetic corpus.
+
+Compares the original per-request loop (substring scan of every chunk for every
+query term) with the sparse-matrix retriever, one query at a time and batched,
+the hashed character n-gram retriever, and optionally the SQLite BM25 index.
+
+    cd backend
+    python scripts/benchmark_retrieval.py                    # 1k / 10k / 100k chunks
+    python scripts/benchmark_retrieval.py --sizes 1000 --sqlite
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.getcwd())
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import numpy as np
+
+from data_library.chunking import Chunk, chunk_file
+from data_library.retrieval_index import RetrievalIndex
+from data_library.sparse_retrieval import SparseRetriever
+from data_library.ngram_retrieval import NgramRetriever
+
+WORDS_PER_CHUNK = 90
+VOCAB_SIZE = 30000
+
+
+def make_corpus(n_chunks: int, rng: np.random.Generator):
+    # Zipf-distributed word ids give a realistic mix of common and rare terms
+    vocab = np.array([f"term{i}" for i in range(VOCAB_SIZE)])
+    ids = np.minimum(rng.zipf(1.2, size=(n_chunks, WORDS_PER_CHUNK)), VOCAB_SIZE) - 1
+    return [
+        Chunk(f"doc{i // 100}.md_chk_{i % 100}", " ".join(vocab[row]), f"doc{i // 100}.md", f"Segment {i % 100}")
+        for i, row in enumerate(ids)
+    ], vocab
+
+
+def make_queries(vocab, n_queries: int, rng: np.random.Generator):
+    # Brainstorm queries are long (brief + audience + statements)
+    return [" ".join(rng.choice(vocab[:5000], size=40)) for _ in range(n_queries)]
+
+
+def legacy_search(chunks, query: str, top_k: int):
+    """The original retrieve_chunks scoring loop."""
+    query_terms = set(query.lower().split())
+    scored = []
+    for chunk in chunks:
+        score = 0
+        chunk_lower = chunk.text.lower()
+        for term in query_terms:
+            if term in chunk_lower:
+                score += 1
+        if query.lower() in chunk_lower:
+            score += 5
+        if score > 0:
+            scored.append((score, chunk))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored[:top_k]
+
+
+def timed(fn, repeat: int) -> float:
+    """Mean milliseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def sqlite_index(chunks, directory: Path) -> RetrievalIndex:
+    docs = directory / "documents"
+    docs.mkdir()
+    by_source = {}
+    for chunk in chunks:
+        by_source.setdefault(chunk.source, []).append(chunk.text)
+    for source, texts in by_source.items():
+        (docs / source).write_text("\n\n".join(texts))
+    # Each paragraph is exactly one chunk budget, so the chunker keeps one chunk per paragraph
+    index = RetrievalIndex(
+        db_path=directory / "index.db", docs_dir=docs,
+        chunker=lambda path, name: chunk_file(path, name, max_tokens=WORDS_PER_CHUNK, overlap_tokens=0)
+    )
+    index.sync()
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=16, help="queries per batch")
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--sqlite", action="store_true", help="also time the SQLite BM25 index (slow to build)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    header = f"{'chunks':>8} {'legacy ms/q':>12} {'matrix ms/q':>12} {'batched ms/q':>13} {'build s':>8} {'ngram ms/q':>11} {'ngram build s':>14}"
+    if args.sqlite:
+        header += f" {'sqlite ms/q':>12}"
+    print(header)
+
+    for size in args.sizes:
+        chunks, vocab = make_corpus(size, rng)
+        queries = make_queries(vocab, args.queries, rng)
+
+        start = time.perf_counter()
+        retriever = SparseRetriever.from_chunks(chunks)
+        build_s = time.perf_counter() - start
+
+        legacy_repeat = max(1, 10000 // size)
+        legacy = timed(lambda: legacy_search(chunks, queries[0], args.top_k), legacy_repeat)
+        single = timed(lambda: [retriever.search(q, args.top_k) for q in queries], 3) / len(queries)
+        batched = timed(lambda: retriever.search_batch(queries, args.top_k), 3) / len(queries)
+
+        start = time.perf_counter()
+        ngram = NgramRetriever.from_chunks(chunks)
+        ngram_build_s = time.perf_counter() - start
+        ngram_ms = timed(lambda: [ngram.search(q, args.top_k) for q in queries], 3) / len(queries)
+
+        row = (f"{size:>8} {legacy:>12.2f} {single:>12.2f} {batched:>13.2f} {build_s:>8.2f}"
+               f" {ngram_ms:>11.2f} {ngram_build_s:>14.2f}")
+        if args.sqlite:
+            with tempfile.TemporaryDirectory() as tmp:
+                index = sqlite_index(chunks, Path(tmp))
+                row += f" {timed(lambda: [index.search(q, args.top_k) for q in queries], 1) / len(queries):>12.2f}"
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main()
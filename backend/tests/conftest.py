@@ -0,0 +1,22 @@
+"""
+Shared test setup: keep the suite from writing into the source tree.
+
+Importing data_library.api migrates the database at DB_PATH and opens LOG_FILE,
+and the LLM cache / retrieval index default to files under backend/data. All of
+them are pointed at a scratch directory before any test module is imported.
+config.py also refuses to import without GEMINI_API_KEY; the tests never reach
+the network, so a placeholder is enough.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="brainstorming-agent-tests-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+
+os.environ["DB_PATH"] = os.path.join(_scratch, "agents_v2.db")
+os.environ["LLM_CACHE_DB_PATH"] = os.path.join(_scratch, "llm_cache.db")
+os.environ["RETRIEVAL_INDEX_PATH"] = os.path.join(_scratch, "retrieval_index.db")
+os.environ["LOG_FILE"] = os.path.join(_scratch, "backend_debug.log")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
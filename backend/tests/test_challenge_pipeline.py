@@ -0,0 +1,297 @@
+"""
+Offline tests for the challenge generation pipeline (LLM calls faked).
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from data_library import challenge_generator as cg
+
+FORMATS = ["F01", "F02", "F03", "F04", "F05"]
+
+
+def _scores(score=4):
+    return [
+        {"dimension_id": d, "score": score, "notes": "ok", "has_red_flags": False}
+        for d in cg.EVALUATION_DIMENSIONS
+    ]
+
+
+def _fake_diagnostic(formats=FORMATS):
+    async def fake(brief_text, model_name=cg.GEMINI_PRO_MODEL, use_cache=True, priority=None, **kwargs):
+        return {
+            "diagnostic_path": [],
+            "selected_formats": [
+                {"format_id": f, "reasoning": f"why {f}", "priority": i + 1}
+                for i, f in enumerate(formats)
+            ],
+            "diagnostic_summary": "summary",
+            "model_name": model_name,
+            "cached": False
+        }
+    return fake
+
+
+async def _fake_generate(brief_text, format_id, reasoning, research_files=None,
+                         model_name=cg.GEMINI_PRO_MODEL, use_cache=True, **kwargs):
+    return {
+        "text": f"How can we {format_id}?",
+        "format_id": format_id,
+        "model_name": model_name,
+        "input_tokens": 100,
+        "output_tokens": 10
+    }
+
+
+def _collect(**kwargs):
+    async def run():
+        return [json.loads(e) async for e in cg.generate_challenges_stream(
+            brief_text="brief", include_research=False, selected_research_ids=[], **kwargs
+        )]
+    return asyncio.run(run())
+
+
+def test_batch_evaluation_makes_one_call_and_fans_out(monkeypatch):
+    monkeypatch.setattr(cg, "get_diagnostic", _fake_diagnostic())
+    monkeypatch.setattr(cg, "generate_single_statement_with_ai", _fake_generate)
+    prompts = []
+
+    async def fake_generate_content(model, contents, config=None, **kwargs):
+        prompts.append(contents)
+        body = {
+            f"statement_{i}": {"detected_format_id": f"F0{i}", "scores": _scores()}
+            for i in range(1, 6)
+        }
+        return SimpleNamespace(
+            text=json.dumps(body),
+            usage_metadata=SimpleNamespace(prompt_token_count=1003, candidates_token_count=502)
+        )
+
+    async def single_eval_must_not_run(*args, **kwargs):
+        raise AssertionError("per-statement evaluation called in batch mode")
+
+    monkeypatch.setattr(cg, "generate_content", fake_generate_content)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", single_eval_must_not_run)
+
+    events = _collect(batch_evaluation=True, stream_text=False)
+
+    evaluations = [e for e in events if e["type"] == "challenge_evaluation"]
+    assert len(prompts) == 1
+    assert sorted(e["data"]["id"] for e in evaluations) == [1, 2, 3, 4, 5]
+    by_id = {e["data"]["id"]: e["data"] for e in evaluations}
+    # Even shares, the first statement taking the remainder, adding up to the batch usage
+    assert [by_id[i]["eval_input_tokens"] for i in range(1, 6)] == [203, 200, 200, 200, 200]
+    assert sum(d["eval_output_tokens"] for d in by_id.values()) == 502
+    assert evaluations[2]["data"]["evaluation"]["detected_format_id"] == "F03"
+    assert events[-1]["type"] == "timing_metrics"
+
+
+def test_streaming_generation_emits_partial_text(monkeypatch):
+    monkeypatch.setattr(cg, "get_diagnostic", _fake_diagnostic(["F01"]))
+    pieces = ['{"text": "How can', ' we help', ' HCPs?", "reasoning_check": "fits"}']
+
+    async def fake_stream(model, contents, config=None, **kwargs):
+        for i, piece in enumerate(pieces):
+            usage = SimpleNamespace(prompt_token_count=50, candidates_token_count=12) if i == len(pieces) - 1 else None
+            yield SimpleNamespace(text=piece, usage_metadata=usage)
+
+    async def fake_evaluate(**kwargs):
+        return cg.create_default_evaluation()
+
+    monkeypatch.setattr(cg, "generate_content_stream", fake_stream)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", fake_evaluate)
+
+    events = _collect()
+
+    deltas = [e["data"]["text"] for e in events if e["type"] == "challenge_generation_delta"]
+    final = next(e for e in events if e["type"] == "challenge_generation")
+    assert deltas == ["How can", "How can we help", "How can we help HCPs?"]
+    assert final["data"]["text"] == "How can we help HCPs?"
+    assert final["data"]["gen_input_tokens"] == 50
+
+
+def test_extract_partial_json_string():
+    assert cg.extract_partial_json_string('{"te') == ""
+    assert cg.extract_partial_json_string('{"text": "How \\"can') == 'How "can'
+    assert cg.extract_partial_json_string('{"text": "a\\u00e') == "a"
+    assert cg.extract_partial_json_string('{"text": "done", "reasoning_check": "x"}') == "done"
+
+
+def test_speculative_generation_keeps_hits_and_cancels_misses(monkeypatch):
+    diagnostic = _fake_diagnostic()
+    started, cancelled = [], []
+
+    async def slow_diagnostic(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await diagnostic(*args, **kwargs)
+
+    async def tracking_generate(brief_text, format_id, reasoning, **kwargs):
+        started.append(format_id)
+        try:
+            await asyncio.sleep(0.02 if format_id == "F01" else 0.2)
+        except asyncio.CancelledError:
+            cancelled.append(format_id)
+            raise
+        return await _fake_generate(brief_text, format_id, reasoning, **kwargs)
+
+    async def fake_evaluate(**kwargs):
+        return cg.create_default_evaluation()
+
+    monkeypatch.setattr(cg, "get_diagnostic", slow_diagnostic)
+    monkeypatch.setattr(cg, "generate_single_statement_with_ai", tracking_generate)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", fake_evaluate)
+
+    events = _collect(stream_text=False, speculative_formats=["F01", "F09"])
+
+    metrics = events[-1]["data"]
+    assert started.count("F01") == 1
+    assert cancelled == ["F09"]
+    assert metrics["speculation_hits"] == 1
+    assert metrics["speculation_hit_rate"] == 0.5
+    assert metrics["speculation_saved_ms"] >= 15
+    generations = {e["data"]["selected_format"]: e["data"] for e in events if e["type"] == "challenge_generation"}
+    assert len(generations) == 5
+    # The speculative statement reports the reasoning it was generated from
+    assert generations["F01"]["speculative"] is True
+    assert generations["F01"]["reasoning"] == cg.SPECULATIVE_REASONING
+    assert generations["F01"]["diagnostic_reasoning"] == "why F01"
+    assert (generations["F02"]["speculative"], generations["F02"]["reasoning"]) == (False, "why F02")
+
+
+def test_research_documents_are_sent_once_through_context_cache(monkeypatch):
+    from data_library.research_context import LocalContextCacheBackend, ResearchContextCache
+
+    backend = LocalContextCacheBackend()
+    calls = []
+
+    async def recording_generate(brief_text, format_id, reasoning, research_files=None,
+                                 cached_content=None, **kwargs):
+        calls.append((research_files, cached_content))
+        return await _fake_generate(brief_text, format_id, reasoning, **kwargs)
+
+    async def fake_evaluate(**kwargs):
+        return cg.create_default_evaluation()
+
+    monkeypatch.setattr(cg, "research_context_cache", ResearchContextCache(backend))
+    monkeypatch.setattr(cg, "get_diagnostic", _fake_diagnostic(["F01", "F02"]))
+    monkeypatch.setattr(cg, "generate_single_statement_with_ai", recording_generate)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", fake_evaluate)
+    docs = [
+        {"name": "b.pdf", "gemini_uri": "https://files/b"},
+        {"name": "a.pdf", "gemini_uri": "https://files/a"},
+    ]
+
+    first = _collect(stream_text=False, research_docs=docs)
+    second = _collect(stream_text=False, research_docs=list(reversed(docs)))
+
+    assert len(backend.created) == 1
+    assert len(backend.created[0]["parts"]) == 2
+    assert calls == [(None, backend.created[0]["name"])] * 4
+    assert first[-1]["data"]["research_context_cache"] == "created"
+    assert second[-1]["data"]["research_context_cache"] == "hit"
+
+
+def test_research_context_cache_creates_once_and_drops_idle_locks():
+    from google.genai import types
+    from data_library.research_context import LocalContextCacheBackend, ResearchContextCache
+
+    backend = LocalContextCacheBackend()
+    cache = ResearchContextCache(backend)
+
+    async def run():
+        results = []
+        for uri in ("https://files/a", "https://files/b"):
+            parts = [types.Part.from_uri(file_uri=uri, mime_type="application/pdf")]
+            results += await asyncio.gather(*(cache.get_handle("model", parts) for _ in range(3)))
+        return results
+
+    statuses = [status for _, status in asyncio.run(run())]
+
+    assert statuses == ["created", "hit", "hit"] * 2
+    assert len(backend.created) == 2
+    assert len(cache._locks) == 0
+
+
+def test_research_context_cache_falls_back_to_inline_parts(monkeypatch):
+    from data_library.research_context import ResearchContextCache
+
+    class FailingBackend:
+        async def create(self, *args, **kwargs):
+            raise RuntimeError("400 Cached content is too small")
+
+    calls = []
+
+    async def recording_generate(brief_text, format_id, reasoning, research_files=None,
+                                 cached_content=None, **kwargs):
+        calls.append((len(research_files or []), cached_content))
+        return await _fake_generate(brief_text, format_id, reasoning, **kwargs)
+
+    async def fake_evaluate(**kwargs):
+        return cg.create_default_evaluation()
+
+    monkeypatch.setattr(cg, "research_context_cache", ResearchContextCache(FailingBackend()))
+    monkeypatch.setattr(cg, "get_diagnostic", _fake_diagnostic(["F01"]))
+    monkeypatch.setattr(cg, "generate_single_statement_with_ai", recording_generate)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", fake_evaluate)
+
+    events = _collect(stream_text=False, research_docs=[{"name": "a.pdf", "gemini_uri": "https://files/a"}])
+
+    assert calls == [(1, None)]
+    assert events[-1]["data"]["research_context_cache"] == "inline"
+
+
+def test_duplicate_formats_from_diagnostic_run_once(monkeypatch):
+    generated = []
+
+    async def recording_generate(brief_text, format_id, reasoning, **kwargs):
+        generated.append(format_id)
+        return await _fake_generate(brief_text, format_id, reasoning, **kwargs)
+
+    async def fake_evaluate(**kwargs):
+        return cg.create_default_evaluation()
+
+    monkeypatch.setattr(cg, "get_diagnostic", _fake_diagnostic(["F01"] * 5))
+    monkeypatch.setattr(cg, "generate_single_statement_with_ai", recording_generate)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", fake_evaluate)
+
+    events = _collect(stream_text=False)
+
+    assert generated == ["F01"]
+    assert events[0]["data"]["selected_formats"] == ["F01"]
+
+
+def test_research_context_is_created_alongside_the_diagnostic(monkeypatch):
+    from data_library.research_context import LocalContextCacheBackend, ResearchContextCache
+
+    timeline = []
+
+    class SlowBackend(LocalContextCacheBackend):
+        async def create(self, *args, **kwargs):
+            timeline.append("cache_start")
+            await asyncio.sleep(0.05)
+            timeline.append("cache_done")
+            return await super().create(*args, **kwargs)
+
+    diagnostic = _fake_diagnostic(["F01"])
+
+    async def slow_diagnostic(*args, **kwargs):
+        timeline.append("diagnostic_start")
+        await asyncio.sleep(0.05)
+        return await diagnostic(*args, **kwargs)
+
+    async def fake_evaluate(**kwargs):
+        return cg.create_default_evaluation()
+
+    monkeypatch.setattr(cg, "research_context_cache", ResearchContextCache(SlowBackend()))
+    monkeypatch.setattr(cg, "get_diagnostic", slow_diagnostic)
+    monkeypatch.setattr(cg, "generate_single_statement_with_ai", _fake_generate)
+    monkeypatch.setattr(cg, "evaluate_statement_with_ai", fake_evaluate)
+
+    events = _collect(stream_text=False, research_docs=[{"name": "a.pdf", "gemini_uri": "https://files/a"}])
+
+    # Both started before either finished
+    assert timeline.index("diagnostic_start") < timeline.index("cache_done")
+    assert timeline.index("cache_start") < timeline.index("cache_done")
+    metrics = events[-1]["data"]
+    assert metrics["research_context_cache"] == "created"
+    assert metrics["total_latency_ms"] < 95
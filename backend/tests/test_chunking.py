@@ -0,0 +1,61 @@
+"""
+Tests for the streaming, token-aware chunker.
+"""
+import asyncio
+
+import pytest
+
+from data_library.chunking import chunk_file, chunk_file_async, chunk_lines, chunk_text, estimate_tokens
+
+
+def _sentences(n, start=0):
+    return " ".join(f"Sentence number {i} talks about adherence." for i in range(start, start + n))
+
+
+def test_chunks_respect_budget_and_overlap():
+    text = "\n\n".join(_sentences(4, start=4 * p) for p in range(10))
+
+    chunks = chunk_text(text, "doc.md", max_tokens=60, overlap_tokens=10)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c.text) <= 60 for c in chunks)
+    assert [c.chunk_id for c in chunks[:2]] == ["doc.md_chk_0", "doc.md_chk_1"]
+    # The tail of each chunk opens the next one
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.text.split(".")[0] in previous.text
+
+
+def test_headings_start_new_labelled_chunks():
+    text = "# Results\n\nHbA1c fell by 1.2%.\n\n## Safety\n\nAdverse events were mild."
+
+    chunks = chunk_text(text, "trial.md", max_tokens=200)
+
+    assert [c.text for c in chunks] == ["HbA1c fell by 1.2%.", "Adverse events were mild."]
+    assert [c.location for c in chunks] == ["Segment 0 (Results)", "Segment 1 (Safety)"]
+
+
+def test_oversized_lines_are_split():
+    giant = "word " * 5000  # one line, no sentence breaks
+
+    chunks = list(chunk_lines([giant], "dump.txt", max_tokens=100, overlap_tokens=0))
+
+    assert len(chunks) == 50
+    assert all(estimate_tokens(c.text) <= 100 for c in chunks)
+
+
+def test_chunk_file_streams_text_and_extracts_docx(tmp_path):
+    docx = pytest.importorskip("docx")
+
+    notes = tmp_path / "notes.md"
+    notes.write_text("Payers want outcomes data.\n")
+    document = docx.Document()
+    document.add_heading("Interview findings", level=1)
+    document.add_paragraph("Physicians hesitate to switch stable patients.")
+    document.save(tmp_path / "interviews.docx")
+
+    assert [c.text for c in chunk_file(notes)] == ["Payers want outcomes data."]
+    chunks = asyncio.run(chunk_file_async(tmp_path / "interviews.docx", "Interviews", chunk_id_prefix="research/1"))
+    assert [(c.chunk_id, c.source, c.location) for c in chunks] == [
+        ("research/1_chk_0", "Interviews", "Segment 0 (Interview findings)")
+    ]
+    assert chunks[0].text == "Physicians hesitate to switch stable patients."
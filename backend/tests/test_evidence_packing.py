@@ -0,0 +1,42 @@
+"""
+Tests for token-budgeted MMR evidence packing.
+"""
+from data_library.chunking import estimate_tokens
+from data_library.evidence_packing import format_evidence_entry, pack_evidence
+
+
+def _chunk(chunk_id, text, score):
+    return {"chunk_id": chunk_id, "text": text, "source_title": "doc.md",
+            "location_label": "Segment 0", "score": score}
+
+
+def test_near_duplicates_are_dropped_for_diverse_evidence():
+    finding = "Physicians hesitate to switch stable type 2 diabetes patients to a new SGLT2 inhibitor."
+    chunks = [
+        _chunk("a", finding, 1.0),
+        _chunk("a-copy", finding + " ", 0.95),
+        _chunk("b", "Payers require real-world outcome data before formulary listing.", 0.6),
+    ]
+
+    selected, dropped = pack_evidence(chunks, token_budget=1000)
+
+    assert [c["chunk_id"] for c in selected] == ["a", "b"]
+    assert dropped[0]["chunk_id"] == "a-copy"
+    assert dropped[0]["reason"] == "near_duplicate"
+    assert dropped[0]["similar_to"] == "a"
+
+
+def test_selection_fits_the_token_budget():
+    chunks = [
+        _chunk("long", "adherence " * 300, 1.0),
+        _chunk("short-1", "Cost is the main barrier for elderly patients.", 0.8),
+        _chunk("short-2", "Nurses drive education on injection technique.", 0.7),
+    ]
+    budget = sum(estimate_tokens(format_evidence_entry(c)) for c in chunks[1:])
+
+    selected, dropped = pack_evidence(chunks, token_budget=budget)
+
+    assert [c["chunk_id"] for c in selected] == ["short-1", "short-2"]
+    assert dropped == [{"chunk_id": "long", "reason": "over_budget",
+                        "tokens": estimate_tokens(format_evidence_entry(chunks[0]))}]
+    assert pack_evidence([]) == ([], [])
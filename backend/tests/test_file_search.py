@@ -0,0 +1,106 @@
+"""
+Offline tests for concurrent library uploads (fake async Files API).
+"""
+import asyncio
+from types import SimpleNamespace
+
+from google.genai import types
+
+from data_library import file_search
+from data_library.retrieval_index import RetrievalIndex
+
+
+class FakeAsyncFiles:
+    """Uploads take `delay` seconds and stay PROCESSING for one poll."""
+
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def upload(self, file, config):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if config.display_name in self.fail:
+                raise ConnectionError("upload interrupted")
+            return types.File(name=f"files/{config.display_name}", state=types.FileState.PROCESSING)
+        finally:
+            self.in_flight -= 1
+
+    async def get(self, name):
+        return types.File(name=name, uri=f"https://{name}", state=types.FileState.ACTIVE)
+
+
+def _fake_client(monkeypatch, files):
+    monkeypatch.setattr(file_search, "client", SimpleNamespace(aio=SimpleNamespace(files=files)))
+    monkeypatch.setattr(file_search, "FILE_POLL_INITIAL_SECONDS", 0.01)
+
+
+def test_upload_files_runs_concurrently_and_reports_failures(tmp_path, monkeypatch):
+    files = FakeAsyncFiles(fail={"doc3.md"})
+    _fake_client(monkeypatch, files)
+    paths = []
+    for i in range(10):
+        paths.append(tmp_path / f"doc{i}.md")
+        paths[-1].write_text(f"document {i}")
+    done = []
+
+    results = asyncio.run(file_search.upload_files(paths, concurrency=4, on_done=done.append))
+
+    assert [r.path for r in results] == paths
+    assert files.peak == 4
+    assert len(done) == 10
+    assert [r.path.name for r in results if r.error] == ["doc3.md"]
+    assert results[0].file.uri == "https://files/doc0.md"
+
+
+def test_expand_paths_walks_directories(tmp_path):
+    (tmp_path / "library" / "nested").mkdir(parents=True)
+    (tmp_path / "library" / ".cache").mkdir()
+    (tmp_path / "library" / "a.md").write_text("a")
+    (tmp_path / "library" / "nested" / "b.pdf").write_text("b")
+    (tmp_path / "library" / ".cache" / "skip.md").write_text("c")
+    single = tmp_path / "single.md"
+    single.write_text("d")
+
+    expanded = file_search.expand_paths([tmp_path / "library", single, single])
+
+    assert [p.name for p in expanded] == ["a.md", "b.pdf", "single.md"]
+
+
+
+def test_search_library_attaches_only_relevant_files(tmp_path, monkeypatch):
+    docs = tmp_path / "documents"
+    docs.mkdir()
+    (docs / "trial.md").write_text("Zenoflozin lowered HbA1c by 1.2% in the phase-3 trial.")
+    (docs / "payers.md").write_text("Formulary access is the main barrier for regional payers.")
+    for i in range(8):
+        (docs / f"misc{i}.md").write_text(f"Meeting notes number {i} about logistics.")
+    monkeypatch.setattr(file_search, "retrieval_index", RetrievalIndex(db_path=tmp_path / "index.db", docs_dir=docs))
+    library = [types.File(name=f"files/{p.name}", display_name=p.name, uri=f"https://{p.name}",
+                          mime_type="text/markdown") for p in sorted(docs.iterdir())]
+    attached = []
+
+    def generate_content(model, contents):
+        attached.extend(c.parts[0].file_data.file_uri for c in contents[:-1])
+        return SimpleNamespace(text="answer")
+
+    monkeypatch.setattr(file_search, "client", SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+
+    assert file_search.search_library("HbA1c trial results", library, max_files=3) == "answer"
+    assert attached[0] == "https://trial.md"
+    assert len(attached) == 3
+
+    # Query terms in a file name count when no chunk matches
+    assert [f.display_name for f in file_search.select_relevant_files("misc4", library, max_files=1)] == ["misc4.md"]
+    # Small libraries are passed through untouched
+    assert file_search.select_relevant_files("anything", library[:2], max_files=3) == library[:2]
+
+    # An instruction prompt is ranked by the user's text passed as ranking_query
+    attached.clear()
+    prompt = "Cite the meeting notes and logistics documents. Statement: regional payers formulary access"
+    file_search.search_library(prompt, library, max_files=1, ranking_query="regional payers formulary access")
+    assert attached == ["https://payers.md"]
@@ -0,0 +1,177 @@
+"""
+Tests for the async LLM access layer (no network).
+"""
+import asyncio
+from types import SimpleNamespace
+
+from data_library import llm
+from data_library.llm_scheduler import LLMScheduler, Priority, TokenBucket
+
+
+class FakeModels:
+    def __init__(self, fail_models=()):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+        self.fail_models = set(fail_models)
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls.append(model)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if model in self.fail_models:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+            return SimpleNamespace(text="{}", model=model, candidates=None)
+        finally:
+            self.in_flight -= 1
+
+
+def _install_fake(monkeypatch, models, per_model=2):
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(aio=SimpleNamespace(models=models)))
+    monkeypatch.setattr(llm, "LLM_MAX_CONCURRENCY_PER_MODEL", per_model)
+    monkeypatch.setattr(llm, "_global_limit", None)
+    monkeypatch.setattr(llm, "_model_limits", {})
+    monkeypatch.setattr(llm, "scheduler", LLMScheduler(default_limit=(6000, 10_000_000)))
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", False)
+
+
+def test_concurrency_is_bounded_per_model(monkeypatch):
+    models = FakeModels()
+    _install_fake(monkeypatch, models, per_model=2)
+
+    async def run():
+        await asyncio.gather(*[llm.generate_content("m", "prompt") for _ in range(8)])
+
+    asyncio.run(run())
+    assert len(models.calls) == 8
+    assert models.max_in_flight == 2
+
+
+def test_rate_limited_request_retries_same_model(monkeypatch):
+    models = FakeModels()
+    _install_fake(monkeypatch, models)
+    attempts = {"count": 0}
+    original = models.generate_content
+
+    async def flaky(model, contents, config=None):
+        attempts["count"] += 1
+        if attempts["count"] == 1:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return await original(model, contents, config)
+
+    models.generate_content = flaky
+
+    response = asyncio.run(llm.generate_content("pro", "prompt"))
+    assert response.model == "pro"
+    assert models.calls == ["pro"]
+    assert attempts["count"] == 2
+
+
+def test_scheduler_serves_higher_priority_first():
+    # Request bucket is empty, so callers queue and are admitted by lane
+    sched = LLMScheduler(default_limit=(60, 10_000_000), max_wait_seconds=5)
+    order = []
+
+    async def call(name, priority):
+        await sched.acquire("m", priority, 10)
+        order.append(name)
+
+    async def run():
+        await sched.acquire("m", Priority.INTERACTIVE, 10)
+        sched._state("m").requests.tokens = 0
+        sched._state("m").requests.refill_per_second = 50.0
+        await asyncio.gather(
+            call("background", Priority.BACKGROUND),
+            call("evaluation", Priority.EVALUATION),
+            call("diagnostic", Priority.INTERACTIVE),
+        )
+
+    asyncio.run(run())
+    assert order == ["diagnostic", "evaluation", "background"]
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    assert bucket.time_until(10) == 0
+    bucket.consume(10)
+    assert 1.9 < bucket.time_until(10) <= 2.0
+
+
+def test_identical_in_flight_requests_share_one_call(monkeypatch, tmp_path):
+    from data_library.llm_cache import TwoLevelCache
+
+    models = FakeModels()
+    _install_fake(monkeypatch, models)
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm, "response_cache", TwoLevelCache("responses", db_path=tmp_path / "cache.db"))
+
+    # Fake responses have no candidates, so nothing is cached: only coalescing dedupes
+    async def run():
+        shared = await asyncio.gather(*[llm.generate_content("m", "prompt") for _ in range(5)])
+        fresh = await asyncio.gather(*[llm.generate_content("m", "other", use_cache=False) for _ in range(2)])
+        return shared, fresh
+
+    shared, fresh = asyncio.run(run())
+    assert len(models.calls) == 3
+    assert all(r is shared[0] for r in shared)
+
+
+def test_identical_streamed_requests_share_one_call(monkeypatch, tmp_path):
+    from google.genai import types
+    from data_library.llm_cache import TwoLevelCache
+
+    models = FakeModels()
+    _install_fake(monkeypatch, models)
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm, "response_cache", TwoLevelCache("responses", db_path=tmp_path / "cache.db"))
+    pieces = ['{"text": "How', ' can we?"}']
+
+    async def stream():
+        for piece in pieces:
+            await asyncio.sleep(0.01)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(parts=[types.Part(text=piece)]))]
+            )
+
+    async def generate_content_stream(model, contents, config=None):
+        models.calls.append(model)
+        return stream()
+
+    models.generate_content_stream = generate_content_stream
+
+    async def collect():
+        return [chunk.text async for chunk in llm.generate_content_stream("m", "prompt")]
+
+    async def run():
+        return await asyncio.gather(collect(), collect())
+
+    results = asyncio.run(run())
+    assert models.calls == ["m"]
+    # Whichever caller started the call relays the chunks; the joiner gets the merged response
+    assert sorted(results, key=len) == [["".join(pieces)], pieces]
+
+
+def test_single_flight_survives_one_waiter_cancelling():
+    from data_library.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+        return first.cancelled(), result
+
+    assert asyncio.run(run()) == (True, "done")
+    assert runs == [1]
+    assert not flight.in_flight("k")
@@ -0,0 +1,161 @@
+"""
+Tests for the two-level LLM response cache (no network).
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from google.genai import types
+
+from data_library import llm
+from data_library.llm_cache import (
+    CacheStats, LRUCache, TwoLevelCache, make_cache_key
+)
+from data_library.llm_scheduler import LLMScheduler
+
+
+def _response(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(parts=[types.Part(text=text)]))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(prompt_token_count=10)
+    )
+
+
+def test_key_depends_on_model_prompt_and_config():
+    base = make_cache_key("m", "prompt", types.GenerateContentConfig(temperature=0.3))
+    assert base == make_cache_key("m", "prompt", types.GenerateContentConfig(temperature=0.3))
+    assert base != make_cache_key("m2", "prompt", types.GenerateContentConfig(temperature=0.3))
+    assert base != make_cache_key("m", "prompt!", types.GenerateContentConfig(temperature=0.3))
+    assert base != make_cache_key("m", "prompt", types.GenerateContentConfig(temperature=0.7))
+
+
+def test_lru_evicts_oldest_and_expires():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.set("d", 4, ttl_seconds=-1)
+    assert cache.get("d") is None
+
+
+def test_disk_level_is_shared_between_instances(tmp_path):
+    async def run():
+        first = TwoLevelCache("test_cache", db_path=tmp_path / "cache.db")
+        await first.set("k", {"v": 1})
+        second = TwoLevelCache("test_cache", db_path=tmp_path / "cache.db")
+        stats = CacheStats()
+        assert await second.get("k", stats) == {"v": 1}
+        assert await second.get("missing", stats) is None
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats.as_metrics() == {"llm_cache_hits": 1, "llm_cache_misses": 1}
+
+
+def test_disk_eviction_by_size(tmp_path):
+    cache = TwoLevelCache("sized", db_path=tmp_path / "cache.db", max_bytes=100)
+    for i in range(60):
+        cache.disk.set(f"k{i}", "x" * 20, ttl_seconds=60)
+        time.sleep(0.001)
+    assert cache.disk.get("k0") is None
+    assert cache.disk.get("k59") == "x" * 20
+
+
+def test_generate_content_uses_cache_unless_opted_out(monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_generate(model, contents, config=None):
+        calls.append(model)
+        return _response('{"text": "How can we..."}')
+
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(aio=SimpleNamespace(
+        models=SimpleNamespace(generate_content=fake_generate)
+    )))
+    monkeypatch.setattr(llm, "_global_limit", None)
+    monkeypatch.setattr(llm, "_model_limits", {})
+    monkeypatch.setattr(llm, "scheduler", LLMScheduler(default_limit=(6000, 10_000_000)))
+    monkeypatch.setattr(llm, "response_cache", TwoLevelCache("responses", db_path=tmp_path / "cache.db"))
+
+    async def run():
+        first = await llm.generate_content("m", "prompt")
+        second = await llm.generate_content("m", "prompt")
+        await llm.generate_content("m", "prompt", use_cache=False)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second.text == first.text
+    assert len(calls) == 2
+    # A hit replays the text but not the tokens paid by the original call
+    assert first.usage_metadata.prompt_token_count == 10
+    assert second.usage_metadata is None
+
+
+def test_diagnostic_cache_normalizes_brief(monkeypatch, tmp_path):
+    from data_library import challenge_generator as cg
+
+    runs = []
+
+    async def fake_diagnostic(brief_text, model_name, use_cache=True, priority=None, **kwargs):
+        runs.append(brief_text)
+        return {
+            "diagnostic_path": [],
+            "selected_formats": [{"format_id": "F02", "reasoning": "r", "priority": 1}],
+            "diagnostic_summary": "summary",
+            "model_name": model_name
+        }
+
+    monkeypatch.setattr(cg, "run_diagnostic_tree_with_llm", fake_diagnostic)
+    monkeypatch.setattr(cg, "diagnostic_cache", TwoLevelCache("diag", db_path=tmp_path / "cache.db"))
+
+    async def run():
+        first = await cg.get_diagnostic("Brand X\n\n  needs   growth", model_name="m")
+        second = await cg.get_diagnostic("Brand X needs growth", model_name="m")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(runs) == 1
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert (second["input_tokens"], second["output_tokens"]) == (0, 0)
+    assert second["selected_formats"] == first["selected_formats"]
+
+
+def test_brief_templates_are_loaded_from_frontend():
+    from data_library.challenge_generator import load_brief_templates
+
+    templates = load_brief_templates()
+    assert len(templates) >= 1
+    assert all("MARKETING BRIEF" in t for t in templates)
+
+
+def test_streamed_response_is_cached_for_later_calls(monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_stream(model, contents, config=None):
+        calls.append(model)
+
+        async def chunks():
+            yield _response('{"text": "How ')
+            yield _response('can we..."}')
+        return chunks()
+
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(aio=SimpleNamespace(
+        models=SimpleNamespace(generate_content_stream=fake_stream)
+    )))
+    monkeypatch.setattr(llm, "_global_limit", None)
+    monkeypatch.setattr(llm, "_model_limits", {})
+    monkeypatch.setattr(llm, "scheduler", LLMScheduler(default_limit=(6000, 10_000_000)))
+    monkeypatch.setattr(llm, "response_cache", TwoLevelCache("responses", db_path=tmp_path / "cache.db"))
+
+    async def run():
+        streamed = [c.text async for c in llm.generate_content_stream("m", "prompt")]
+        replayed = [c.text async for c in llm.generate_content_stream("m", "prompt")]
+        return streamed, replayed
+
+    streamed, replayed = asyncio.run(run())
+    assert streamed == ['{"text": "How ', 'can we..."}']
+    assert replayed == ['{"text": "How can we..."}']
+    assert len(calls) == 1
@@ -0,0 +1,68 @@
+"""
+Tests for the schema migration runner (temporary SQLite databases).
+"""
+from sqlalchemy import create_engine, inspect, text
+
+from data_library.database import Base
+from data_library.migrations import MIGRATIONS, applied_versions, upgrade
+
+LATEST = [version for version, _, _ in MIGRATIONS]
+
+
+def _indexes(engine, table):
+    return {ix["name"]: ix["unique"] for ix in inspect(engine).get_indexes(table)}
+
+
+def test_fresh_database_is_created_at_latest_version(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    assert upgrade(engine) == LATEST
+    assert upgrade(engine) == []
+    assert applied_versions(engine) == LATEST
+    assert _indexes(engine, "challenge_statements")["ix_challenge_statements_session_position"]
+    assert set(_indexes(engine, "challenge_sessions")) == {"ix_challenge_sessions_created_at_id"}
+
+
+def _legacy_database(path):
+    """A database created by create_all before indexes / schema_migrations existed."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX {index.name}"))
+    return engine
+
+
+def test_existing_database_is_upgraded_in_place(tmp_path):
+    engine = _legacy_database(tmp_path / "legacy.db")
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE session_summaries"))
+        conn.execute(text("INSERT INTO challenge_sessions (id, brief_text) VALUES ('s1', 'brief')"))
+        conn.execute(text(
+            "INSERT INTO challenge_statements (session_id, text, selected_format, reasoning, position, "
+            "gen_input_tokens) VALUES ('s1', 't', 'F01', 'r', 1, 40)"
+        ))
+
+    assert upgrade(engine) == LATEST
+    assert "ix_dimension_scores_evaluation_id" in _indexes(engine, "dimension_scores")
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT brief_text FROM challenge_sessions")).scalar() == "brief"
+        # Summaries are backfilled for existing sessions
+        assert conn.execute(text(
+            "SELECT statement_count, gen_input_tokens FROM session_summaries WHERE session_id = 's1'"
+        )).one() == (1, 40)
+
+
+def test_duplicate_positions_get_a_non_unique_index(tmp_path):
+    engine = _legacy_database(tmp_path / "legacy.db")
+    with engine.begin() as conn:
+        for _ in range(2):
+            conn.execute(text(
+                "INSERT INTO challenge_statements (session_id, text, selected_format, reasoning, position) "
+                "VALUES ('s1', 't', 'F01', 'r', 1)"
+            ))
+
+    upgrade(engine)
+
+    assert _indexes(engine, "challenge_statements")["ix_challenge_statements_session_position"] == 0
@@ -0,0 +1,93 @@
+"""
+Tests for the write-behind persistence actor (temporary SQLite database).
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_library.database import Base
+from data_library.models import ChallengeSession, ChallengeStatement, ChallengeSessionSummary
+from data_library.persistence import (
+    PersistenceActor, DiagnosticCompleted, StatementGenerated, StatementEvaluated,
+    TimingRecorded, SessionFinished
+)
+
+
+def _evaluation(score):
+    return {
+        "total_score": score,
+        "weighted_score": score * 10,
+        "passes_non_negotiables": True,
+        "failed_non_negotiables": [],
+        "recommendation": "proceed",
+        "detected_format_id": "F01",
+        "dimension_scores": [
+            {"dimension_id": "E01", "score": 4, "notes": "ok", "has_red_flags": False}
+        ]
+    }
+
+
+def _session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def test_events_are_persisted_and_evaluations_match_by_position(tmp_path):
+    factory = _session_factory(tmp_path)
+    with factory() as db:
+        db.add(ChallengeSession(id="s1", brief_text="brief", status="generating"))
+        db.commit()
+
+    actor = PersistenceActor(session_factory=factory)
+    actor.submit(DiagnosticCompleted("s1", "summary", [{"question": "q"}]))
+    # Same format at two positions: evaluations must land on the right rows
+    for position in (1, 2):
+        actor.submit(StatementGenerated("s1", position, {
+            "text": f"statement {position}", "selected_format": "F01", "reasoning": "r",
+            "gen_model": "pro", "gen_input_tokens": 100, "gen_output_tokens": 10
+        }))
+    actor.submit(StatementEvaluated("s1", 2, {
+        "eval_model": "flash", "eval_input_tokens": 50, "eval_output_tokens": 5, "evaluation": _evaluation(30)
+    }))
+    actor.submit(StatementEvaluated("s1", 1, {"eval_model": "flash", "evaluation": _evaluation(20)}))
+    actor.submit(TimingRecorded("s1", {
+        "total_latency_ms": 10, "diagnostic_model": "pro", "diagnostic_input_tokens": 7
+    }))
+    actor.submit(SessionFinished("s1", "completed"))
+    actor.flush().result(timeout=5)
+
+    with factory() as db:
+        session = db.get(ChallengeSession, "s1")
+        statements = sorted(session.challenge_statements, key=lambda s: s.position)
+        assert session.status == "completed"
+        assert session.diagnostic_summary == "summary"
+        assert session.timing_metrics["total_latency_ms"] == 10
+        assert [s.evaluation.total_score for s in statements] == [20, 30]
+        assert len(statements[0].evaluation.dimension_scores) == 1
+
+        summary = db.get(ChallengeSessionSummary, "s1")
+        assert (summary.statement_count, summary.evaluated_count) == (2, 2)
+        assert (summary.gen_input_tokens, summary.eval_input_tokens) == (200, 50)
+        assert summary.total_latency_ms == 10
+        assert summary.tokens_by_model == {
+            "pro": {"input": 207, "output": 20}, "flash": {"input": 50, "output": 5}
+        }
+    assert actor._statement_ids == {}
+    actor.stop()
+
+
+def test_bad_event_does_not_lose_the_rest_of_the_batch(tmp_path):
+    factory = _session_factory(tmp_path)
+    with factory() as db:
+        db.add(ChallengeSession(id="s1", brief_text="brief", status="generating"))
+        db.commit()
+
+    actor = PersistenceActor(session_factory=factory)
+    actor.submit(StatementGenerated("s1", 1, {"text": None, "selected_format": "F01", "reasoning": "r"}))
+    actor.submit(StatementGenerated("s1", 2, {"text": "ok", "selected_format": "F02", "reasoning": "r"}))
+    actor.flush().result(timeout=5)
+    actor.stop()
+
+    with factory() as db:
+        rows = db.query(ChallengeStatement).all()
+        assert [r.position for r in rows] == [2]
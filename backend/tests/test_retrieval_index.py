@@ -0,0 +1,211 @@
+"""
+Tests for the persistent BM25 retrieval index (temporary document directory).
+"""
+import os
+import time
+
+import pytest
+
+from data_library.chunking import Chunk
+from data_library.retrieval_index import RetrievalIndex, tokenize
+from data_library.simhash import hamming, simhash
+
+
+@pytest.fixture
+def library(tmp_path):
+    docs = tmp_path / "documents"
+    docs.mkdir()
+    (docs / "trial.md").write_text(
+        "Zenoflozin lowered HbA1c by 1.2% in the phase-3 trial.\n\n"
+        "Adverse events were mild and transient."
+    )
+    (docs / "interviews.md").write_text(
+        "Physicians worry about prescribing cost for elderly patients.\n\n"
+        "Several HCPs mentioned formulary access as the main barrier."
+    )
+    (docs / "notes.xlsx").write_bytes(b"not indexed")
+    return docs
+
+
+def _index(tmp_path, docs):
+    return RetrievalIndex(db_path=tmp_path / "index.db", docs_dir=docs)
+
+
+def test_tokenize_drops_stopwords_and_keeps_hyphenated_terms():
+    assert tokenize("The phase-3 trial of Zenoflozin") == ["phase-3", "trial", "zenoflozin"]
+
+
+def test_bm25_ranks_matching_chunks(tmp_path, library):
+    index = _index(tmp_path, library)
+
+    assert index.sync() == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    results = index.search("HbA1c trial results", top_k=5)
+
+    assert [r.source for r in results] == ["trial.md"]
+    assert results[0].chunk_id == "trial.md_chk_0"
+    assert results[0].score > 0
+    assert index.search("formulary barrier")[0].source == "interviews.md"
+    assert index.search("the of and") == []
+
+
+def test_sync_is_incremental_and_persistent(tmp_path, library):
+    index = _index(tmp_path, library)
+    index.sync()
+
+    # A fresh instance over the same file sees the existing index
+    reopened = _index(tmp_path, library)
+    assert reopened.sync()["unchanged"] == 2
+
+    # Touching a file without changing it does not re-index it
+    os.utime(library / "trial.md", (time.time() + 10, time.time() + 10))
+    assert reopened.sync() == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2}
+
+    (library / "interviews.md").write_text("Payers demand outcomes data before formulary inclusion.")
+    (library / "trial.md").unlink()
+    assert reopened.sync() == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0}
+
+    assert reopened.search("zenoflozin") == []
+    assert reopened.search("payers outcomes")[0].source == "interviews.md"
+    assert reopened.chunk_count() == 1
+
+
+def test_sync_if_stale_skips_recent_syncs(tmp_path, library):
+    index = _index(tmp_path, library)
+
+    assert index.sync_if_stale(60)["added"] == 2
+    (library / "payers.md").write_text("Regional payers require outcomes data.")
+    assert index.sync_if_stale(60) is None
+    assert index.search("regional payers") == []
+
+    assert index.sync_if_stale(0)["added"] == 1
+    assert index.search("regional payers")[0].source == "payers.md"
+
+
+def test_sparse_retriever_matches_sqlite_bm25(tmp_path, library):
+    from data_library.sparse_retrieval import SparseRetriever
+
+    (library / "more.md").write_text(
+        "HbA1c targets drive physician choice.\n\nTrial data on HbA1c matter to payers and physicians."
+    )
+    index = _index(tmp_path, library)
+    index.sync()
+    retriever = SparseRetriever(index)
+    queries = ["HbA1c trial", "formulary barrier physicians", "unrelated words"]
+
+    batched = retriever.search_batch(queries, top_k=2)
+
+    for query, results in zip(queries, batched):
+        expected = index.search(query, top_k=2)
+        assert [r.chunk_id for r in results] == [e.chunk_id for e in expected]
+        assert [r.score for r in results] == pytest.approx([e.score for e in expected], rel=1e-5)
+    assert batched[2] == []
+
+    # Rebuilt when a sync changes the index
+    (library / "trial.md").unlink()
+    index.sync()
+    assert all(r.source != "trial.md" for r in retriever.search("HbA1c trial"))
+
+
+def test_ngram_retriever_matches_word_forms():
+    from data_library.brainstorm import Chunk
+    from data_library.ngram_retrieval import NgramRetriever
+
+    texts = [
+        "Payers require real-world outcome data before listing.",
+        "Prescribers show hesitancy about switching stable patients.",
+        "The trial reduced HbA1c by 1.2% at week 26.",
+    ]
+    retriever = NgramRetriever.from_chunks(
+        [Chunk(f"doc.md_chk_{i}", text, "doc.md", f"Segment {i}") for i, text in enumerate(texts)]
+    )
+
+    assert retriever.search("hesitant to switch", top_k=1)[0].chunk_id == "doc.md_chk_1"
+    assert retriever.search("outcomes required by payer", top_k=1)[0].chunk_id == "doc.md_chk_0"
+    assert retriever.search("the of") == []
+    # Chunks that only share stray hashed n-grams with the query fall below the floor
+    assert [c.chunk_id for c in retriever.search("hesitant to switch", top_k=3)] == ["doc.md_chk_1"]
+    assert retriever.search("warehouse shipping schedules") == []
+    assert len(retriever.search("warehouse shipping schedules", min_similarity=0)) > 0
+
+
+def test_brainstorm_retrieval_runs_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    from data_library import brainstorm
+
+    threads = []
+
+    def fake_retrieve(query, top_k=12):
+        threads.append(threading.get_ident())
+        return []
+
+    async def fake_generate(**kwargs):
+        raise RuntimeError("no model in tests")
+
+    monkeypatch.setattr(brainstorm, "retrieve_chunks", fake_retrieve)
+    monkeypatch.setattr(brainstorm, "generate_content", fake_generate)
+
+    async def run():
+        result = await brainstorm.run_brainstorm_session("brief", "launch", "HCPs", ["statement"])
+        return result, threading.get_ident()
+
+    result, loop_thread = asyncio.run(run())
+
+    assert result["error"] == "no model in tests"
+    assert len(threads) == 1 and threads[0] != loop_thread
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    from data_library.retrieval_index import IndexedChunk, reciprocal_rank_fusion
+
+    def ranked(*ids):
+        return [IndexedChunk(i, "", "doc.md", "", 1.0) for i in ids]
+
+    fused = reciprocal_rank_fusion([ranked("a", "b", "c"), ranked("b", "d", "a")], k=60)
+
+    assert [c.chunk_id for c in fused] == ["b", "a", "d", "c"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_simhash_is_close_for_near_duplicates():
+    text = tokenize("Physicians hesitate to switch stable type 2 diabetes patients to a new therapy. " * 5)
+    edited = text[:-1] + ["treatment"]
+
+    assert hamming(simhash(text), simhash(edited)) <= 3
+    assert hamming(simhash(text), simhash(tokenize("Payers require outcome data before listing."))) > 3
+    assert simhash([]) is None
+
+
+def test_near_duplicate_documents_collapse_in_index(tmp_path, library):
+    index = _index(tmp_path, library)
+    index.sync()
+    chunk_count = index.chunk_count()
+
+    # A copy of the trial with a trailing edit adds no searchable chunks
+    copy = (library / "trial.md").read_text() + " "
+    (library / "trial-copy.md").write_text(copy)
+    index.sync()
+
+    assert index.chunk_count() == chunk_count
+    assert index.duplicate_documents() == {"trial-copy.md": "trial.md"}
+    assert [r.source for r in index.search("HbA1c trial")] == ["trial.md"]
+
+    # Removing the original promotes the copy
+    (library / "trial.md").unlink()
+    index.sync()
+
+    assert index.duplicate_documents() == {}
+    assert [r.source for r in index.search("HbA1c trial")] == ["trial-copy.md"]
+    assert index.chunk_count() == chunk_count
+
+
+def test_index_document_reports_duplicate(tmp_path, library):
+    index = _index(tmp_path, library)
+    text = "Formulary access is the main barrier named by regional payers in every interview round."
+    chunks = [Chunk("research/1_chk_0", text, "payers.md", "Segment 0")]
+
+    assert index.index_document("research/1", chunks, "h1") is None
+    assert index.index_document("research/2", [Chunk("research/2_chk_0", text, "payers (copy).md", "Segment 0")],
+                                "h2") == "research/1"
+    assert len(index.search("formulary barrier payers")) == 1
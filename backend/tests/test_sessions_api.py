@@ -0,0 +1,372 @@
+"""
+Offline tests for the session / research document endpoints (temporary SQLite database).
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_library import api
+from data_library.database import Base, get_async_db_session
+from data_library.ingestion import IngestionQueue
+from data_library.retrieval_index import RetrievalIndex
+from data_library.models import (
+    ChallengeSession, ChallengeStatement, ChallengeEvaluation, DimensionScore
+)
+from data_library.session_summaries import backfill
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "PRECOMPUTE_TEMPLATE_DIAGNOSTICS", False)
+    api.session_detail_cache.clear()
+    db_path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override():
+        async with factory() as db:
+            yield db
+
+    api.app.dependency_overrides[get_async_db_session] = override
+    local_index = RetrievalIndex(db_path=tmp_path / "index.db", docs_dir=tmp_path / "documents")
+    monkeypatch.setattr(api, "retrieval_index", local_index)
+    monkeypatch.setattr(api, "ingestion", IngestionQueue(
+        session_factory=factory, retry_base_seconds=0, poll_interval_seconds=0.01, local_index=local_index
+    ))
+    with TestClient(api.app) as test_client:
+        test_client.sync_session = sessionmaker(bind=engine)
+        yield test_client
+    api.app.dependency_overrides.clear()
+
+
+def _add_session(factory, session_id="s1", statements=2):
+    with factory() as db:
+        session = ChallengeSession(id=session_id, brief_text="Brief " * 40, status="completed")
+        for position in range(1, statements + 1):
+            session.challenge_statements.append(ChallengeStatement(
+                text=f"How can we {position}?", selected_format="F01", reasoning="r", position=position,
+                evaluation=ChallengeEvaluation(
+                    total_score=30, weighted_score=75, passes_non_negotiables=True,
+                    failed_non_negotiables=[], recommendation="proceed",
+                    dimension_scores=[DimensionScore(dimension_id="E01", score=4, notes="ok")]
+                )
+            ))
+        db.add(session)
+        db.commit()
+        backfill(db)
+
+
+def test_session_detail_loads_statements_and_evaluations(client):
+    _add_session(client.sync_session)
+
+    response = client.get("/api/sessions/s1")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [s["text"] for s in body["challenge_statements"]] == ["How can we 1?", "How can we 2?"]
+    assert body["challenge_statements"][0]["evaluation"]["dimension_scores"][0]["score"] == 4
+    assert client.get("/api/sessions/missing").status_code == 404
+
+
+def test_session_list_and_document_routes(client):
+    _add_session(client.sync_session)
+
+    sessions = client.get("/api/sessions").json()
+
+    assert sessions[0]["statement_count"] == 2
+    assert sessions[0]["brief_preview"].endswith("...")
+    assert client.get("/api/research-documents").json() == []
+    assert client.delete("/api/research-documents/missing").status_code == 404
+
+
+def _add_history(factory):
+    """Five sessions over three timestamps (two ties), with one statement each."""
+    from sqlalchemy import text
+
+    stamps = ["2025-01-01 09:00:00", "2025-01-02 09:00:00", "2025-01-02 09:00:00",
+              "2025-01-03 09:00:00", "2025-01-03 09:00:00"]
+    with factory() as db:
+        for i, stamp in enumerate(stamps):
+            db.add(ChallengeSession(
+                id=f"s{i}", brief_text="x" * 150 if i == 0 else f"brief {i}",
+                status="error" if i == 4 else "completed", timing_metrics={"total_latency_ms": i},
+                challenge_statements=[ChallengeStatement(
+                    text="t", selected_format="F02", reasoning="r", position=1
+                )]
+            ))
+        db.commit()
+        for i, stamp in enumerate(stamps):
+            db.execute(text("UPDATE challenge_sessions SET created_at = :c WHERE id = :id"),
+                       {"c": stamp, "id": f"s{i}"})
+        db.commit()
+        backfill(db)
+
+
+def test_session_list_is_keyset_paginated(client):
+    _add_history(client.sync_session)
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/sessions", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert sorted(s["id"] for s in seen) == ["s0", "s1", "s2", "s3", "s4"]
+    assert [s["created_at"][:10] for s in seen] == ["2025-01-03"] * 2 + ["2025-01-02"] * 2 + ["2025-01-01"]
+    assert seen[-1]["brief_preview"] == "x" * 100 + "..."
+    assert seen[0]["challenges"][0]["format"] == "F02"
+    assert client.get("/api/sessions", params={"cursor": "nope"}).status_code == 400
+
+
+def test_session_list_filters_and_fields(client):
+    _add_history(client.sync_session)
+
+    completed = client.get("/api/sessions", params={"status": "completed"}).json()
+    january_2 = client.get("/api/sessions", params={
+        "created_after": "2025-01-02T00:00:00", "created_before": "2025-01-03T00:00:00"
+    }).json()
+    slim = client.get("/api/sessions", params={"fields": "timing_metrics"}).json()
+
+    assert "s4" not in {s["id"] for s in completed}
+    assert sorted(s["id"] for s in january_2) == ["s1", "s2"]
+    assert all(s["challenges"] is None and s["usage"] is None and s["statement_count"] == 1 for s in slim)
+    assert slim[0]["timing_metrics"] is not None
+    assert client.get("/api/sessions", params={"fields": "bogus"}).status_code == 400
+
+
+def test_session_detail_etag_and_completed_cache(client):
+    from sqlalchemy import text
+
+    _add_session(client.sync_session)
+
+    first = client.get("/api/sessions/s1")
+    etag = first.headers["ETag"]
+    not_modified = client.get("/api/sessions/s1", headers={"If-None-Match": etag})
+
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert api.session_detail_cache.get("s1")[2] == etag
+
+    # Rows changed behind the cache are not seen while the status is unchanged...
+    with client.sync_session() as db:
+        db.execute(text("UPDATE challenge_statements SET text = 'edited' WHERE position = 1"))
+        db.commit()
+    assert client.get("/api/sessions/s1").headers["ETag"] == etag
+
+    # ...but a status change invalidates the entry
+    with client.sync_session() as db:
+        db.execute(text("UPDATE challenge_sessions SET status = 'generating'"))
+        db.commit()
+    refreshed = client.get("/api/sessions/s1", headers={"If-None-Match": etag})
+
+    assert refreshed.status_code == 200
+    assert refreshed.json()["challenge_statements"][0]["text"] == "edited"
+    assert api.session_detail_cache.get("s1") is None
+
+
+class FakeFiles:
+    """
+    Files API stand-in: uploads start PROCESSING and become ACTIVE on the next get.
+    The first `failures` uploads are interrupted; the next `processing_failures`
+    are created but end up FAILED. With `hold`, uploads wait until `release` is set.
+    """
+
+    def __init__(self, failures=0, processing_failures=0, hold=False):
+        import threading
+
+        self.uploads = []
+        self.deleted = []
+        self.failures = failures
+        self.processing_failures = processing_failures
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    async def upload(self, file, config):
+        import asyncio
+        from google.genai import types
+
+        self.uploads.append(config.display_name)
+        self.started.set()
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("upload interrupted")
+        if self.processing_failures:
+            self.processing_failures -= 1
+            return types.File(name=f"files/failed-{len(self.uploads)}", state=types.FileState.PROCESSING)
+        return types.File(name="files/abc", uri="https://files/abc", state=types.FileState.PROCESSING)
+
+    async def get(self, name):
+        from google.genai import types
+
+        state = types.FileState.FAILED if name.startswith("files/failed") else types.FileState.ACTIVE
+        return types.File(name=name, uri=f"https://{name}", state=state)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def _fake_gemini_files(monkeypatch, **kwargs):
+    from types import SimpleNamespace
+    from data_library import ingestion
+
+    files = FakeFiles(**kwargs)
+    client = SimpleNamespace(aio=SimpleNamespace(files=files))
+    monkeypatch.setattr(ingestion, "get_client", lambda: client)
+    return files
+
+
+def _wait_for_ingestion(client):
+    client.portal.call(api.ingestion.join)
+
+
+def test_upload_returns_before_ingestion_and_retries(client, monkeypatch, tmp_path):
+    files = _fake_gemini_files(monkeypatch, failures=1, processing_failures=1)
+    monkeypatch.setattr(api, "RESEARCH_DIR", tmp_path / "research")
+
+    uploaded = client.post("/api/research-documents/upload", data={"type": "clinical-trial"},
+                           files={"file": ("trial.pdf", b"results")}).json()
+
+    assert uploaded["ingestion_status"] == "queued"
+    assert uploaded["ingestion_job_id"] == uploaded["id"]
+    _wait_for_ingestion(client)
+    status = client.get(f"/api/research-documents/{uploaded['id']}/ingestion").json()
+
+    assert status["status"] == "ready"
+    assert status["attempts"] == 3
+    assert status["gemini_file_id"] == "files/abc"
+    assert files.uploads == ["trial.pdf"] * 3
+    # The file created by the attempt that failed processing is not leaked
+    assert files.deleted == ["files/failed-2"]
+    assert client.get("/api/research-documents/missing/ingestion").status_code == 404
+
+
+def test_delete_during_upload_removes_the_gemini_file(client, monkeypatch, tmp_path):
+    files = _fake_gemini_files(monkeypatch, hold=True)
+    monkeypatch.setattr(api, "RESEARCH_DIR", tmp_path / "research")
+
+    uploaded = client.post("/api/research-documents/upload", data={"type": "interviews"},
+                           files={"file": ("hcp.md", b"Physicians hesitate to switch therapy.")}).json()
+    assert files.started.wait(5)
+    assert client.delete(f"/api/research-documents/{uploaded['id']}").status_code == 200
+    files.release.set()
+    _wait_for_ingestion(client)
+
+    assert files.deleted == ["files/abc"]
+    assert api.retrieval_index.search("switch therapy") == []
+
+
+def test_identical_uploads_resolve_to_one_document(client, monkeypatch, tmp_path):
+    files = _fake_gemini_files(monkeypatch)
+    monkeypatch.setattr(api, "RESEARCH_DIR", tmp_path / "research")
+    content = b"trial results " * 5000
+
+    first = client.post("/api/research-documents/upload", data={"type": "clinical-trial"},
+                        files={"file": ("trial.pdf", content)}).json()
+    second = client.post("/api/research-documents/upload", data={"type": "clinical-trial"},
+                         files={"file": ("trial (1).pdf", content)}).json()
+    _wait_for_ingestion(client)
+
+    assert files.uploads == ["trial.pdf"]
+    assert second["id"] == first["id"] and second["duplicate"] is True
+    assert [p.name for p in (tmp_path / "research").iterdir()] == [f"{first['content_hash']}.pdf"]
+
+
+def test_store_upload_hashes_in_chunks(tmp_path):
+    import asyncio
+    import hashlib
+    import io
+    from fastapi import UploadFile
+    from data_library.research_storage import store_upload
+
+    content = bytes(range(256)) * 100
+    stored = asyncio.run(store_upload(
+        UploadFile(io.BytesIO(content), filename="deck.PPTX"), directory=tmp_path, chunk_size=1000
+    ))
+
+    assert stored.content_hash == hashlib.sha256(content).hexdigest()
+    assert stored.size == len(content)
+    assert stored.path.read_bytes() == content
+    assert stored.path.suffix == ".pptx"
+
+
+def test_ingested_research_is_indexed_for_local_retrieval(client, monkeypatch, tmp_path):
+    _fake_gemini_files(monkeypatch)
+    monkeypatch.setattr(api, "RESEARCH_DIR", tmp_path / "research")
+
+    uploaded = client.post("/api/research-documents/upload", data={"type": "interviews"},
+                           files={"file": ("hcp.md", b"# Findings\n\nPhysicians hesitate to switch therapy.")}).json()
+    _wait_for_ingestion(client)
+
+    hits = api.retrieval_index.search("switch therapy")
+    assert [(h.source, h.location) for h in hits] == [("hcp.md", "Segment 0 (Findings)")]
+
+    assert client.delete(f"/api/research-documents/{uploaded['id']}").status_code == 200
+    assert api.retrieval_index.search("switch therapy") == []
+
+
+def test_near_duplicate_research_is_flagged_in_listing(client, monkeypatch, tmp_path):
+    _fake_gemini_files(monkeypatch)
+    monkeypatch.setattr(api, "RESEARCH_DIR", tmp_path / "research")
+    report = " ".join(
+        f"Physician {i} hesitates to switch stable patients in region {i % 7} without outcome data."
+        for i in range(30)
+    )
+
+    original = client.post("/api/research-documents/upload", data={"type": "interviews"},
+                           files={"file": ("hcp.md", report.encode())}).json()
+    _wait_for_ingestion(client)
+    copy = client.post("/api/research-documents/upload", data={"type": "interviews"},
+                       files={"file": ("hcp-v2.md", (report + "Reviewed.").encode())}).json()
+    _wait_for_ingestion(client)
+
+    listing = {d["id"]: d["duplicate_of"] for d in client.get("/api/research-documents").json()}
+    assert listing == {original["id"]: None, copy["id"]: original["id"]}
+    assert {h.source for h in api.retrieval_index.search("switch stable patients", top_k=20)} == {"hcp.md"}
+
+
+def test_client_disconnect_finishes_session_as_cancelled(tmp_path, monkeypatch):
+    import asyncio
+    import json
+    from data_library.persistence import PersistenceActor
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'stream.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(ChallengeSession(id="s1", brief_text="Brief", status="generating"))
+        db.commit()
+    actor = PersistenceActor(session_factory=factory)
+    monkeypatch.setattr(api, "persistence", actor)
+
+    async def fake_stream(**kwargs):
+        yield json.dumps({"type": "challenge_generation", "data": {
+            "position": 1, "text": "How can we?", "selected_format": "F01", "reasoning": "r"
+        }})
+        await asyncio.sleep(60)  # the client leaves before anything else arrives
+
+    monkeypatch.setattr(api, "generate_challenges_stream", fake_stream)
+
+    async def disconnect():
+        stream = api.stream_and_save_generator(api.ChallengeRequest(brief_text="Brief"), "s1", [])
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(disconnect())
+    actor.flush().result(timeout=5)
+    actor.stop()
+
+    with factory() as db:
+        session = db.get(ChallengeSession, "s1")
+        assert (session.status, session.error_message) == ("cancelled", "Client disconnected")
+        assert len(session.challenge_statements) == 1
+    assert actor._statement_ids == {}
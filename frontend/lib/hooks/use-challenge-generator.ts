@@ -140,16 +140,27 @@ export function useChallengeGenerator(): UseChallengeGeneratorReturn {
                                 setResult({ ...currentResult })
                                 setStatus("success") // Switch to success UI to show progress
                             }
+                            else if (event.type === 'challenge_generation_delta') {
+                                // Partial text while the statement is still streaming
+                                const partial = event.data as ChallengeStatement
+                                const exists = currentResult.challenge_statements.some(s => s.id === partial.id)
+                                const newStmts = exists
+                                    ? currentResult.challenge_statements.map(s => s.id === partial.id ? { ...s, ...partial } : s)
+                                    : [...currentResult.challenge_statements, partial].sort((a, b) => a.id - b.id)
+                                currentResult = { ...currentResult, challenge_statements: newStmts }
+                                setResult({ ...currentResult })
+                            }
                             else if (event.type === 'challenge_generation') {
                                 const stmt = event.data as ChallengeStatement
                                 addLog(`Generated Statement #${stmt.position} (${stmt.selected_format})`)
 
-                                // Add if not exists
-                                if (!currentResult.challenge_statements.find(s => s.id === stmt.id)) {
-                                    const newStmts = [...currentResult.challenge_statements, stmt].sort((a, b) => a.id - b.id)
-                                    currentResult = { ...currentResult, challenge_statements: newStmts }
-                                    setResult({ ...currentResult })
-                                }
+                                // Add, or replace the partial (streamed) version
+                                const exists = currentResult.challenge_statements.some(s => s.id === stmt.id)
+                                const newStmts = exists
+                                    ? currentResult.challenge_statements.map(s => s.id === stmt.id ? { ...s, ...stmt } : s)
+                                    : [...currentResult.challenge_statements, stmt].sort((a, b) => a.id - b.id)
+                                currentResult = { ...currentResult, challenge_statements: newStmts }
+                                setResult({ ...currentResult })
                             }
                             else if (event.type === 'challenge_evaluation') {
                                 const evalData = event.data as ChallengeStatement
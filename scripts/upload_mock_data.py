@@ -1,4 +1,5 @@
 
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -6,7 +7,7 @@ from pathlib import Path
 # Add current dir to path to import local modules
 sys.path.append(os.getcwd())
 
-from data_library.file_search import upload_file
+from data_library.file_search import upload_files
 
 def main():
     docs_dir = Path("./data/documents")
@@ -16,17 +17,22 @@ def main():
         "Mock_Competitor_Analysis.md"
     ]
     
+    paths = []
     for filename in mock_files:
         path = docs_dir / filename
         if path.exists():
-            print(f"Uploading {filename}...")
-            try:
-                upload_file(path)
-                print(f"Successfully uploaded {filename}")
-            except Exception as e:
-                print(f"Failed to upload {filename}: {e}")
+            paths.append(path)
         else:
             print(f"Skip: {filename} not found locally.")
 
+    def report(result):
+        if result.error:
+            print(f"Failed to upload {result.path.name}: {result.error}")
+        else:
+            print(f"Successfully uploaded {result.path.name}")
+
+    print(f"Uploading {len(paths)} file(s)...")
+    asyncio.run(upload_files(paths, on_done=report))
+
 if __name__ == "__main__":
     main()